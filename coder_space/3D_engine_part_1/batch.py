@@ -0,0 +1,155 @@
+import numpy as np
+from culling import FrustumCuller, get_world_spheres
+
+
+# all models sharing a (vao_name, tex_id) pair, drawn with one instanced call
+class InstanceBatch:
+    def __init__(self, app, vao_name, tex_id, objects, centers, radii):
+        self.app = app
+        self.ctx = app.ctx
+        self.objects = objects
+        self.tex_id = tex_id
+        self.vbo = app.mesh.vao.vbo.vbos[vao_name]
+        self.program = app.mesh.vao.program.get('instanced')
+        # per-instance model matrices, packed column-major like glm
+        self.instance_data = np.empty((len(objects), 4, 4), dtype='f4')
+        self.instance_vbo = self.ctx.buffer(reserve=self.instance_data.nbytes)
+        self.instance_count = 0
+        self.versions = [-1] * len(objects)
+        self.dirty_range = None
+        # instance bytes written since the renderer last reset it
+        self.uploaded_bytes = 0
+        # world bounding spheres, views into the renderer-wide culling arrays
+        self.centers = centers
+        self.radii = radii
+        self.mask = None
+        self.vao = app.mesh.vao.get_instanced_vao(
+            program=self.program,
+            vbo=self.vbo,
+            instance_vbo=self.instance_vbo)
+        self.update()
+
+    def update(self):
+        # repack only the matrices whose transform changed since the last upload
+        flat = self.instance_data.reshape(len(self.objects), 16)
+        first, last = None, None
+        for i, obj in enumerate(self.objects):
+            transform = obj.transform
+            if transform.version == self.versions[i]:
+                continue
+            flat[i] = np.frombuffer(transform.m_world.to_bytes(), dtype='f4')
+            self.versions[i] = transform.version
+            if first is None:
+                first = i
+            last = i
+
+        if first is not None:
+            get_world_spheres(self.instance_data, self.vbo.center, self.vbo.radius, self.centers, self.radii)
+            if self.dirty_range is not None:
+                first, last = min(first, self.dirty_range[0]), max(last, self.dirty_range[1])
+            self.dirty_range = (first, last)
+
+    def upload(self, mask):
+        if self.dirty_range is None and self.mask is not None and np.array_equal(mask, self.mask):
+            return
+
+        if self.dirty_range is not None and mask.all() and self.mask is not None and self.mask.all():
+            # nothing culled now or last frame, only the moved range needs uploading
+            first, last = self.dirty_range
+            flat = self.instance_data.reshape(len(self.objects), 16)
+            self.instance_vbo.write(flat[first:last + 1], offset=first * flat.itemsize * 16)
+            self.uploaded_bytes += flat[first:last + 1].nbytes
+        elif mask.any():
+            visible = self.instance_data[mask]
+            self.instance_vbo.write(visible)
+            self.uploaded_bytes += visible.nbytes
+
+        self.instance_count = int(mask.sum())
+        self.mask = mask
+        self.dirty_range = None
+
+    def render(self):
+        if not self.instance_count:
+            return
+        self.app.mesh.texture.use(self.tex_id)
+        self.vao.render(instances=self.instance_count)
+
+    def destroy(self):
+        self.vao.release()
+        self.instance_vbo.release()
+
+
+class BatchRenderer:
+    def __init__(self, app):
+        self.app = app
+        self.camera = app.camera
+        self.shader_program = app.mesh.vao.program
+        self.batches = {}
+        self.programs = {}
+        self.culler = FrustumCuller(self.camera)
+        # per-frame counters
+        self.draw_calls = 0
+        self.uploaded_bytes = 0
+        self.centers = np.empty((0, 3), dtype='f4')
+        self.radii = np.empty(0, dtype='f4')
+
+    def build(self, objects):
+        self.destroy()
+        groups = {}
+        for obj in objects:
+            groups.setdefault((obj.vao_name, obj.tex_id), []).append(obj)
+
+        # bounding spheres of all batches live in two arrays so culling is a single pass
+        self.centers = np.empty((len(objects), 3), dtype='f4')
+        self.radii = np.empty(len(objects), dtype='f4')
+        start = 0
+        for key, objs in groups.items():
+            end = start + len(objs)
+            self.batches[key] = InstanceBatch(self.app, *key, objs, self.centers[start:end], self.radii[start:end])
+            start = end
+        self.programs = {batch.program.glo: batch.program for batch in self.batches.values()}
+        self.on_init()
+
+    def on_init(self):
+        light = self.app.light
+        set_uniform = self.shader_program.set_uniform
+        for program in self.programs.values():
+            set_uniform(program, 'u_texture_0', 0)
+            # mvp
+            set_uniform(program, 'm_proj', self.camera.m_proj)
+            set_uniform(program, 'm_view', self.camera.m_view)
+            # light
+            set_uniform(program, 'light.position', light.position)
+            set_uniform(program, 'light.Ia', light.Ia)
+            set_uniform(program, 'light.Id', light.Id)
+            set_uniform(program, 'light.Is', light.Is)
+
+    def update(self):
+        # per-frame uniforms are written once per program, not once per object
+        set_uniform = self.shader_program.set_uniform
+        for program in self.programs.values():
+            set_uniform(program, 'camPos', self.camera.position)
+            set_uniform(program, 'm_view', self.camera.m_view)
+
+    def render(self):
+        self.update()
+        for batch in self.batches.values():
+            batch.update()
+
+        mask = self.culler.cull(self.centers, self.radii)
+        self.draw_calls = self.uploaded_bytes = 0
+        start = 0
+        for batch in self.batches.values():
+            end = start + len(batch.objects)
+            batch.uploaded_bytes = 0
+            batch.upload(mask[start:end])
+            batch.render()
+            if batch.instance_count:
+                self.draw_calls += 1
+            self.uploaded_bytes += batch.uploaded_bytes
+            start = end
+
+    def destroy(self):
+        [batch.destroy() for batch in self.batches.values()]
+        self.batches = {}
+        self.programs = {}
@@ -0,0 +1,116 @@
+import argparse
+import math
+import time
+import moderngl as mgl
+import glm
+from camera import Camera
+from light import Light
+from mesh import Mesh
+from scene import Scene
+
+
+class HeadlessEngine:
+    # same attributes the engine components read from GraphicsEngine, no window or input
+    def __init__(self, win_size=(1600, 900), backend=None):
+        self.WIN_SIZE = win_size
+        kwargs = {'backend': backend} if backend else {}
+        self.ctx = mgl.create_standalone_context(require=330, **kwargs)
+        self.fbo = self.ctx.framebuffer(
+            color_attachments=[self.ctx.renderbuffer(win_size)],
+            depth_attachment=self.ctx.depth_renderbuffer(win_size))
+        self.fbo.use()
+        self.ctx.enable(flags=mgl.DEPTH_TEST | mgl.CULL_FACE)
+        self.time = 0
+        self.delta_time = 1000 / 60
+        self.light = Light()
+        self.camera = Camera(self)
+        self.mesh = Mesh(self)
+        self.mesh.texture.wait()
+        self.mesh.texture.report()
+        self.scene = None
+
+    def load_scene(self, n, s):
+        if self.scene is not None:
+            self.scene.destroy()
+        self.scene = Scene(self, n=n, s=s)
+
+    def set_camera(self, frame, frames):
+        # deterministic orbit around the grid, looking at the origin
+        angle = 2 * math.pi * frame / frames
+        radius = self.scene.n + 10
+        camera = self.camera
+        camera.position = glm.vec3(radius * math.cos(angle), 8, radius * math.sin(angle))
+        camera.yaw = math.degrees(angle) + 180
+        camera.pitch = -15
+        camera.update_camera_vectors()
+        camera.m_view = camera.get_view_matrix()
+
+    def render(self):
+        self.ctx.clear(color=(0.08, 0.16, 0.18))
+        self.mesh.update()
+        self.scene.render()
+
+    def run(self, frames, warmup=10):
+        for frame in range(warmup):
+            self.set_camera(frame, frames)
+            self.render()
+            self.mesh.end_frame()
+        self.ctx.finish()
+
+        draw_calls = uploaded_bytes = visible = 0
+        state_totals = {}
+        start = time.perf_counter()
+        for frame in range(frames):
+            self.time = frame * self.delta_time * 0.001
+            self.set_camera(frame, frames)
+            self.render()
+            self.mesh.end_frame()
+            batch = self.scene.batch
+            state = self.mesh.get_state_stats()
+            draw_calls += batch.draw_calls
+            uploaded_bytes += batch.uploaded_bytes + state['uniform_bytes']
+            visible += batch.culler.visible
+            for name, value in state.items():
+                state_totals[name] = state_totals.get(name, 0) + value
+        self.ctx.finish()
+        elapsed = time.perf_counter() - start
+
+        return {
+            'objects': len(self.scene.objects),
+            'fps': frames / elapsed,
+            'draw_calls': draw_calls / frames,
+            'uploaded_bytes': uploaded_bytes / frames,
+            'visible': visible / frames,
+            # issued / skipped uniform writes and texture binds per frame
+            'state': {name: value / frames for name, value in state_totals.items()},
+        }
+
+    def destroy(self):
+        if self.scene is not None:
+            self.scene.destroy()
+        self.mesh.destroy()
+        self.fbo.release()
+        self.ctx.release()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offscreen benchmark of the engine over a scripted camera orbit')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--n', type=int, nargs='+', default=[30], help='grid half-extent, several values sweep')
+    parser.add_argument('--s', type=int, default=3, help='grid spacing')
+    parser.add_argument('--size', type=int, nargs=2, default=(1600, 900))
+    parser.add_argument('--backend', default=None, help="e.g. 'egl' on machines without a display")
+    args = parser.parse_args()
+
+    engine = HeadlessEngine(tuple(args.size), backend=args.backend)
+    print(f'{"n":>5} {"objects":>8} {"visible":>8} {"fps":>9} {"draws/frame":>12} {"bytes/frame":>12} '
+          f'{"uniforms set/skip":>18} {"binds set/skip":>15}')
+    for n in args.n:
+        engine.load_scene(n, args.s)
+        result = engine.run(args.frames)
+        state = result['state']
+        uniforms = f'{state["uniforms_issued"]:.1f}/{state["uniforms_skipped"]:.1f}'
+        binds = f'{state["textures_issued"]:.1f}/{state["textures_skipped"]:.1f}'
+        print(f'{n:>5} {result["objects"]:>8} {result["visible"]:>8.1f} {result["fps"]:>9.1f} '
+              f'{result["draw_calls"]:>12.1f} {result["uploaded_bytes"]:>12.0f} {uniforms:>18} {binds:>15}')
+    engine.destroy()
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def get_bounding_sphere(positions):
+    # AABB center with the farthest vertex as radius, (center, radius, aabb_min, aabb_max)
+    aabb_min, aabb_max = positions.min(axis=0), positions.max(axis=0)
+    center = (aabb_min + aabb_max) * 0.5
+    radius = float(np.sqrt(((positions - center) ** 2).sum(axis=1).max()))
+    return center, radius, aabb_min, aabb_max
+
+
+def get_world_spheres(m_models, center, radius, out_centers, out_radii):
+    # m_models is (n, 4, 4) column-major like glm, so m_models[:, j] is column j
+    out_centers[:] = np.einsum('j,njk->nk', center, m_models[:, :3, :3]) + m_models[:, 3, :3]
+    out_radii[:] = radius * np.linalg.norm(m_models[:, :3, :3], axis=2).max(axis=1)
+
+
+def get_frustum_planes(m_proj, m_view):
+    # Gribb/Hartmann: rows of the view-projection matrix, (6, 4) as (normal, distance)
+    m = np.array((m_proj * m_view).to_list(), dtype='f4').T
+    planes = np.array([m[3] + m[0], m[3] - m[0],
+                       m[3] + m[1], m[3] - m[1],
+                       m[3] + m[2], m[3] - m[2]])
+    return planes / np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+
+class FrustumCuller:
+    def __init__(self, camera):
+        self.camera = camera
+        self.enabled = True
+        self.visible = 0
+        self.culled = 0
+
+    def cull(self, centers, radii):
+        # one vectorized pass over every object, returns the visibility mask
+        if not self.enabled:
+            mask = np.ones(len(radii), dtype=bool)
+        else:
+            planes = get_frustum_planes(self.camera.m_proj, self.camera.m_view)
+            distances = centers @ planes[:, :3].T + planes[:, 3]
+            mask = (distances > -radii[:, None]).all(axis=1)
+        self.visible = int(mask.sum())
+        self.culled = len(mask) - self.visible
+        return mask
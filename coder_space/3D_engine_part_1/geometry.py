@@ -0,0 +1,102 @@
+import numpy as np
+
+# every builder returns (vertex_data, index_data):
+# vertex_data is float32 (n, 8) interleaved as '2f 3f 3f' (in_texcoord_0, in_normal, in_position),
+# index_data is uint32 (m,), three indices per triangle
+
+
+def weld(vertex_data):
+    # merge bit-identical vertices and index the survivors
+    vertex_data = np.ascontiguousarray(vertex_data, dtype='f4')
+    rows = vertex_data.view(np.dtype((np.void, vertex_data.dtype.itemsize * vertex_data.shape[1])))
+    _, first, inverse = np.unique(rows.ravel(), return_index=True, return_inverse=True)
+    # keep the vertices in order of first use, it is friendlier to the post-transform cache
+    order = np.argsort(first)
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    return vertex_data[first[order]], remap[inverse.ravel()].astype('u4')
+
+
+def remove_degenerate(vertex_data, index_data, eps=1e-6):
+    triangles = index_data.reshape(-1, 3)
+    p0, p1, p2 = (vertex_data[triangles[:, i], 5:8] for i in range(3))
+    area = np.linalg.norm(np.cross(p1 - p0, p2 - p0), axis=1)
+    return triangles[area > eps * area.max()].ravel()
+
+
+def cube():
+    vertices = np.array([(-1, -1, 1), ( 1, -1,  1), (1,  1,  1), (-1, 1,  1),
+                         (-1, 1, -1), (-1, -1, -1), (1, -1, -1), ( 1, 1, -1)], dtype='f4')
+
+    indices = np.array([(0, 2, 3), (0, 1, 2),
+                        (1, 7, 2), (1, 6, 7),
+                        (6, 5, 4), (4, 7, 6),
+                        (3, 4, 5), (3, 5, 0),
+                        (3, 7, 4), (3, 2, 7),
+                        (0, 6, 1), (0, 5, 6)])
+
+    tex_coord_vertices = np.array([(0, 0), (1, 0), (1, 1), (0, 1)], dtype='f4')
+    tex_coord_indices = np.array([(0, 2, 3), (0, 1, 2),
+                                  (0, 2, 3), (0, 1, 2),
+                                  (0, 1, 2), (2, 3, 0),
+                                  (2, 3, 0), (2, 0, 1),
+                                  (0, 2, 3), (0, 1, 2),
+                                  (3, 1, 2), (3, 0, 1)])
+
+    face_normals = np.array([( 0, 0, 1),
+                             ( 1, 0, 0),
+                             ( 0, 0,-1),
+                             (-1, 0, 0),
+                             ( 0, 1, 0),
+                             ( 0,-1, 0)], dtype='f4')
+
+    vertex_data = np.hstack([tex_coord_vertices[tex_coord_indices.ravel()],
+                             np.repeat(face_normals, 6, axis=0),
+                             vertices[indices.ravel()]])
+    return weld(vertex_data)
+
+
+def grid(size=(1, 1), divisions=(1, 1)):
+    # XZ plane facing +y, centered on the origin
+    nx, nz = divisions
+    u, v = np.meshgrid(np.linspace(0, 1, nx + 1, dtype='f4'), np.linspace(0, 1, nz + 1, dtype='f4'))
+    u, v = u.ravel(), v.ravel()
+
+    vertex_data = np.zeros((len(u), 8), dtype='f4')
+    vertex_data[:, 0] = u
+    vertex_data[:, 1] = v
+    vertex_data[:, 3] = 1
+    vertex_data[:, 5] = (u - 0.5) * size[0]
+    vertex_data[:, 7] = (0.5 - v) * size[1]
+
+    # two counter-clockwise triangles per cell
+    row, col = np.meshgrid(np.arange(nz), np.arange(nx), indexing='ij')
+    i0 = (row * (nx + 1) + col).ravel()
+    i1, i2, i3 = i0 + 1, i0 + nx + 2, i0 + nx + 1
+    index_data = np.stack([i0, i1, i2, i0, i2, i3], axis=1).astype('u4').ravel()
+    return vertex_data, index_data
+
+
+def plane(size=(1, 1)):
+    return grid(size, divisions=(1, 1))
+
+
+def sphere(radius=1.0, sectors=32, stacks=16):
+    u, v = np.meshgrid(np.linspace(0, 1, sectors + 1, dtype='f4'), np.linspace(0, 1, stacks + 1, dtype='f4'))
+    u, v = u.ravel(), v.ravel()
+    theta = u * 2 * np.pi
+    phi = v * np.pi
+
+    normals = np.stack([np.sin(phi) * np.cos(theta), np.cos(phi), -np.sin(phi) * np.sin(theta)], axis=1)
+    vertex_data = np.hstack([np.stack([u, 1 - v], axis=1), normals, normals * radius]).astype('f4')
+
+    row, col = np.meshgrid(np.arange(stacks), np.arange(sectors), indexing='ij')
+    i0 = (row * (sectors + 1) + col).ravel()
+    i1, i2, i3 = i0 + sectors + 1, i0 + sectors + 2, i0 + 1
+    index_data = np.stack([i0, i1, i2, i0, i2, i3], axis=1).astype('u4').ravel()
+    # the pole rows collapse into zero-area triangles
+    return vertex_data, remove_degenerate(vertex_data, index_data)
+
+
+def get_buffers(ctx, vertex_data, index_data):
+    return ctx.buffer(vertex_data), ctx.buffer(index_data)
@@ -1,14 +1,16 @@
 import pygame as pg
 import sys
+import argparse
 from model import *
 from camera import Camera
 from light import Light
 from mesh import Mesh
 from scene import Scene
+from profiler import FrameProfiler
 
 
 class GraphicsEngine:
-    def __init__(self, win_size=(1600, 900)):
+    def __init__(self, win_size=(1600, 900), profile=False, profile_output=None, fps=60, max_frames=None):
         # init pygame modules
         pg.init()
         # window size
@@ -38,19 +40,41 @@ class GraphicsEngine:
         self.mesh = Mesh(self)
         # scene
         self.scene = Scene(self)
+        # fps=0 leaves the frame rate uncapped, max_frames ends the run for benchmarking
+        self.fps = fps
+        self.max_frames = max_frames
+        # set by check_events, the loop quits once the frame is finished
+        self.quit_requested = False
+        # profiling is opt-in, the plain run loop stays untouched
+        self.profiler = None
+        self.profile_output = profile_output
+        if profile:
+            self.profiler = FrameProfiler(self.ctx, ['get_time', 'check_events', 'camera.update', 'render'])
 
     def check_events(self):
         for event in pg.event.get():
             if event.type == pg.QUIT or (event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE):
-                self.mesh.destroy()
-                pg.quit()
-                sys.exit()
+                self.quit_requested = True
+
+    def quit(self):
+        # decode and upload time of every texture that finished loading
+        self.mesh.texture.report()
+        if self.profiler is not None:
+            self.profiler.report(self.mesh.get_state_stats())
+            if self.profile_output:
+                self.profiler.dump(self.profile_output)
+        self.scene.destroy()
+        self.mesh.destroy()
+        pg.quit()
+        sys.exit()
 
     def render(self):
         # clear framebuffer
         self.ctx.clear(color=(0.08, 0.16, 0.18))
         # render scene
+        self.mesh.update()
         self.scene.render()
+        self.mesh.end_frame()
         # swap buffers
         pg.display.flip()
 
@@ -58,16 +82,48 @@ class GraphicsEngine:
         self.time = pg.time.get_ticks() * 0.001
 
     def run(self):
+        if self.profiler is not None:
+            return self.run_profiled()
+
+        frame = 0
         while True:
             self.get_time()
             self.check_events()
             self.camera.update()
             self.render()
-            self.delta_time = self.clock.tick(60)
+            self.delta_time = self.clock.tick(self.fps)
+            frame += 1
+            if frame == self.max_frames or self.quit_requested:
+                self.quit()
+
+    def run_profiled(self):
+        stage = self.profiler.stage
+        while True:
+            with stage('get_time'):
+                self.get_time()
+            with stage('check_events'):
+                self.check_events()
+            with stage('camera.update'):
+                self.camera.update()
+            with stage('render'):
+                self.render()
+            self.delta_time = self.clock.tick(self.fps)
+            # never quit inside a stage, its GPU time query would end on a destroyed context
+            self.profiler.end_frame()
+            if self.profiler.frame == self.max_frames or self.quit_requested:
+                self.quit()
 
 
 if __name__ == '__main__':
-    app = GraphicsEngine()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile', action='store_true', help='time every frame stage on the CPU and GPU')
+    parser.add_argument('--profile-output', help='write the profile to a .csv file or a .json chrome trace on exit')
+    parser.add_argument('--benchmark', type=int, metavar='FRAMES',
+                        help='run uncapped for FRAMES frames and exit')
+    args = parser.parse_args()
+
+    app = GraphicsEngine(profile=args.profile or args.benchmark is not None, profile_output=args.profile_output,
+                         fps=0 if args.benchmark else 60, max_frames=args.benchmark)
     app.run()
 
 
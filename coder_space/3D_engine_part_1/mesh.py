@@ -5,8 +5,24 @@ from texture import Texture
 class Mesh:
     def __init__(self, app):
         self.app = app
-        self.vao = VAO(app.context)
-        self.texture = Texture(app.context)
+        self.vao = VAO(app.ctx)
+        self.texture = Texture(app.ctx)
+
+    def update(self):
+        # upload textures whose background decode has finished
+        self.texture.update()
+
+    def end_frame(self):
+        # roll the per-frame counters of skipped/issued uniform writes and texture binds
+        self.vao.program.stats.end_frame()
+        self.texture.stats.end_frame()
+
+    def get_state_stats(self):
+        uniforms = self.vao.program.stats.last_frame
+        textures = self.texture.stats.last_frame
+        return {'uniforms_issued': uniforms[0], 'uniforms_skipped': uniforms[1],
+                'uniform_bytes': self.vao.program.stats.last_frame_bytes,
+                'textures_issued': textures[0], 'textures_skipped': textures[1]}
 
     def destroy(self):
         self.vao.destroy()
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import struct
+import numpy as np
+
+# magic, sha1 of the source file, vertex count, floats per vertex
+HEADER = struct.Struct('<8s40sII')
+MAGIC = b'MGLMESH1'
+
+
+class MeshCache:
+    # interleaved float32 vertex data stored next to its source as <source>.mesh
+    def __init__(self, path, floats_per_vertex):
+        self.path = path
+        self.cache_path = path + '.mesh'
+        self.floats_per_vertex = floats_per_vertex
+
+    def get_source_hash(self):
+        # without the source (e.g. only the cache was shipped) the cache is trusted as is
+        if not os.path.exists(self.path):
+            return ''
+        sha1 = hashlib.sha1()
+        with open(self.path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    def load(self, key):
+        if not os.path.exists(self.cache_path):
+            return None
+        with open(self.cache_path, 'rb') as file:
+            header = file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            return None
+        magic, source_hash, vertex_count, floats_per_vertex = HEADER.unpack(header)
+        if magic != MAGIC or floats_per_vertex != self.floats_per_vertex:
+            return None
+        if key and source_hash.rstrip(b'\0').decode() != key:
+            return None
+        # memory-mapped, ctx.buffer() reads straight from the page cache
+        return np.memmap(self.cache_path, dtype='f4', mode='r', offset=HEADER.size,
+                         shape=(vertex_count, floats_per_vertex))
+
+    def save(self, key, vertex_data):
+        vertex_data = np.ascontiguousarray(vertex_data, dtype='f4').reshape(-1, self.floats_per_vertex)
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, key.encode().ljust(40, b'\0'), len(vertex_data), self.floats_per_vertex))
+            file.write(vertex_data.tobytes())
+        os.replace(tmp_path, self.cache_path)
+        return vertex_data
+
+    def get_vertex_data(self, loader):
+        key = self.get_source_hash()
+        vertex_data = self.load(key)
+        if vertex_data is None:
+            vertex_data = self.save(key, loader())
+        return vertex_data
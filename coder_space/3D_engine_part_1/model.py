@@ -1,33 +1,59 @@
 import moderngl as mgl
 import numpy as np
 import glm
+from transform import Transform
 
 
 class BaseModel:
-    def __init__(self, app, vao_name, tex_id, pos=(0, 0, 0), rot=(0, 0, 0), scale=(1, 1, 1)):
+    def __init__(self, app, vao_name, tex_id, pos=(0, 0, 0), rot=(0, 0, 0), scale=(1, 1, 1), parent=None):
         self.app = app
-        self.pos = pos
-        self.rot = glm.vec3([glm.radians(a) for a in rot])
-        self.scale = scale
-        self.m_model = self.get_model_matrix()
+        self.transform = Transform(pos, [glm.radians(a) for a in rot], scale,
+                                   parent=parent.transform if parent is not None else None)
         self.tex_id = tex_id
+        self.vao_name = vao_name
         self.vao = app.mesh.vao.vaos[vao_name]
         self.program = self.vao.program
+        self.shader_program = app.mesh.vao.program
         self.camera = self.app.camera
 
     def update(self): ...
 
-    def get_model_matrix(self):
-        m_model = glm.mat4()
-        # translate
-        m_model = glm.translate(m_model, self.pos)
-        # rotate
-        m_model = glm.rotate(m_model, self.rot.z, glm.vec3(0, 0, 1))
-        m_model = glm.rotate(m_model, self.rot.y, glm.vec3(0, 1, 0))
-        m_model = glm.rotate(m_model, self.rot.x, glm.vec3(1, 0, 0))
-        # scale
-        m_model = glm.scale(m_model, self.scale)
-        return m_model
+    @property
+    def pos(self):
+        return self.transform.pos
+
+    @pos.setter
+    def pos(self, value):
+        self.transform.pos = value
+
+    @property
+    def rot(self):
+        return self.transform.rot
+
+    @rot.setter
+    def rot(self, value):
+        self.transform.rot = value
+
+    @property
+    def scale(self):
+        return self.transform.scale
+
+    @scale.setter
+    def scale(self, value):
+        self.transform.scale = value
+
+    @property
+    def texture(self):
+        # looked up on every access, async loads replace the placeholder later
+        return self.app.mesh.texture.textures[self.tex_id]
+
+    @property
+    def m_model(self):
+        # world matrix, only recomputed when this object or one of its parents moved
+        return self.transform.m_world
+
+    def set_uniform(self, name, value):
+        self.shader_program.set_uniform(self.program, name, value)
 
     def render(self):
         self.update()
@@ -35,58 +61,57 @@ class BaseModel:
 
 
 class Cube(BaseModel):
-    def __init__(self, app, vao_name='cube', tex_id=0, pos=(0, 0, 0), rot=(0, 0, 0), scale=(1, 1, 1)):
-        super().__init__(app, vao_name, tex_id, pos, rot, scale)
+    def __init__(self, app, vao_name='cube', tex_id=0, pos=(0, 0, 0), rot=(0, 0, 0), scale=(1, 1, 1),
+                 parent=None):
+        super().__init__(app, vao_name, tex_id, pos, rot, scale, parent)
         self.on_init()
 
     def update(self):
-        self.texture.use()
-        self.program['camPos'].write(self.camera.position)
-        self.program['m_view'].write(self.camera.m_view)
-        self.program['m_model'].write(self.m_model)
+        self.app.mesh.texture.use(self.tex_id)
+        self.set_uniform('camPos', self.camera.position)
+        self.set_uniform('m_view', self.camera.m_view)
+        self.set_uniform('m_model', self.m_model)
 
     def on_init(self):
         # texture
-        self.texture = self.app.mesh.texture_data.textures[self.tex_id]
-        self.program['u_texture_0'] = 0
-        self.texture.use()
+        self.set_uniform('u_texture_0', 0)
+        self.app.mesh.texture.use(self.tex_id)
         # mvp
-        self.program['m_proj'].write(self.camera.m_proj)
-        self.program['m_view'].write(self.camera.m_view)
-        self.program['m_model'].write(self.m_model)
+        self.set_uniform('m_proj', self.camera.m_proj)
+        self.set_uniform('m_view', self.camera.m_view)
+        self.set_uniform('m_model', self.m_model)
         # light
-        self.program['light.position'].write(self.app.light.position)
-        self.program['light.Ia'].write(self.app.light.Ia)
-        self.program['light.Id'].write(self.app.light.Id)
-        self.program['light.Is'].write(self.app.light.Is)
+        self.set_uniform('light.position', self.app.light.position)
+        self.set_uniform('light.Ia', self.app.light.Ia)
+        self.set_uniform('light.Id', self.app.light.Id)
+        self.set_uniform('light.Is', self.app.light.Is)
 
 
 class Cat(BaseModel):
     def __init__(self, app, vao_name='cat', tex_id='cat',
-                 pos=(0, 0, 0), rot=(-90, 0, 0), scale=(1, 1, 1)):
-        super().__init__(app, vao_name, tex_id, pos, rot, scale)
+                 pos=(0, 0, 0), rot=(-90, 0, 0), scale=(1, 1, 1), parent=None):
+        super().__init__(app, vao_name, tex_id, pos, rot, scale, parent)
         self.on_init()
 
     def update(self):
-        self.texture.use()
-        self.program['camPos'].write(self.camera.position)
-        self.program['m_view'].write(self.camera.m_view)
-        self.program['m_model'].write(self.m_model)
+        self.app.mesh.texture.use(self.tex_id)
+        self.set_uniform('camPos', self.camera.position)
+        self.set_uniform('m_view', self.camera.m_view)
+        self.set_uniform('m_model', self.m_model)
 
     def on_init(self):
         # texture
-        self.texture = self.app.mesh.texture_data.textures[self.tex_id]
-        self.program['u_texture_0'] = 0
-        self.texture.use()
+        self.set_uniform('u_texture_0', 0)
+        self.app.mesh.texture.use(self.tex_id)
         # mvp
-        self.program['m_proj'].write(self.camera.m_proj)
-        self.program['m_view'].write(self.camera.m_view)
-        self.program['m_model'].write(self.m_model)
+        self.set_uniform('m_proj', self.camera.m_proj)
+        self.set_uniform('m_view', self.camera.m_view)
+        self.set_uniform('m_model', self.m_model)
         # light
-        self.program['light.position'].write(self.app.light.position)
-        self.program['light.Ia'].write(self.app.light.Ia)
-        self.program['light.Id'].write(self.app.light.Id)
-        self.program['light.Is'].write(self.app.light.Is)
+        self.set_uniform('light.position', self.app.light.position)
+        self.set_uniform('light.Ia', self.app.light.Ia)
+        self.set_uniform('light.Id', self.app.light.Id)
+        self.set_uniform('light.Is', self.app.light.Is)
 
 
 
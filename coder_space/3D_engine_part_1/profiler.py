@@ -0,0 +1,125 @@
+import csv
+import json
+import time
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+class ProfileStage:
+    # reusable context manager, nothing is allocated while timing a frame
+    def __init__(self, profiler, index, ctx, latency):
+        self.profiler = profiler
+        self.index = index
+        # GPU results are read `latency` frames late so the query never stalls the pipeline
+        self.queries = [ctx.query(time=True) for _ in range(latency)]
+        self.query = None
+        self.start = 0.0
+
+    def __enter__(self):
+        profiler = self.profiler
+        frame = profiler.frame
+        self.query = self.queries[frame % len(self.queries)]
+        if frame >= len(self.queries):
+            row = (frame - len(self.queries)) % profiler.capacity
+            profiler.gpu[row, self.index] = self.query.elapsed * 1e-6
+        self.start = time.perf_counter()
+        self.query.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        self.query.__exit__(*args)
+        profiler = self.profiler
+        row = profiler.frame % profiler.capacity
+        profiler.starts[row, self.index] = self.start - profiler.origin
+        profiler.cpu[row, self.index] = (time.perf_counter() - self.start) * 1000
+
+
+class FrameProfiler:
+    def __init__(self, ctx, stage_names, capacity=1024, latency=3):
+        self.stage_names = list(stage_names)
+        self.capacity = capacity
+        self.latency = latency
+        # ring buffers in milliseconds, one row per frame, one column per stage
+        self.cpu = np.zeros((capacity, len(self.stage_names)))
+        self.gpu = np.zeros((capacity, len(self.stage_names)))
+        self.starts = np.zeros((capacity, len(self.stage_names)))
+        self.frame_times = np.zeros(capacity)
+        self.frame = 0
+        self.origin = time.perf_counter()
+        self.frame_start = self.origin
+        self.stages = {name: ProfileStage(self, i, ctx, latency) for i, name in enumerate(self.stage_names)}
+
+    def stage(self, name):
+        return self.stages[name]
+
+    def end_frame(self):
+        now = time.perf_counter()
+        self.frame_times[self.frame % self.capacity] = (now - self.frame_start) * 1000
+        self.frame_start = now
+        self.frame += 1
+
+    def get_rows(self, gpu=False):
+        # chronological slice of the ring, GPU rows lag `latency` frames behind
+        count = self.frame - self.latency if gpu else self.frame
+        count = max(0, min(count, self.capacity))
+        last = (self.frame - self.latency if gpu else self.frame) % self.capacity
+        return (np.arange(last - count, last) % self.capacity) if count else np.arange(0)
+
+    def get_percentiles(self):
+        # {stage: {'cpu': (p50, p95, p99), 'gpu': (...)}} plus 'frame', in ms
+        cpu_rows, gpu_rows = self.get_rows(), self.get_rows(gpu=True)
+        result = {}
+        for i, name in enumerate(self.stage_names):
+            result[name] = {
+                'cpu': tuple(np.percentile(self.cpu[cpu_rows, i], PERCENTILES)) if len(cpu_rows) else None,
+                'gpu': tuple(np.percentile(self.gpu[gpu_rows, i], PERCENTILES)) if len(gpu_rows) else None,
+            }
+        result['frame'] = {'cpu': tuple(np.percentile(self.frame_times[cpu_rows], PERCENTILES))
+                           if len(cpu_rows) else None, 'gpu': None}
+        return result
+
+    def report(self, state_stats=None):
+        print(f'{self.frame} frames, p50 / p95 / p99 in ms')
+        for name, timings in self.get_percentiles().items():
+            line = f'  {name:<14}'
+            for kind in ('cpu', 'gpu'):
+                if timings[kind] is not None:
+                    line += f' {kind} ' + ' / '.join(f'{value:7.3f}' for value in timings[kind])
+            print(line)
+        if state_stats:
+            # counters of the last frame, e.g. Mesh.get_state_stats()
+            print('  last frame     ' + ', '.join(f'{name} {value}' for name, value in state_stats.items()))
+
+    def dump_csv(self, path):
+        # GPU columns of the newest `latency` frames are not resolved yet and stay 0
+        rows = self.get_rows()
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['frame', 'frame_ms'] + [f'{name}_cpu_ms' for name in self.stage_names] +
+                            [f'{name}_gpu_ms' for name in self.stage_names])
+            for n, row in enumerate(rows):
+                writer.writerow([self.frame - len(rows) + n, self.frame_times[row],
+                                 *self.cpu[row], *self.gpu[row]])
+
+    def dump_chrome_trace(self, path):
+        # load in chrome://tracing or ui.perfetto.dev, GPU spans are drawn at their CPU submit time
+        events = []
+        gpu_rows = set(self.get_rows(gpu=True).tolist())
+        for row in self.get_rows():
+            for i, name in enumerate(self.stage_names):
+                ts = self.starts[row, i] * 1e6
+                events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 'cpu',
+                               'ts': ts, 'dur': self.cpu[row, i] * 1000})
+                if row in gpu_rows:
+                    events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 'gpu',
+                                   'ts': ts, 'dur': self.gpu[row, i] * 1000})
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+    def dump(self, path):
+        if path.endswith('.json'):
+            self.dump_chrome_trace(path)
+        else:
+            self.dump_csv(path)
+
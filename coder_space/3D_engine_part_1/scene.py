@@ -1,11 +1,16 @@
 from model import *
+from batch import BatchRenderer
 
 
 class Scene:
-    def __init__(self, app):
+    def __init__(self, app, n=30, s=3):
         self.app = app
+        # cube grid half-extent and spacing, n // s * 2 cubes per side
+        self.n, self.s = n, s
         self.objects = []
+        self.batch = BatchRenderer(app)
         self.load()
+        self.batch.build(self.objects)
 
     def add_object(self, obj):
         self.objects.append(obj)
@@ -14,7 +19,7 @@ class Scene:
         app = self.app
         add = self.add_object
 
-        n, s = 30, 3
+        n, s = self.n, self.s
         for x in range(-n, n, s):
             for z in range(-n, n, s):
                 add(Cube(app, pos=(x, -s, z)))
@@ -22,5 +27,7 @@ class Scene:
         add(Cat(app, pos=(0, -2, -10)))
 
     def render(self):
-        for obj in self.objects:
-            obj.render()
\ No newline at end of file
+        self.batch.render()
+
+    def destroy(self):
+        self.batch.destroy()
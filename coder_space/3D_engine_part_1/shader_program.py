@@ -1,20 +1,66 @@
+import hashlib
+import time
+from state import StateStats
 
 
 class ShaderProgram:
     def __init__(self, ctx):
         self.ctx = ctx
+        # sha1 of the shader sources -> compiled program, shared by every name with the same sources
+        self.cache = {}
+        # name -> (seconds, cache hit)
+        self.timings = {}
         self.programs = {}
         self.programs['default'] = self.get_program('default')
+        self.programs['instanced'] = self.get_program('instanced', fragment_name='default')
+        self.report()
+        # last value written per (program, uniform)
+        self.uniforms = {}
+        self.stats = StateStats()
+
+    def get(self, shader_program_name, fragment_name=None):
+        # registered programs are handed out as is, unknown names are loaded on first request
+        if shader_program_name not in self.programs:
+            self.programs[shader_program_name] = self.get_program(shader_program_name, fragment_name)
+        return self.programs[shader_program_name]
+
+    def get_program(self, shader_program_name, fragment_name=None):
+        start = time.perf_counter()
+        fragment_name = fragment_name or shader_program_name
 
-    def get_program(self, shader_program_name):
         with open(f'shaders/{shader_program_name}.vert') as file:
             vertex_shader = file.read()
 
-        with open(f'shaders/{shader_program_name}.frag') as file:
+        with open(f'shaders/{fragment_name}.frag') as file:
             fragment_shader = file.read()
 
-        program = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
-        return program
+        key = hashlib.sha1(f'{vertex_shader}\0{fragment_shader}'.encode()).hexdigest()
+        cache_hit = key in self.cache
+        if not cache_hit:
+            self.cache[key] = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
+        self.timings[shader_program_name] = (time.perf_counter() - start, cache_hit)
+        return self.cache[key]
+
+    def report(self):
+        for name, (seconds, cache_hit) in self.timings.items():
+            print(f'program {name!r}: {"cache hit" if cache_hit else "compiled"} in {seconds * 1000:.2f} ms')
+
+    def set_uniform(self, program, name, value):
+        # glm types are compared as raw bytes, plain python scalars by value
+        data = value if isinstance(value, (int, float)) else value.to_bytes()
+        key = (program.glo, name)
+        if self.uniforms.get(key) == data:
+            self.stats.count(issued=False)
+            return
+        if isinstance(data, bytes):
+            program[name].write(data)
+        else:
+            program[name].value = data
+        self.uniforms[key] = data
+        self.stats.count(issued=True, nbytes=len(data) if isinstance(data, bytes) else 4)
 
     def destroy(self):
-        [program.release() for program in self.programs.values()]
+        [program.release() for program in self.cache.values()]
+        self.cache = {}
+        self.programs = {}
+        self.uniforms = {}
@@ -0,0 +1,21 @@
+#version 330 core
+
+layout (location = 0) in vec2 in_texcoord_0;
+layout (location = 1) in vec3 in_normal;
+layout (location = 2) in vec3 in_position;
+layout (location = 3) in mat4 in_model;
+
+out vec2 uv_0;
+out vec3 normal;
+out vec3 fragPos;
+
+uniform mat4 m_proj;
+uniform mat4 m_view;
+
+
+void main() {
+    uv_0 = in_texcoord_0;
+    fragPos = vec3(in_model * vec4(in_position, 1.0));
+    normal = mat3(transpose(inverse(in_model))) * normalize(in_normal);
+    gl_Position = m_proj * m_view * in_model * vec4(in_position, 1.0);
+}
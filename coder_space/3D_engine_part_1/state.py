@@ -0,0 +1,22 @@
+
+
+class StateStats:
+    # issued vs. skipped (redundant) GL state changes, rolled over once per frame
+    def __init__(self):
+        self.issued = 0
+        self.skipped = 0
+        self.uploaded_bytes = 0
+        self.last_frame = (0, 0)
+        self.last_frame_bytes = 0
+
+    def count(self, issued, nbytes=0):
+        if issued:
+            self.issued += 1
+            self.uploaded_bytes += nbytes
+        else:
+            self.skipped += 1
+
+    def end_frame(self):
+        self.last_frame = (self.issued, self.skipped)
+        self.last_frame_bytes = self.uploaded_bytes
+        self.issued = self.skipped = self.uploaded_bytes = 0
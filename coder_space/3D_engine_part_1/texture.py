@@ -1,21 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import pygame as pg
 import moderngl as mgl
+from state import StateStats
+
+
+def decode_image(path):
+    # runs on a worker, only returns picklable data so it also works in a process pool
+    start = time.perf_counter()
+    image = pg.image.load(path)
+    data = pg.image.tostring(image, 'RGB', True)  # flipped vertically for GL
+    return image.get_size(), data, time.perf_counter() - start
 
 
 class Texture:
-    def __init__(self, ctx):
+    def __init__(self, ctx, use_processes=False, max_workers=4):
         self.ctx = ctx
         self.textures = {}
-        self.textures[0] = self.get_texture(path='textures/img.png')
-        self.textures[1] = self.get_texture(path='textures/img_1.png')
-        self.textures[2] = self.get_texture(path='textures/img_2.png')
-        self.textures['cat'] = self.get_texture(path='objects/cat/20430_cat_diff_v1.jpg')
-
-    def get_texture(self, path):
-        texture = pg.image.load(path).convert()
-        texture = pg.transform.flip(texture, flip_x=False, flip_y=True)
-        texture = self.ctx.texture_data(size=texture.get_size(), components=3,
-                                        data=pg.image.tostring(texture, 'RGB'))
+        # texture glo bound per texture unit
+        self.bound = {}
+        self.stats = StateStats()
+        # decodes run on a pool, uploads happen in update() on the GL thread
+        pool = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self.executor = pool(max_workers=max_workers)
+        self.pending = {}
+        # tex_id -> (decode seconds, upload seconds)
+        self.timings = {}
+        self.placeholder = self.get_placeholder()
+        self.load_texture(0, path='textures/img.png')
+        self.load_texture(1, path='textures/img_1.png')
+        self.load_texture(2, path='textures/img_2.png')
+        self.load_texture('cat', path='objects/cat/20430_cat_diff_v1.jpg')
+
+    def get_placeholder(self):
+        texture = self.ctx.texture(size=(1, 1), components=3, data=bytes((128, 128, 128)))
+        texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        return texture
+
+    def load_texture(self, tex_id, path):
+        self.textures[tex_id] = self.placeholder
+        future = self.executor.submit(decode_image, path)
+        self.pending[future] = tex_id
+
+    def update(self):
+        # swap in every texture whose decode finished since the last frame
+        for future in [future for future in self.pending if future.done()]:
+            tex_id = self.pending.pop(future)
+            size, data, decode_time = future.result()
+            start = time.perf_counter()
+            self.textures[tex_id] = self.get_texture(size, data)
+            self.timings[tex_id] = (decode_time, time.perf_counter() - start)
+
+    def wait(self):
+        # block until every pending texture is uploaded
+        while self.pending:
+            next(iter(self.pending)).result()
+            self.update()
+
+    def report(self):
+        for tex_id, (decode_time, upload_time) in self.timings.items():
+            print(f'texture {tex_id!r}: decode {decode_time * 1000:.1f} ms, upload {upload_time * 1000:.1f} ms')
+
+    def get_texture(self, size, data):
+        texture = self.ctx.texture(size=size, components=3, data=data)
         # mipmaps
         texture.filter = (mgl.LINEAR_MIPMAP_LINEAR, mgl.LINEAR)
         texture.build_mipmaps()
@@ -23,5 +70,16 @@ class Texture:
         texture.anisotropy = 32.0
         return texture
 
+    def use(self, tex_id, location=0):
+        texture = self.textures[tex_id]
+        if self.bound.get(location) == texture.glo:
+            self.stats.count(issued=False)
+            return
+        texture.use(location=location)
+        self.bound[location] = texture.glo
+        self.stats.count(issued=True)
+
     def destroy(self):
-        [tex.release() for tex in self.textures.values()]
\ No newline at end of file
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        [tex.release() for tex in self.textures.values() if tex is not self.placeholder]
+        self.placeholder.release()
@@ -0,0 +1,120 @@
+import glm
+import numpy as np
+
+
+class Transform:
+    def __init__(self, pos=(0, 0, 0), rot=(0, 0, 0), scale=(1, 1, 1), parent=None):
+        # rot is in radians, applied z -> y -> x like the original BaseModel chain
+        self._pos = glm.vec3(pos)
+        self._rot = glm.vec3(rot)
+        self._scale = glm.vec3(scale)
+        self.parent = None
+        self.children = []
+        self._m_local = glm.mat4()
+        self._m_world = glm.mat4()
+        self._local_dirty = True
+        self._world_dirty = True
+        # bumped on every invalidation so consumers can tell which matrices to re-upload
+        self.version = 0
+        if parent is not None:
+            parent.add_child(self)
+
+    # the setters only flag the node, matrices are rebuilt lazily on first read.
+    # assign a new value (t.pos = ...), in-place edits of the returned vector are not tracked
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, value):
+        self._pos = glm.vec3(value)
+        self.mark_dirty()
+
+    @property
+    def rot(self):
+        return self._rot
+
+    @rot.setter
+    def rot(self, value):
+        self._rot = glm.vec3(value)
+        self.mark_dirty()
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, value):
+        self._scale = glm.vec3(value)
+        self.mark_dirty()
+
+    def add_child(self, child):
+        if child.parent is not None:
+            child.parent.children.remove(child)
+        child.parent = self
+        self.children.append(child)
+        child.invalidate_world()
+
+    def remove_child(self, child):
+        self.children.remove(child)
+        child.parent = None
+        child.invalidate_world()
+
+    def mark_dirty(self):
+        self._local_dirty = True
+        self.invalidate_world()
+
+    def invalidate_world(self):
+        self.version += 1
+        # a dirty node always has a dirty subtree, no need to walk it again
+        if self._world_dirty:
+            return
+        self._world_dirty = True
+        for child in self.children:
+            child.invalidate_world()
+
+    @property
+    def dirty(self):
+        return self._world_dirty
+
+    def get_local_matrix(self):
+        m_model = glm.mat4()
+        # translate
+        m_model = glm.translate(m_model, self._pos)
+        # rotate
+        m_model = glm.rotate(m_model, self._rot.z, glm.vec3(0, 0, 1))
+        m_model = glm.rotate(m_model, self._rot.y, glm.vec3(0, 1, 0))
+        m_model = glm.rotate(m_model, self._rot.x, glm.vec3(1, 0, 0))
+        # scale
+        m_model = glm.scale(m_model, self._scale)
+        return m_model
+
+    @property
+    def m_local(self):
+        if self._local_dirty:
+            self._m_local = self.get_local_matrix()
+            self._local_dirty = False
+        return self._m_local
+
+    @property
+    def m_world(self):
+        if self._world_dirty:
+            if self.parent is None:
+                self._m_world = self.m_local
+            else:
+                self._m_world = self.parent.m_world * self.m_local
+            self._world_dirty = False
+        return self._m_world
+
+    def walk(self):
+        # depth first, self included
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def pack_world_matrices(self):
+        # (n, 4, 4) column-major float32 world matrices for the whole subtree, ready for buffer.write
+        data = b''.join(node.m_world.to_bytes() for node in self.walk())
+        return np.frombuffer(data, dtype='f4').reshape(-1, 4, 4)
@@ -11,16 +11,24 @@ class VAO:
 
         # cube vao
         self.vaos['cube'] = self.get_vao(
-            program=self.program.programs['default'],
+            program=self.program.get('default'),
             vbo = self.vbo.vbos['cube'])
 
         # cat vao
         self.vaos['cat'] = self.get_vao(
-            program=self.program.programs['default'],
+            program=self.program.get('default'),
             vbo=self.vbo.vbos['cat'])
 
     def get_vao(self, program, vbo):
-        vao = self.ctx.vertex_array(program, [(vbo.vbo, vbo.format, *vbo.attribs)])
+        vao = self.ctx.vertex_array(program, [(vbo.vbo, vbo.format, *vbo.attribs)],
+                                    index_buffer=vbo.ibo)
+        return vao
+
+    def get_instanced_vao(self, program, vbo, instance_vbo):
+        # one mat4 per instance, advanced once per instance instead of per vertex
+        vao = self.ctx.vertex_array(program, [(vbo.vbo, vbo.format, *vbo.attribs),
+                                              (instance_vbo, '16f/i', 'in_model')],
+                                    index_buffer=vbo.ibo)
         return vao
 
     def destroy(self):
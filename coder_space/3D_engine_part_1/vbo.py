@@ -1,6 +1,9 @@
 import numpy as np
 import moderngl as mgl
 import pywavefront
+from mesh_cache import MeshCache
+import geometry
+from culling import get_bounding_sphere
 
 
 class VBO:
@@ -16,7 +19,10 @@ class VBO:
 class BaseVBO:
     def __init__(self, ctx):
         self.ctx = ctx
+        # set by get_vertex_data() for indexed meshes
+        self.index_data = None
         self.vbo = self.get_vbo()
+        self.ibo = self.get_ibo()
         self.format: str = None
         self.attribs: list = None
 
@@ -24,11 +30,21 @@ class BaseVBO:
 
     def get_vbo(self):
         vertex_data = self.get_vertex_data()
+        # '2f 3f 3f' layout, in_position is the last 3 floats
+        positions = np.asarray(vertex_data, dtype='f4').reshape(-1, 8)[:, 5:8]
+        self.center, self.radius, self.aabb_min, self.aabb_max = get_bounding_sphere(positions)
         vbo = self.ctx.buffer(vertex_data)
         return vbo
 
+    def get_ibo(self):
+        if self.index_data is None:
+            return None
+        return self.ctx.buffer(self.index_data)
+
     def destroy(self):
         self.vbo.release()
+        if self.ibo is not None:
+            self.ibo.release()
 
 
 class CubeVBO(BaseVBO):
@@ -37,42 +53,9 @@ class CubeVBO(BaseVBO):
         self.format = '2f 3f 3f'
         self.attribs = ['in_texcoord_0', 'in_normal', 'in_position']
 
-    @staticmethod
-    def get_data(vertices, indices):
-        data = [vertices[ind] for triangle in indices for ind in triangle]
-        return np.array(data, dtype='f4')
-
     def get_vertex_data(self):
-        vertices = [(-1, -1, 1), ( 1, -1,  1), (1,  1,  1), (-1, 1,  1),
-                    (-1, 1, -1), (-1, -1, -1), (1, -1, -1), ( 1, 1, -1)]
-
-        indices = [(0, 2, 3), (0, 1, 2),
-                   (1, 7, 2), (1, 6, 7),
-                   (6, 5, 4), (4, 7, 6),
-                   (3, 4, 5), (3, 5, 0),
-                   (3, 7, 4), (3, 2, 7),
-                   (0, 6, 1), (0, 5, 6)]
-        vertex_data = self.get_data(vertices, indices)
-
-        tex_coord_vertices = [(0, 0), (1, 0), (1, 1), (0, 1)]
-        tex_coord_indices = [(0, 2, 3), (0, 1, 2),
-                             (0, 2, 3), (0, 1, 2),
-                             (0, 1, 2), (2, 3, 0),
-                             (2, 3, 0), (2, 0, 1),
-                             (0, 2, 3), (0, 1, 2),
-                             (3, 1, 2), (3, 0, 1),]
-        tex_coord_data = self.get_data(tex_coord_vertices, tex_coord_indices)
-
-        normals = [( 0, 0, 1) * 6,
-                   ( 1, 0, 0) * 6,
-                   ( 0, 0,-1) * 6,
-                   (-1, 0, 0) * 6,
-                   ( 0, 1, 0) * 6,
-                   ( 0,-1, 0) * 6,]
-        normals = np.array(normals, dtype='f4').reshape(36, 3)
-
-        vertex_data = np.hstack([normals, vertex_data])
-        vertex_data = np.hstack([tex_coord_data, vertex_data])
+        # 24 welded vertices + 36 indices instead of 36 expanded vertices
+        vertex_data, self.index_data = geometry.cube()
         return vertex_data
 
 
@@ -83,6 +66,12 @@ class CatVBO(BaseVBO):
         self.attribs = ['in_texcoord_0', 'in_normal', 'in_position']
 
     def get_vertex_data(self):
+        # 2f 3f 3f -> 8 floats per vertex, OBJ parsing only runs when the cache is missing or stale
+        cache = MeshCache('objects/cat/20430_Cat_v1_NEW.obj', floats_per_vertex=8)
+        return cache.get_vertex_data(self.load_obj)
+
+    @staticmethod
+    def load_obj():
         objs = pywavefront.Wavefront('objects/cat/20430_Cat_v1_NEW.obj', cache=True, parse=True)
         obj = objs.materials.popitem()[1]
         vertex_data = obj.vertices
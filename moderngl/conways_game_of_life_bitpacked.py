@@ -0,0 +1,247 @@
+"""
+A bit packed Game of Life rendering to framebuffers.
+
+conways_game_of_life.py stores one float per cell and copies
+the new state through a buffer into the texture every generation.
+Here every texel of an unsigned integer texture holds 32 cells of a row
+and a generation is one fullscreen draw into the other texture of a
+ping-pong pair. There is no copy between generations, so we can
+run several generations per frame on huge maps:
+
+    python conways_game_of_life_bitpacked.py --map-size 8192 --steps 8
+
+The fragment shader counts the 8 neighbours of all 32 cells of a
+word at once using bitwise adders (bit-sliced counters) and then
+applies a birth/survival rule. The rule is given as two masks
+where bit n means "n neighbours":
+
+* Standard rule B3/S23: birth = 1 << 3, survive = (1 << 2) | (1 << 3)
+* Labyrinth B3/S234 (conways_game_of_life_labyrinth.py)
+
+The map wraps around at the edges like the other examples.
+Generations per second are printed every second.
+"""
+import time
+
+import numpy as np
+
+import moderngl
+from ported._example import Example
+
+RULE_STANDARD = (1 << 3, (1 << 2) | (1 << 3))
+RULE_LABYRINTH = (1 << 3, (1 << 2) | (1 << 3) | (1 << 4))
+
+
+class BitPackedLife:
+    """Game of Life state as 32 cells per texel in a pair of R32UI textures.
+
+    Cell (x, y) is bit ``x % 32`` of texel ``(x // 32, y)``.
+    """
+    def __init__(self, ctx, size, rule=RULE_STANDARD):
+        """
+        Args:
+            ctx: moderngl context
+            size: (width, height) in cells. Width must be a multiple of 32
+            rule: (birth mask, survive mask) as bit masks of neighbour counts
+        """
+        self.ctx = ctx
+        self.width, self.height = size
+        if self.width % 32:
+            raise ValueError("width must be a multiple of 32")
+        self.words = self.width // 32
+        self.generation = 0
+
+        self.step_prog = self.ctx.program(
+            vertex_shader='''
+                #version 330
+
+                in vec2 in_vert;
+
+                void main() {
+                    gl_Position = vec4(in_vert, 0.0, 1.0);
+                }
+            ''',
+            fragment_shader='''
+                #version 330
+
+                uniform usampler2D Texture;
+                uniform uint birth;
+                uniform uint survive;
+
+                out uint next;
+
+                uint word(ivec2 pos, ivec2 size) {
+                    // texelFetch has no wrap mode
+                    return texelFetch(Texture, (pos + size) % size, 0).r;
+                }
+
+                // Bit-sliced 4 bit counter, adds one neighbour bit to all 32 cells
+                void add(uint n, inout uint s0, inout uint s1, inout uint s2, inout uint s3) {
+                    uint c0 = s0 & n;
+                    s0 ^= n;
+                    uint c1 = s1 & c0;
+                    s1 ^= c0;
+                    uint c2 = s2 & c1;
+                    s2 ^= c1;
+                    s3 |= c2;
+                }
+
+                void main() {
+                    ivec2 size = textureSize(Texture, 0);
+                    ivec2 pos = ivec2(gl_FragCoord.xy);
+                    uint s0 = 0u, s1 = 0u, s2 = 0u, s3 = 0u;
+                    uint alive = 0u;
+
+                    for (int dy = -1; dy <= 1; dy++) {
+                        uint l = word(pos + ivec2(-1, dy), size);
+                        uint c = word(pos + ivec2(0, dy), size);
+                        uint r = word(pos + ivec2(1, dy), size);
+                        // cells to the left and right of every bit
+                        add((c << 1) | (l >> 31), s0, s1, s2, s3);
+                        add((c >> 1) | (r << 31), s0, s1, s2, s3);
+                        if (dy == 0) {
+                            alive = c;
+                        } else {
+                            add(c, s0, s1, s2, s3);
+                        }
+                    }
+
+                    // Bits of the cells whose neighbour count is allowed by the rule
+                    uint born = 0u, stays = 0u;
+                    for (uint n = 0u; n <= 8u; n++) {
+                        uint eq = ((n & 1u) != 0u ? s0 : ~s0) & ((n & 2u) != 0u ? s1 : ~s1) &
+                                  ((n & 4u) != 0u ? s2 : ~s2) & ((n & 8u) != 0u ? s3 : ~s3);
+                        if ((birth & (1u << n)) != 0u) born |= eq;
+                        if ((survive & (1u << n)) != 0u) stays |= eq;
+                    }
+                    next = (alive & stays) | (~alive & born);
+                }
+            ''',
+        )
+        self.rule = rule
+
+        self.textures = [self.ctx.texture((self.words, self.height), 1, dtype='u4') for _ in range(2)]
+        for texture in self.textures:
+            texture.filter = moderngl.NEAREST, moderngl.NEAREST
+        self.fbos = [self.ctx.framebuffer(color_attachments=[texture]) for texture in self.textures]
+
+        self.vbo = self.ctx.buffer(np.array([-1, -1, -1, 1, 1, -1, 1, 1], dtype='f4'))
+        self.vao = self.ctx.simple_vertex_array(self.step_prog, self.vbo, 'in_vert')
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, value):
+        self._rule = value
+        self.step_prog['birth'].value = value[0]
+        self.step_prog['survive'].value = value[1]
+
+    @property
+    def texture(self):
+        """Texture holding the current generation"""
+        return self.textures[0]
+
+    def write(self, cells):
+        """Upload a (height, width) array of cells. Non-zero means alive"""
+        packed = np.packbits(np.asarray(cells, dtype=bool), axis=1, bitorder='little')
+        self.texture.write(np.ascontiguousarray(packed).view('<u4'))
+
+    def write_random(self, seed=None):
+        rng = np.random.default_rng(seed)
+        self.texture.write(rng.integers(0, 1 << 32, size=(self.height, self.words), dtype='u4'))
+
+    def read(self):
+        """Current generation as a (height, width) bool array"""
+        packed = np.frombuffer(self.texture.read(), dtype='<u4').reshape(self.height, self.words)
+        return np.unpackbits(packed.view('u1'), axis=1, bitorder='little').astype(bool)
+
+    def step(self, generations=1):
+        """Advance the given number of generations on the gpu.
+        Changes the bound framebuffer.
+        """
+        for _ in range(generations):
+            self.fbos[1].use()
+            self.textures[0].use(location=0)
+            self.vao.render(moderngl.TRIANGLE_STRIP)
+            self.textures.reverse()
+            self.fbos.reverse()
+        self.generation += generations
+
+
+class ConwayBitPacked(Example):
+    title = "Conway's Game of Life (bit packed)"
+    window_size = 800, 800
+    aspect_ratio = 1.0
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        size = self.argv.map_size
+        self.steps = self.argv.steps
+        rule = RULE_LABYRINTH if self.argv.labyrinth else RULE_STANDARD
+        self.life = BitPackedLife(self.ctx, (size, size), rule=rule)
+        self.life.write_random()
+
+        # Unpacks the bit of the cell under each pixel
+        self.display_prog = self.ctx.program(
+            vertex_shader='''
+                #version 330
+
+                in vec2 in_vert;
+
+                out vec2 v_text;
+
+                void main() {
+                    v_text = in_vert * 0.5 + 0.5;
+                    gl_Position = vec4(in_vert, 0.0, 1.0);
+                }
+            ''',
+            fragment_shader='''
+                #version 330
+
+                uniform usampler2D Texture;
+
+                in vec2 v_text;
+                out vec4 f_color;
+
+                void main() {
+                    ivec2 size = textureSize(Texture, 0);
+                    ivec2 cell = ivec2(v_text * vec2(size.x * 32, size.y));
+                    uint alive = (texelFetch(Texture, ivec2(cell.x / 32, cell.y), 0).r >> uint(cell.x % 32)) & 1u;
+                    // Living cells are black like in the other examples
+                    f_color = vec4(vec3(1.0 - float(alive)), 1.0);
+                }
+            ''',
+        )
+        self.vao = self.ctx.simple_vertex_array(self.display_prog, self.life.vbo, 'in_vert')
+
+        self.report_time = time.perf_counter()
+        self.report_generation = 0
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument('--map-size', type=int, default=8192, help="Width and height of the map (multiple of 32)")
+        parser.add_argument('--steps', type=int, default=1, help="Generations per frame")
+        parser.add_argument('--labyrinth', action="store_true", default=False, help="Use the B3/S234 rule")
+
+    def render(self, time_, frame_time):
+        self.life.step(self.steps)
+
+        self.wnd.fbo.use()
+        self.ctx.clear(1.0, 1.0, 1.0)
+        self.life.texture.use(location=0)
+        self.vao.render(moderngl.TRIANGLE_STRIP)
+
+        now = time.perf_counter()
+        if now - self.report_time >= 1.0:
+            generations = self.life.generation - self.report_generation
+            rate = generations / (now - self.report_time)
+            print(f"{rate:.1f} generations/sec, "
+                  f"{rate * self.life.width * self.life.height / 1e9:.2f} Gcells/sec")
+            self.report_time, self.report_generation = now, self.life.generation
+
+
+if __name__ == '__main__':
+    ConwayBitPacked.run()
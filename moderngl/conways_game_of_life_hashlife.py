@@ -0,0 +1,124 @@
+"""
+Game of Life on an unbounded plane using the hashlife CPU engine.
+
+conways_game_of_life.py computes a small toroidal map on the GPU.
+Here the pattern lives in the memoized quadtree of hashlife.py
+that can jump 2^k generations at once and only stores the
+non-empty parts of the plane. Every update we copy the visible
+400 x 400 window into the display texture of the original example:
+
+    python conways_game_of_life_hashlife.py --jump 10
+
+--jump K advances 2^K generations per update (default 1 generation).
+--labyrinth uses the B3/S234 rule of conways_game_of_life_labyrinth.py.
+
+--check first runs a random soup on the CPU and on the GPU
+(the transform feedback shader of the original example and the
+bit packed engine) and reports if the results differ.
+The GPU map is a torus, so the soup gets a border wider than
+the number of generations and never reaches the edges.
+"""
+import time
+
+import numpy as np
+
+from conways_game_of_life import Conway
+from conways_game_of_life_bitpacked import BitPackedLife, RULE_STANDARD, RULE_LABYRINTH
+from hashlife import HashLife
+
+LIVING = 0.0
+DEAD = 1.0
+
+
+class ConwayHashLife(Conway):
+    title = "Conway's Game of Life (hashlife)"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        self.rule = RULE_LABYRINTH if self.argv.labyrinth else RULE_STANDARD
+        self.jump = self.argv.jump
+        if self.argv.check:
+            self.check_gpu()
+
+        # Random soup centered on the origin. The view is centered on the origin as well
+        soup = np.random.rand(self.argv.soup, self.argv.soup) < 0.5
+        self.life = HashLife(self.rule)
+        self.life.set_cells(soup, -self.argv.soup // 2, -self.argv.soup // 2)
+        self.view = -self.width // 2, -self.height // 2
+        self.upload()
+
+        self.step_time = 0
+        self.report_time = 0
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument('--jump', type=int, default=0, help="Advance 2^JUMP generations per update")
+        parser.add_argument('--soup', type=int, default=64, help="Size of the initial random soup")
+        parser.add_argument('--labyrinth', action="store_true", default=False, help="Use the B3/S234 rule")
+        parser.add_argument('--check', action="store_true", default=False, help="Compare with the GPU engines")
+
+    def upload(self):
+        """Write the visible window of the pattern into the display texture"""
+        window = self.life.get_window(*self.view, self.width, self.height)
+        self.texture.write(np.where(window, LIVING, DEAD).astype('f4'))
+
+    def render(self, time_, frame_time):
+        self.ctx.clear(1.0, 1.0, 1.0)
+        self.texture.use(location=0)
+
+        if time_ - self.last_updated > self.update_delay:
+            start = time.perf_counter()
+            self.life.step_pow2(self.jump)
+            self.step_time = time.perf_counter() - start
+            self.upload()
+            self.last_updated = time_
+
+        if time_ - self.report_time > 1.0:
+            print(f"generation {self.life.generation}, population {self.life.population}, "
+                  f"step {self.step_time * 1000:.2f} ms")
+            self.report_time = time_
+
+        self.vao.render(self.ctx.TRIANGLE_STRIP)
+
+    def check_gpu(self, generations=64, soup_size=64):
+        """Run the same soup on the CPU and the GPU engines and print the differences"""
+        soup = np.random.rand(soup_size, soup_size) < 0.5
+
+        life = HashLife(self.rule)
+        life.set_cells(soup)
+        life.step(generations)
+
+        results = {}
+        # Bit packed engine. Width is a multiple of 32 with a border of the number of generations
+        size = (soup_size + 2 * generations + 31) // 32 * 32
+        offset = (size - soup_size) // 2
+        cells = np.zeros((size, size), dtype=bool)
+        cells[offset:offset + soup_size, offset:offset + soup_size] = soup
+        packed = BitPackedLife(self.ctx, (size, size), rule=self.rule)
+        packed.write(cells)
+        packed.step(generations)
+        results['bit packed'] = packed.read(), life.get_window(-offset, -offset, size, size)
+        self.wnd.fbo.use()
+
+        # The transform feedback shader of the original example only knows the standard rule
+        if self.rule == RULE_STANDARD:
+            offset = (self.width - soup_size) // 2
+            cells = np.zeros((self.height, self.width), dtype=bool)
+            cells[offset:offset + soup_size, offset:offset + soup_size] = soup
+            self.texture.write(np.where(cells, LIVING, DEAD).astype('f4'))
+            self.texture.use(location=0)
+            for _ in range(generations):
+                self.tao.transform(self.pbo, vertices=self.width * self.height)
+                self.texture.write(self.pbo)
+            gpu = np.frombuffer(self.pbo.read(), dtype='f4').reshape(self.height, self.width) < 0.5
+            results['transform feedback'] = gpu, life.get_window(-offset, -offset, self.width, self.height)
+
+        for name, (gpu, cpu) in results.items():
+            diff = np.count_nonzero(gpu != cpu)
+            print(f"{name}: {'OK' if diff == 0 else f'{diff} cells differ'} "
+                  f"after {generations} generations, population {np.count_nonzero(cpu)}")
+
+
+if __name__ == '__main__':
+    ConwayHashLife.run()
@@ -1,8 +1,8 @@
 import string
-import struct
 import sys
 
 import moderngl
+import numpy as np
 import pygame
 from font_atlas import load_font
 
@@ -38,17 +38,35 @@ class Font:
         texture_size = (512, 512)
         pixels, glyphs = load_font(texture_size, fonts, self.font_sizes, code_points)
 
-        self.glyph_lookup = {x: i for i, x in enumerate(code_points)}
-        self.glyph_struct = struct.Struct("Q3f")
-        self.glyphs = glyphs
+        # Code point -> glyph index, -1 for missing glyphs
+        self.glyph_index = np.full(max(code_points) + 1, -1, dtype="i4")
+        self.glyph_index[code_points] = np.arange(len(code_points))
+        # Glyphs as (font, size, glyph) records of 28 bytes
+        glyph_dtype = np.dtype({
+            "names": ["bbox", "xoff", "yoff", "xadvance"],
+            "formats": ["u8", "f4", "f4", "f4"],
+            "itemsize": 28,
+        })
+        self.glyph_table = np.frombuffer(glyphs, dtype=glyph_dtype)
+        self.glyph_table = self.glyph_table.reshape(len(fonts), len(self.font_sizes), len(code_points))
 
         self.texture = self.ctx.texture(texture_size, 4, pixels)
 
-        self.instance = struct.Struct("2fQ1I")
-        self.instances = bytearray(self.instance.size * 100000)
+        self.instance_dtype = np.dtype([("position", "f4", 2), ("bbox", "u8"), ("color", "u4")])
+        self.instances = np.zeros(100000, dtype=self.instance_dtype)
         self.instance_buffer = self.ctx.buffer(self.instances)
         self.instance_count = 0
 
+        # (text, font, size, color) -> glyph instances laid out at (0, 0)
+        self.layouts = {}
+        self.max_layouts = 1024
+        # (layout key, x, y, first instance) of every text() call this frame and the last one.
+        # A span that is the same as in the last frame is already in the buffer
+        self.spans = []
+        self.last_spans = []
+        self.dirty = None
+        self.uploaded = 0
+
         self.program = self.ctx.program(
             vertex_shader="""
                 #version 300 es
@@ -120,27 +138,62 @@ class Font:
         self.vao.instances = 0
 
     def clear(self):
+        self.last_spans = self.spans
+        self.spans = []
         self.instance_count = 0
 
+    def layout(self, text, font, size, color):
+        """Glyph instances of a string and their positions relative to (0, 0) as doubles. Cached"""
+        key = text, font, size, color
+        layout = self.layouts.pop(key, None)
+        if layout is None:
+            if len(self.layouts) >= self.max_layouts:
+                # Drop the least recently used layout
+                del self.layouts[next(iter(self.layouts))]
+
+            code_points = np.frombuffer(text.encode("utf-32-le"), dtype="<u4")
+            glyph_index = self.glyph_index[np.minimum(code_points, len(self.glyph_index) - 1)]
+            missing = (glyph_index < 0) | (code_points >= len(self.glyph_index))
+            if missing.any():
+                raise KeyError(ord(text[np.argmax(missing)]))
+
+            glyphs = self.glyph_table[self.fonts.index(font), self.font_sizes.index(size)][glyph_index]
+            cursor = np.cumsum(glyphs["xadvance"], dtype="f8") - glyphs["xadvance"]
+            positions = np.stack([cursor + glyphs["xoff"], glyphs["yoff"].astype("f8")], axis=1)
+            instances = np.empty(len(glyphs), dtype=self.instance_dtype)
+            instances["bbox"] = glyphs["bbox"]
+            instances["color"] = int(color[5:7] + color[3:5] + color[1:3], 16) | 0xFF000000
+            layout = instances, positions
+
+        self.layouts[key] = layout
+        return layout
+
     def text(self, x, y, text, font, size, color):
-        col = int(color[5:7] + color[3:5] + color[1:3], 16) | 0xFF000000
-        font_index = self.fonts.index(font)
-        size_index = self.font_sizes.index(size)
-        num_sizes = len(self.font_sizes)
-        num_glyphs = len(self.glyph_lookup)
-        cursor = x
-        for c in text:
-            glyph_index = self.glyph_lookup[ord(c)]
-            idx = ((font_index * num_sizes + size_index) * num_glyphs + glyph_index) * 28
-            bbox, xoff, yoff, xadvance = self.glyph_struct.unpack(self.glyphs[idx : idx + 20])
-            at = self.instance_count * self.instance.size
-            self.instance.pack_into(self.instances, at, cursor + xoff, y + yoff, bbox, col)
-            self.instance_count += 1
-            cursor += xadvance
+        key = text, font, size, color
+        layout, positions = self.layout(*key)
+        start = self.instance_count
+        end = start + len(layout)
+        span = key, x, y, start
+
+        index = len(self.spans)
+        if index >= len(self.last_spans) or self.last_spans[index] != span:
+            instances = self.instances[start:end]
+            instances[:] = layout
+            instances["position"] = positions + (x, y)
+            self.dirty = (start, end) if self.dirty is None else (min(self.dirty[0], start), end)
+
+        self.spans.append(span)
+        self.instance_count = end
 
     def render(self):
-        instances_size = self.instance_count * self.instance.size
-        self.instance_buffer.write(memoryview(self.instances)[:instances_size])
+        # One upload covering the spans that changed
+        if self.dirty is not None:
+            start, end = self.dirty
+            self.instance_buffer.write(self.instances[start:end], offset=start * self.instance_dtype.itemsize)
+            self.uploaded = (end - start) * self.instance_dtype.itemsize
+            self.dirty = None
+        else:
+            self.uploaded = 0
         self.vao.instances = self.instance_count
         self.vao.render()
 
@@ -162,7 +215,10 @@ while True:
     font.text(350.0, 100.0, "Hello World!", "regular", 32.0, "#0000ff")
     font.text(350.0, 130.0, "Hello World!", "bold", 32.0, "#0000ff")
     font.text(100.0, 160.0, string.printable, "regular", 16.0, "#ffffff")
-    font.text(100.0, 320.0, f"fps: {clock.get_fps():.2f}", "bold", 16.0, "#ffffff")
+    # A static block of a few thousand glyphs. Only costs a few tuple compares per frame
+    for i in range(30):
+        font.text(100.0, 350.0 + i * 8.0, string.printable[:94], "regular", 16.0, "#808080")
+    font.text(100.0, 320.0, f"fps: {clock.get_fps():.2f} uploaded: {font.uploaded} bytes", "bold", 16.0, "#ffffff")
 
     ctx.clear()
     font.render()
@@ -0,0 +1,139 @@
+"""
+A buffer of fixed size records that can grow and shrink.
+
+Records are kept in a preallocated numpy array and a GPU buffer
+of the same capacity. When the capacity runs out both double,
+so appending n records costs amortized O(n) in total.
+
+* Appends only upload the appended range.
+* Growing allocates a new GPU buffer and copies the old contents
+  with ``ctx.copy_buffer`` in vram instead of uploading everything again.
+  The ``buffer`` attribute is a new object afterwards, so vertex arrays
+  using it must be recreated.
+* Removing records moves records from the end into the holes
+  (swap with last), so record order is not kept. The range
+  spanning the holes is uploaded with a single write.
+"""
+import numpy as np
+
+
+class GrowableBuffer:
+    """numpy backed GPU buffer with amortized doubling"""
+    def __init__(self, ctx, dtype, capacity=1024):
+        """
+        Args:
+            ctx: moderngl context
+            dtype: numpy dtype of one record. For example ``('f4', 3)`` for a vec3
+            capacity: Initial number of records to allocate
+        """
+        self.ctx = ctx
+        self.dtype = np.dtype(dtype)
+        self.itemsize = self.dtype.itemsize
+        self.count = 0
+        self.data = np.empty(max(capacity, 1), dtype=self.dtype)
+        self.buffer = self.ctx.buffer(reserve=len(self.data) * self.itemsize)
+        # Statistics
+        self.resizes = 0
+        self.bytes_uploaded = 0
+        self.bytes_copied = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        """int: Byte size of the records in use"""
+        return self.count * self.itemsize
+
+    @property
+    def view(self):
+        """The records in use. Do not keep it around, it is invalid after the next resize"""
+        return self.data[:self.count]
+
+    def reserve(self, capacity):
+        """Make room for at least ``capacity`` records, doubling the current capacity"""
+        if capacity <= self.capacity:
+            return
+
+        new_capacity = self.capacity
+        while new_capacity < capacity:
+            new_capacity *= 2
+
+        data = np.empty(new_capacity, dtype=self.dtype)
+        data[:self.count] = self.data[:self.count]
+        self.data = data
+
+        buffer = self.ctx.buffer(reserve=new_capacity * self.itemsize)
+        if self.count:
+            self.ctx.copy_buffer(buffer, self.buffer, size=self.nbytes)
+            self.bytes_copied += self.nbytes
+        self.buffer.release()
+        self.buffer = buffer
+        self.resizes += 1
+
+    def append(self, records):
+        """Append records and upload only the new range.
+
+        Returns:
+            Index of the first appended record
+        """
+        records = self._as_records(records)
+        start = self.count
+        self.reserve(start + len(records))
+        self.data[start:start + len(records)] = records
+        self.count += len(records)
+        self.write(start, self.count)
+        return start
+
+    def update(self, start, records):
+        """Overwrite records from ``start`` on and upload them"""
+        records = self._as_records(records)
+        end = start + len(records)
+        if end > self.count:
+            raise IndexError(f"records {start}:{end} are out of range for {self.count} records")
+        self.data[start:end] = records
+        self.write(start, end)
+
+    def _as_records(self, records):
+        # Sub-array dtypes like ('f4', 3) become an extra array dimension
+        return np.asarray(records, dtype=self.dtype.base).reshape((-1,) + self.dtype.shape)
+
+    def write(self, start, end):
+        """Upload the records start:end of the backing array"""
+        if end > start:
+            self.buffer.write(self.data[start:end], offset=start * self.itemsize)
+            self.bytes_uploaded += (end - start) * self.itemsize
+
+    def remove(self, indices):
+        """Remove records by moving records from the end into their slots.
+
+        Returns:
+            (src, dst) arrays. The record that was at ``src[i]`` is now at ``dst[i]``
+        """
+        indices = np.unique(np.asarray(indices, dtype=np.int64).reshape(-1))
+        if len(indices) and (indices[0] < 0 or indices[-1] >= self.count):
+            raise IndexError(f"removing records out of range for {self.count} records")
+
+        new_count = self.count - len(indices)
+        # Holes below the new count are filled by the surviving records above it
+        dst = indices[indices < new_count]
+        tail = np.ones(self.count - new_count, dtype=bool)
+        tail[indices[indices >= new_count] - new_count] = False
+        src = np.flatnonzero(tail) + new_count
+
+        self.data[dst] = self.data[src]
+        self.count = new_count
+        # One upload of the range spanning the filled holes instead of one per hole
+        if len(dst):
+            self.write(dst[0], dst[-1] + 1)
+        return src, dst
+
+    def clear(self):
+        self.count = 0
+
+    def release(self):
+        self.buffer.release()
@@ -1,16 +1,19 @@
 """
-Example showing how to resize Buffers with orphan()
+Example showing how to grow Buffers with GrowableBuffer
 
 This can be useful for batch drawing an arbitrary
 amount of geometry over time.
 
 We just render a growing amount of random points.
+The points are stored in a numpy array and a buffer that double
+in size when they are full. Only new points are uploaded and
+a resize copies the old points in vram (see growable_buffer.py).
 """
-import struct
-import random
+import numpy as np
 import moderngl
 from pyrr import matrix44
 from ported._example import Example
+from growable_buffer import GrowableBuffer
 
 
 class Points:
@@ -20,6 +23,7 @@ class Points:
     When the buffer is to small we double the size.
     When the buffer do not need resizing we only do a partial
     buffer update.
+    Removing points moves the last points into the free slots.
     """
     def __init__(self, ctx, num_points):
         """
@@ -27,9 +31,8 @@ class Points:
             ctx: moderngl context
             num_points: Initial number of points to allocate
         """
-        self.points = []
         self.ctx = ctx
-        self.buffer = self.ctx.buffer(reserve=num_points * 12)  # 12 bytes for a 3f
+        self.points = GrowableBuffer(self.ctx, ('f4', 3), num_points)
         self.program = self.ctx.program(
             vertex_shader="""
             #version 330
@@ -47,49 +50,49 @@ class Points:
             }
             """,
         )
-        self.vao = self.ctx.vertex_array(
-            self.program,
-            [(self.buffer, '3f', 'in_position')],
-        )
+        self.vao = None
+        self.vao_buffer = None
 
     def render(self, time):
+        # A resize replaces the buffer
+        if self.vao_buffer is not self.points.buffer:
+            if self.vao:
+                self.vao.release()
+            self.vao = self.ctx.vertex_array(
+                self.program,
+                [(self.points.buffer, '3f', 'in_position')],
+            )
+            self.vao_buffer = self.points.buffer
+
         self.program['model_matrix'].write(matrix44.create_from_eulers((0, time / 8, 0), dtype='f4'))
         self.vao.render(vertices=self.count, mode=moderngl.POINTS)
 
     @property
     def count(self):
-        return len(self.points) // 3
+        return self.points.count
 
     @property
     def byte_size(self):
         """int: Byte size of the point data"""
-        return len(self.points) * 4  # 4 byte per float
+        return self.points.nbytes
 
     def add(self, num):
         """Adds num points random points"""
-        resized = False
-        old_points_size = self.byte_size
-        new = list(self._gen_random_points(num))
-        self.points = self.points + new
-
-        # Keep doubling the buffer size until we reach an acceptable size
-        while self.byte_size > self.buffer.size:
-            resized = True
-            print("Buffer resized {} -> {}".format(self.buffer.size, self.buffer.size * 2))
-            print("New capacity is {} points".format(self.buffer.size * 2 // 12))
-            self.buffer.orphan(self.buffer.size * 2)
-
-        if resized:
-            # Re-write the entire buffer
-            self.buffer.write(struct.pack('{}f'.format(len(self.points)), *self.points))
+        old_capacity = self.points.capacity
+        resizes = self.points.resizes
+        self.points.append(np.random.uniform(-1.5, 1.5, (num, 3)))
+
+        if self.points.resizes != resizes:
+            print("Buffer resized {} -> {}".format(old_capacity * 12, self.points.capacity * 12))
+            print("New capacity is {} points. Copied the old points and uploaded {} points".format(
+                self.points.capacity, num))
         else:
-            # Partial buffer update
-            print("Partial buffer update adding {} points".format(len(new) // 3))
-            self.buffer.write(struct.pack('{}f'.format(len(new)), *new), offset=old_points_size)
+            print("Partial buffer update adding {} points".format(num))
 
-    def _gen_random_points(self, num):
-        for _ in range(num * 3):
-            yield random.uniform(-1.5, 1.5)
+    def remove(self, num):
+        """Removes num random points"""
+        num = min(num, self.count)
+        self.points.remove(np.random.choice(self.count, num, replace=False))
 
 
 class GrowingBuffers(Example):
@@ -108,9 +111,10 @@ class GrowingBuffers(Example):
     def render(self, time, frametime):
         self.points.render(time)
 
-        # Add more points every 60 frames
+        # Add more points and remove some every 60 frames
         if self.wnd.frames % 60 == 0:
             self.points.add(5000)
+            self.points.remove(1000)
 
 
 if __name__ == '__main__':
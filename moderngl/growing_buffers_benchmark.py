@@ -0,0 +1,102 @@
+"""
+Benchmark GrowableBuffer by appending 10 million points in chunks.
+
+For comparison the old approach of growing_buffers.py
+(python list concatenation, struct.pack and re-uploading
+everything on resize) runs on a much smaller number of points
+since it is O(n) per append.
+
+    python growing_buffers_benchmark.py --window headless
+    python growing_buffers_benchmark.py --window headless --points 1000000 --chunk 1000 100000
+"""
+import struct
+import time
+
+import numpy as np
+
+from ported._example import Example
+from growable_buffer import GrowableBuffer
+
+
+def append_growable(ctx, points, data):
+    """Appends the (chunk, 3) array data until points are reached. Returns (seconds, GrowableBuffer)"""
+    buffer = GrowableBuffer(ctx, ('f4', 3), 1024)
+    start = time.perf_counter()
+    for _ in range(points // len(data)):
+        buffer.append(data)
+    ctx.finish()
+    return time.perf_counter() - start, buffer
+
+
+def append_list(ctx, points, data):
+    """The old Points.add with the same chunk as append_growable. Returns (seconds, bytes uploaded)"""
+    buffer = ctx.buffer(reserve=1024 * 12)
+    values = []
+    uploaded = 0
+    # Points.add got a python list, converted before timing like the array of append_growable
+    new = data.ravel().tolist()
+    start = time.perf_counter()
+    for _ in range(points // len(data)):
+        old_size = len(values) * 4
+        values = values + new
+        resized = False
+        while len(values) * 4 > buffer.size:
+            resized = True
+            buffer.orphan(buffer.size * 2)
+        if resized:
+            buffer.write(struct.pack('{}f'.format(len(values)), *values))
+            uploaded += len(values) * 4
+        else:
+            buffer.write(struct.pack('{}f'.format(len(new)), *new), offset=old_size)
+            uploaded += len(new) * 4
+    ctx.finish()
+    seconds = time.perf_counter() - start
+    buffer.release()
+    return seconds, uploaded
+
+
+class GrowingBuffersBenchmark(Example):
+    title = "Growing Buffers Benchmark"
+    window_size = 256, 256
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.points = self.argv.points
+        self.chunks = self.argv.chunk
+        self.list_points = self.argv.list_points
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument('--points', type=int, default=10_000_000, help="Number of points to append")
+        parser.add_argument('--chunk', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                            help="Points per append")
+        parser.add_argument('--list-points', type=int, default=200_000,
+                            help="Number of points for the old list based approach")
+
+    def render(self, time_, frame_time):
+        print(f"{'method':<12} {'points':>10} {'chunk':>8} {'seconds':>8} {'M points/s':>10} "
+              f"{'resizes':>7} {'MB uploaded':>11} {'MB copied':>9}")
+
+        # Both methods append the same points, generated before anything is timed
+        data = {chunk: np.random.uniform(-1.5, 1.5, (chunk, 3)).astype('f4') for chunk in self.chunks}
+
+        for chunk in self.chunks:
+            seconds, buffer = append_growable(self.ctx, self.points, data[chunk])
+            print(f"{'growable':<12} {buffer.count:>10} {chunk:>8} {seconds:8.3f} "
+                  f"{buffer.count / seconds / 1e6:10.2f} {buffer.resizes:>7} "
+                  f"{buffer.bytes_uploaded / 1e6:11.1f} {buffer.bytes_copied / 1e6:9.1f}")
+            buffer.release()
+
+        for chunk in self.chunks:
+            if chunk > self.list_points:
+                continue
+            seconds, uploaded = append_list(self.ctx, self.list_points, data[chunk])
+            count = self.list_points // chunk * chunk
+            print(f"{'list':<12} {count:>10} {chunk:>8} {seconds:8.3f} "
+                  f"{count / seconds / 1e6:10.2f} {'':>7} {uploaded / 1e6:11.1f} {'':>9}")
+
+        self.wnd.close()
+
+
+if __name__ == '__main__':
+    GrowingBuffersBenchmark.run()
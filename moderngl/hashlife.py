@@ -0,0 +1,252 @@
+"""
+Hashlife CPU engine for Game of Life like rules.
+
+The pattern is a quadtree where equal subtrees are the same object.
+A node of level ``k`` covers ``2^k x 2^k`` cells and the result of
+advancing its centre ``2^(k-2)`` generations is memoized on the node,
+so repetitive patterns can jump huge numbers of generations at once.
+Empty space costs nothing and the plane is unbounded, unlike the
+toroidal textures used on the GPU.
+
+Rules use the same birth/survive masks as
+conways_game_of_life_bitpacked.py where bit n means "n neighbours".
+
+Cells are addressed as ``(x, y)`` with ``y`` being the row of
+the arrays passed to ``set_cells()`` and returned by ``get_window()``.
+"""
+import numpy as np
+
+from conways_game_of_life_bitpacked import RULE_STANDARD
+
+
+class Node:
+    """Quadtree node. Only create them through ``HashLife.join``.
+
+    nw, ne, sw, se are the four child nodes of level ``k - 1``
+    and ``n`` is the number of living cells.
+    """
+    __slots__ = ('k', 'nw', 'ne', 'sw', 'se', 'n')
+
+    def __init__(self, k, nw, ne, sw, se, n):
+        self.k = k
+        self.nw, self.ne, self.sw, self.se = nw, ne, sw, se
+        self.n = n
+
+
+OFF = Node(0, None, None, None, None, 0)
+ON = Node(0, None, None, None, None, 1)
+
+
+class HashLife:
+    """Memoized quadtree Game of Life on an unbounded plane.
+
+    Caches grow with every new pattern seen. Call ``clear_cache()``
+    if memory becomes a problem.
+    """
+    def __init__(self, rule=RULE_STANDARD):
+        """
+        Args:
+            rule: (birth mask, survive mask) as bit masks of neighbour counts
+        """
+        self.birth, self.survive = rule
+        self.clear_cache()
+        self.root = self.zero(3)
+        # Cell coordinate of the north west corner of the root
+        self.x, self.y = 0, 0
+        self.generation = 0
+
+    @property
+    def rule(self):
+        return self.birth, self.survive
+
+    @property
+    def population(self):
+        return self.root.n
+
+    def clear_cache(self):
+        """Forget all memoized nodes and results except the current pattern"""
+        self._nodes = {}
+        self._zeros = [OFF]
+        self._next = {}
+        self._dense = {}
+        if hasattr(self, 'root'):
+            self.root = self._rebuild(self.root)
+
+    def _rebuild(self, node):
+        if node.k == 0:
+            return node
+        return self.join(self._rebuild(node.nw), self._rebuild(node.ne),
+                         self._rebuild(node.sw), self._rebuild(node.se))
+
+    def join(self, nw, ne, sw, se):
+        """The unique node with the given children"""
+        key = nw, ne, sw, se
+        node = self._nodes.get(key)
+        if node is None:
+            node = Node(nw.k + 1, nw, ne, sw, se, nw.n + ne.n + sw.n + se.n)
+            self._nodes[key] = node
+        return node
+
+    def zero(self, k):
+        """The empty node of level k"""
+        while len(self._zeros) <= k:
+            z = self._zeros[-1]
+            self._zeros.append(self.join(z, z, z, z))
+        return self._zeros[k]
+
+    def expand(self, node):
+        """Same pattern centered in a node of the next level"""
+        z = self.zero(node.k - 1)
+        return self.join(
+            self.join(z, z, z, node.nw), self.join(z, z, node.ne, z),
+            self.join(z, node.sw, z, z), self.join(node.se, z, z, z),
+        )
+
+    def centre(self, node):
+        """The centre node of the next lower level"""
+        return self.join(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+    def _step_4x4(self, node):
+        """Centre 2x2 of a level 2 node after one generation"""
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        cells = [
+            [nw.nw.n, nw.ne.n, ne.nw.n, ne.ne.n],
+            [nw.sw.n, nw.se.n, ne.sw.n, ne.se.n],
+            [sw.nw.n, sw.ne.n, se.nw.n, se.ne.n],
+            [sw.sw.n, sw.se.n, se.sw.n, se.se.n],
+        ]
+        result = []
+        for y in (1, 2):
+            for x in (1, 2):
+                count = sum(cells[y + dy][x + dx] for dy in (-1, 0, 1) for dx in (-1, 0, 1)) - cells[y][x]
+                mask = self.survive if cells[y][x] else self.birth
+                result.append(ON if mask >> count & 1 else OFF)
+        return self.join(*result)
+
+    def successor(self, node, j):
+        """Centre node of the next lower level advanced 2^j generations.
+        j must be at most node.k - 2
+        """
+        key = node, j
+        result = self._next.get(key)
+        if result is not None:
+            return result
+
+        if node.n == 0:
+            result = node.nw
+        elif node.k == 2:
+            result = self._step_4x4(node)
+        else:
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            join = self.join
+            # Nine overlapping sub squares of half the size advanced by 2^j or 2^(k-3)
+            half = min(j, node.k - 3)
+            c = [self.successor(q, half) for q in (
+                nw, join(nw.ne, ne.nw, nw.se, ne.sw), ne,
+                join(nw.sw, nw.se, sw.nw, sw.ne), self.centre(node), join(ne.sw, ne.se, se.nw, se.ne),
+                sw, join(sw.ne, se.nw, sw.se, se.sw), se,
+            )]
+            quads = (
+                (c[0], c[1], c[3], c[4]), (c[1], c[2], c[4], c[5]),
+                (c[3], c[4], c[6], c[7]), (c[4], c[5], c[7], c[8]),
+            )
+            if j < node.k - 2:
+                # Already 2^j generations ahead, just take the centres
+                result = join(*(self.centre(join(*q)) for q in quads))
+            else:
+                # Second half of the 2^(k-2) generations
+                result = join(*(self.successor(join(*q), half) for q in quads))
+
+        self._next[key] = result
+        return result
+
+    def set_cells(self, cells, x=0, y=0):
+        """Replace the pattern with a 2D array of cells placed at (x, y).
+        Non-zero means alive.
+        """
+        cells = np.asarray(cells, dtype=bool)
+        k = max(3, int(np.ceil(np.log2(max(cells.shape)))))
+        size = 1 << k
+        padded = np.zeros((size, size), dtype=bool)
+        padded[:cells.shape[0], :cells.shape[1]] = cells
+        self.root = self._from_array(padded, k)
+        self.x, self.y = x, y
+
+    def _from_array(self, cells, k):
+        if not cells.any():
+            return self.zero(k)
+        if k == 0:
+            return ON
+        h = 1 << (k - 1)
+        return self.join(
+            self._from_array(cells[:h, :h], k - 1), self._from_array(cells[:h, h:], k - 1),
+            self._from_array(cells[h:, :h], k - 1), self._from_array(cells[h:, h:], k - 1),
+        )
+
+    def step_pow2(self, j):
+        """Advance 2^j generations"""
+        # Grow until the pattern is inside the centre half, then once more
+        # so it cannot leave the node in 2^j generations
+        while self.root.k < j + 2 or self.centre(self.root).n != self.root.n:
+            self._expand_root()
+        self._expand_root()
+
+        quarter = 1 << (self.root.k - 2)
+        self.root = self.successor(self.root, j)
+        self.x += quarter
+        self.y += quarter
+        self.generation += 1 << j
+
+    def _expand_root(self):
+        half = 1 << (self.root.k - 1)
+        self.root = self.expand(self.root)
+        self.x -= half
+        self.y -= half
+
+    def step(self, generations):
+        """Advance any number of generations as a sum of powers of two"""
+        j = 0
+        while generations:
+            if generations & 1:
+                self.step_pow2(j)
+            generations >>= 1
+            j += 1
+
+    def get_window(self, x, y, width, height):
+        """Cells in the rectangle at (x, y) as a (height, width) bool array.
+        Only the parts of the tree that overlap the window and are not empty are visited.
+        """
+        out = np.zeros((height, width), dtype=bool)
+        self._paint(self.root, self.x - x, self.y - y, out)
+        return out
+
+    def _paint(self, node, x, y, out):
+        size = 1 << node.k
+        height, width = out.shape
+        if node.n == 0 or x >= width or y >= height or x + size <= 0 or y + size <= 0:
+            return
+        if node.k <= 4:
+            dense = self.dense(node)
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + size, width), min(y + size, height)
+            out[y0:y1, x0:x1] = dense[y0 - y:y1 - y, x0 - x:x1 - x]
+            return
+        h = size // 2
+        self._paint(node.nw, x, y, out)
+        self._paint(node.ne, x + h, y, out)
+        self._paint(node.sw, x, y + h, out)
+        self._paint(node.se, x + h, y + h, out)
+
+    def dense(self, node):
+        """A small node as a bool array. Memoized"""
+        result = self._dense.get(node)
+        if result is None:
+            if node.k == 0:
+                result = np.full((1, 1), node.n, dtype=bool)
+            else:
+                result = np.block([
+                    [self.dense(node.nw), self.dense(node.ne)],
+                    [self.dense(node.sw), self.dense(node.se)],
+                ])
+            self._dense[node] = result
+        return result
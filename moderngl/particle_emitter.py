@@ -0,0 +1,153 @@
+"""
+Vectorized CPU particle emitter.
+
+Generates whole emit batches as a structured numpy array
+instead of yielding one float at a time from a python generator.
+Every random field is filled with a single RNG call and the
+batch is written into a staging array that is allocated once
+and reused every frame, so an emit is one ``Buffer.write()``.
+
+The record layout matches the ``2f 2f 3f`` vertex format
+used by the particle examples::
+
+    pos (2f), vel (2f), color (3f)
+"""
+import numpy as np
+
+PARTICLE_DTYPE = np.dtype([
+    ('pos', 'f4', 2),
+    ('vel', 'f4', 2),
+    ('color', 'f4', 3),
+])
+
+
+class ParticleEmitter:
+    """Emits particles from a point with random direction, speed and color.
+
+    Emitted particles get a random direction, a speed in ``speed_range``
+    plus the velocity of the emitter and a random color.
+    """
+    def __init__(self, capacity, speed_range=(0.1, 0.9), seed=None):
+        """
+        Args:
+            capacity: Maximum number of particles emitted in one batch
+            speed_range: (min, max) of the random speed
+            seed: Optional seed for reproducible batches
+        """
+        self.capacity = capacity
+        self.speed_range = speed_range
+        self.rng = np.random.default_rng(seed)
+        # Reused every frame. Scratch arrays are contiguous so the RNG can fill them in place
+        self.staging = np.zeros(capacity, dtype=PARTICLE_DTYPE)
+        self._angle = np.empty(capacity, dtype='f4')
+        self._speed = np.empty(capacity, dtype='f4')
+        self._color = np.empty((capacity, 3), dtype='f4')
+
+    def emit(self, count, pos, velocity):
+        """Generate ``count`` particles into the staging array.
+
+        Args:
+            count: Number of particles (clamped to capacity)
+            pos: (x, y) emitter position
+            velocity: (x, y) emitter velocity added to every particle
+        Returns:
+            A view of the staging array. It is overwritten by the next emit.
+        """
+        count = min(count, self.capacity)
+        batch = self.staging[:count]
+        angle = self._angle[:count]
+        speed = self._speed[:count]
+        color = self._color[:count]
+
+        # One RNG call per field
+        self.rng.random(out=angle, dtype='f4')
+        self.rng.random(out=speed, dtype='f4')
+        self.rng.random(out=color, dtype='f4')
+
+        angle *= np.float32(np.pi * 2.0)
+        speed *= np.float32(self.speed_range[1] - self.speed_range[0])
+        speed += np.float32(self.speed_range[0])
+
+        batch['pos'] = pos
+        vel = batch['vel']
+        np.cos(angle, out=vel[:, 0])
+        np.sin(angle, out=vel[:, 1])
+        vel *= speed[:, None]
+        vel += np.asarray(velocity, dtype='f4')
+        batch['color'] = color
+        return batch
+
+    def write(self, buffer, count, pos, velocity, offset=0):
+        """Emit ``count`` particles straight into a buffer at ``offset`` bytes.
+
+        Returns:
+            The number of particles written
+        """
+        batch = self.emit(count, pos, velocity)
+        if len(batch):
+            buffer.write(batch, offset=offset)
+        return len(batch)
+
+
+class EmitScheduler:
+    """Sizes transform feedback emits from query results that are a few frames old.
+
+    Reading ``query.primitives`` right after ``transform()`` waits for the GPU.
+    Instead we keep a ring of ``latency`` primitive queries and only read the
+    one that was issued ``latency`` frames ago, which is finished by then.
+
+    The price is that the live particle count of the current frame is unknown.
+    We track an upper bound instead: the exact survivor count from the old query
+    plus everything emitted since. Particles only ever die, so the real count is
+    never above it. The caller must make sure the slots between the real count
+    and the bound hold dead particles (see ``Particles.emit_gpu_deferred``).
+    Emits are clamped so the bound never exceeds the buffer capacity.
+    """
+    def __init__(self, ctx, capacity, max_emit, latency=3):
+        """
+        Args:
+            ctx: moderngl context
+            capacity: Number of particles the buffers can hold
+            max_emit: Maximum number of particles to emit per frame
+            latency: Number of frames between issuing and reading a query
+        """
+        self.capacity = capacity
+        self.max_emit = max_emit
+        self.queries = [ctx.query(primitives=True) for _ in range(latency)]
+        self.emitted = [0] * latency
+        self.pending = [False] * latency
+        self.frame = 0
+        self.vertices = 0
+        self.emit_count = 0
+        self.query = self.queries[0]
+
+    def reset(self, active_particles):
+        """Start from an exactly known particle count"""
+        self.vertices = active_particles
+        self.emitted = [0] * len(self.queries)
+        self.pending = [False] * len(self.queries)
+
+    def begin_frame(self):
+        """
+        Returns:
+            (vertices, emit_count): How many particles to transform (upper bound)
+            and how many new ones to emit this frame.
+            ``self.query`` is the query to wrap the transform with.
+        """
+        slot = self.frame % len(self.queries)
+        if self.pending[slot]:
+            # Survivors of the frame that used this slot plus all emits since then
+            bound = self.queries[slot].primitives + sum(self.emitted)
+            self.vertices = min(self.vertices, bound)
+
+        self.emit_count = max(0, min(self.max_emit, self.capacity - self.vertices))
+        self.emitted[slot] = self.emit_count
+        self.pending[slot] = True
+        self.query = self.queries[slot]
+        return self.vertices, self.emit_count
+
+    def end_frame(self):
+        """Returns the particle count upper bound for rendering"""
+        self.vertices += self.emit_count
+        self.frame += 1
+        return self.vertices
@@ -0,0 +1,267 @@
+"""
+Compute shader version of particle_system_emit.py
+
+Particles live in one persistent shader storage buffer.
+Nothing is compacted or ping-ponged every frame:
+
+* The update dispatch integrates every live particle in place.
+  Particles falling below the screen are marked dead and their
+  slot index is pushed onto a free list using an atomic counter.
+* The emit dispatch pops slots from the free list and initializes
+  new particles in them. If the free list runs dry the remaining
+  invocations simply do nothing.
+
+Dead slots stay in the buffer and are moved outside the clip
+volume by the vertex shader, so the render call always draws
+the full buffer and the cpu never needs to know how many
+particles are alive. Reading ``active_particles`` does a
+small readback and is only meant for debugging/benchmarks.
+
+The class mirrors the Python API of ``particle_system_emit.Particles``
+so both can be benchmarked against each other
+(see particle_system_emit_benchmark.py --compute).
+
+Requires OpenGL 4.3
+"""
+import numpy as np
+
+from moderngl_window import screenshot
+from ported._example import Example
+from pyrr import matrix44
+
+GROUP_SIZE = 256
+
+# std430: vec4 pos_vel (pos.xy, vel.xy), vec4 color (rgb, alive)
+update_shader_code = """
+#version 430
+layout(local_size_x=%GROUP_SIZE%) in;
+
+struct Particle {
+    vec4 pos_vel;
+    vec4 color;
+};
+
+layout(std430, binding=0) buffer particles_buffer { Particle particles[]; };
+layout(std430, binding=1) buffer free_list_buffer { uint free_list[]; };
+layout(std430, binding=2) buffer counters_buffer { int free_count; uint emitted; };
+
+uniform float gravity;
+uniform float ft;
+uniform uint count;
+
+void main() {
+    uint i = gl_GlobalInvocationID.x;
+    if (i >= count || particles[i].color.w < 0.5) {
+        return;
+    }
+
+    vec4 p = particles[i].pos_vel;
+    if (p.y > -1.0) {
+        vec2 vel = p.zw + vec2(0.0, gravity);
+        particles[i].pos_vel = vec4(p.xy + vel * ft, vel);
+    } else {
+        // Kill and recycle the slot
+        particles[i].color.w = 0.0;
+        free_list[atomicAdd(free_count, 1)] = i;
+    }
+}
+"""
+
+emit_shader_code = """
+#version 430
+#define M_PI 3.1415926535897932384626433832795
+layout(local_size_x=%GROUP_SIZE%) in;
+
+struct Particle {
+    vec4 pos_vel;
+    vec4 color;
+};
+
+layout(std430, binding=0) buffer particles_buffer { Particle particles[]; };
+layout(std430, binding=1) buffer free_list_buffer { uint free_list[]; };
+layout(std430, binding=2) buffer counters_buffer { int free_count; uint emitted; };
+
+uniform vec2 mouse_pos;
+uniform vec2 mouse_vel;
+uniform float time;
+uniform uint emit_count;
+
+float rand(float n){return fract(sin(n) * 43758.5453123);}
+
+void main() {
+    uint id = gl_GlobalInvocationID.x;
+    if (id >= emit_count) {
+        return;
+    }
+
+    // Pop a free slot. Only pops happen in this dispatch so undoing a failed one is safe
+    int top = atomicAdd(free_count, -1);
+    if (top <= 0) {
+        atomicAdd(free_count, 1);
+        return;
+    }
+    uint slot = free_list[top - 1];
+    atomicAdd(emitted, 1u);
+
+    float a = mod(time * id, M_PI * 2);
+    float r = clamp(rand(time + id), 0.1, 0.9);
+    particles[slot].pos_vel = vec4(mouse_pos, vec2(sin(a), cos(a)) * r + mouse_vel);
+    particles[slot].color = vec4(
+        rand(time * 1.3 + id), rand(time * 3.4 + id), rand(time * 2.0 + id), 1.0
+    );
+}
+"""
+
+
+class ComputeParticles(Example):
+    title = "Particle System Compute"
+    gl_version = (4, 3)
+    aspect_ratio = None
+    mouse_control = False
+    particle_count = 25_000
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        # Renders particles to the screen. Dead particles are moved outside the clip volume
+        self.prog = self.ctx.program(
+            vertex_shader='''
+                #version 330
+
+                uniform mat4 projection;
+
+                in vec2 in_pos;
+                in vec4 in_color;
+                out vec3 color;
+
+                void main() {
+                    gl_Position = in_color.w > 0.5 ? projection * vec4(in_pos, 0.0, 1.0) : vec4(2.0, 2.0, 2.0, 1.0);
+                    color = in_color.rgb;
+                }
+            ''',
+            fragment_shader='''
+                #version 330
+
+                out vec4 f_color;
+                in vec3 color;
+
+                void main() {
+                    f_color = vec4(color, 1.0);
+                }
+            ''',
+        )
+        self.update_shader = self.ctx.compute_shader(update_shader_code.replace("%GROUP_SIZE%", str(GROUP_SIZE)))
+        self.emit_shader = self.ctx.compute_shader(emit_shader_code.replace("%GROUP_SIZE%", str(GROUP_SIZE)))
+
+        self.mouse_pos = 0, 0
+        self.mouse_velocity = 0.001, 0.001  # default value must not be 0. any number is fine
+        self.prog['projection'].write(self.projection)
+        self.update_shader['gravity'].value = -.01  # affects the velocity of the particles over time
+        self.ctx.point_size = self.wnd.pixel_ratio * 2  # point size
+
+        self.N = self.particle_count  # particle count
+        self.max_emit_count = self.N // 100  # Maximum number of particles to emit per frame
+        self.stride = 32  # byte stride for each particle
+        self.update_shader['count'].value = self.N
+
+        # All slots start dead and on the free list. Slot 0 is on top so it is used first
+        self.particles = self.ctx.buffer(reserve=self.N * self.stride)
+        self.particles.clear()
+        self.free_list = self.ctx.buffer(np.arange(self.N, dtype='u4')[::-1].copy())
+        self.counters = self.ctx.buffer(np.array([self.N, 0], dtype='i4'))
+
+        self.render_vao = self.ctx.vertex_array(
+            self.prog,
+            [(self.particles, '2f 2x4 4f', 'in_pos', 'in_color')],
+        )
+
+        # Emit the initial particles
+        self.emit(self.N // 100, time=0)
+
+    @property
+    def active_particles(self):
+        """Number of live particles. Reads back from the gpu"""
+        return self.N - int(np.frombuffer(self.counters.read(size=4), dtype='i4')[0])
+
+    @property
+    def emitted(self):
+        """Total number of particles emitted so far. Reads back from the gpu"""
+        return int(np.frombuffer(self.counters.read(size=4, offset=4), dtype='u4')[0])
+
+    def bind_buffers(self):
+        self.particles.bind_to_storage_buffer(0)
+        self.free_list.bind_to_storage_buffer(1)
+        self.counters.bind_to_storage_buffer(2)
+
+    def render(self, time, frame_time):
+        self.update_shader['ft'].value = max(frame_time, 0.02)
+
+        if not self.mouse_control:
+            self.move_mouse(time)
+
+        self.emit_gpu(time, frame_time)
+
+    def emit(self, emit_count, time):
+        self.bind_buffers()
+        self.emit_shader['mouse_pos'].value = self.mouse_pos
+        self.emit_shader['mouse_vel'].value = self.mouse_velocity
+        self.emit_shader['time'].value = max(time, 0)
+        self.emit_shader['emit_count'].value = emit_count
+        self.emit_shader.run(group_x=(emit_count + GROUP_SIZE - 1) // GROUP_SIZE)
+
+    def emit_gpu(self, time, frame_time):
+        """Update all particles in place, then emit into free slots.
+        Same role as method #3 of particle_system_emit.py
+        """
+        self.bind_buffers()
+        self.update_shader.run(group_x=(self.N + GROUP_SIZE - 1) // GROUP_SIZE)
+        self.ctx.memory_barrier()
+
+        self.emit(self.max_emit_count, time)
+        self.ctx.memory_barrier()
+
+        self.render_vao.render(self.ctx.POINTS, vertices=self.N)
+
+    @property
+    def projection(self):
+        return matrix44.create_orthogonal_projection(
+            -self.wnd.aspect_ratio, self.wnd.aspect_ratio,
+            -1, 1,
+            -1, 1,
+            dtype='f4',
+        )
+
+    def resize(self, width, height):
+        """Handle window resizing"""
+        self.prog['projection'].write(self.projection)
+
+    def mouse_position_event(self, x, y, dx, dy):
+        if not self.mouse_control:
+            return
+
+        self.mouse_pos = (
+            (x / self.wnd.width * 2 - 1) * self.wnd.aspect_ratio,
+            -(y / self.wnd.height * 2 - 1),
+        )
+        self.mouse_velocity = dx / 25, -dy / 25
+
+    def move_mouse(self, time):
+        new_pos = (
+            np.sin(time * 2.0) * self.wnd.aspect_ratio * 0.9,
+            np.cos(time * 2.0) * 0.15,
+        )
+        self.mouse_velocity = (
+            (new_pos[0] - self.mouse_pos[0]) * 10,
+            (new_pos[1] - self.mouse_pos[1]) * 10,
+        )
+        self.mouse_pos = new_pos
+
+    def key_event(self, key, action, modifiers):
+        keys = self.wnd.keys
+
+        if action == keys.ACTION_PRESS and key == keys.F1:
+            screenshot.create(self.wnd.fbo)
+
+
+if __name__ == '__main__':
+    ComputeParticles.run()
@@ -19,7 +19,7 @@ but works in GL 3.3 core.
   actually emitted so we can know how many new particles we should
   emit.
 
-We show 3 different emit methods:
+We show 4 different emit methods. They take turns every frame unless one is picked with --method:
 * Method #1: CPU emitting by manually writing new particles to the end of the buffer.
              This will probably stream up the entire buffer per frame, but is acceptable
              for smaller amount of data.
@@ -29,6 +29,10 @@ We show 3 different emit methods:
 * Method #3: GPU emitting. A shader simply calculates the new values.
              No buffer streaming. All is on the gpu side. This method is
              orders of magnitude faster than method 1 and 2
+* Method #4: GPU emitting without the stall. New particles go to the front of the
+             output buffer and survivors are written after them, so no offset depends
+             on this frame's query. The emit size comes from a query a few frames old
+             (EmitScheduler) and unused slots are filled with dead particles first.
 
 Emit particles from mouse positions:
 
@@ -45,6 +49,7 @@ import moderngl
 from moderngl_window import screenshot
 from ported._example import Example
 from pyrr import matrix44
+from particle_emitter import ParticleEmitter, EmitScheduler
 
 
 class Particles(Example):
@@ -52,6 +57,7 @@ class Particles(Example):
     gl_version = (3, 3)
     aspect_ratio = None
     mouse_control = False
+    particle_count = 25_000
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -140,7 +146,7 @@ class Particles(Example):
         self.transform['gravity'].value = -.01  # affects the velocity of the particles over time
         self.ctx.point_size = self.wnd.pixel_ratio * 2  # point size
 
-        self.N = 25_000  # particle count
+        self.N = self.particle_count  # particle count
         self.active_particles = self.N // 100  # Initial / current number of active particles
         self.max_emit_count = self.N // 100  # Maximum number of particles to emit per frame
         self.stride = 28  # byte stride for each vertex
@@ -148,14 +154,10 @@ class Particles(Example):
         # Note that passing dynamic=True probably doesn't mean anything to most drivers today
         self.vbo1 = self.ctx.buffer(reserve=self.N * self.stride)
         self.vbo2 = self.ctx.buffer(reserve=self.N * self.stride)
+        # CPU emitter for method #1 and #2. Batches are generated into a reused staging array
+        self.emitter = ParticleEmitter(max(self.active_particles, self.max_emit_count))
         # Write some initial particles
-        self.vbo1.write(
-            np.fromiter(
-                self.gen_particles(self.active_particles),
-                count=self.active_particles * self.floats,
-                dtype='f4',
-            )
-        )
+        self.emitter.write(self.vbo1, self.active_particles, self.mouse_pos, self.mouse_velocity)
 
         # Transform vaos. We transform data back and forth to avoid buffer copy
         self.transform_vao1 = self.ctx.vertex_array(
@@ -234,6 +236,30 @@ class Particles(Example):
         # Query object to inspect render calls
         self.query = self.ctx.query(primitives=True)
 
+        # Setup for method #4: Writes dead particles the geometry shader will discard
+        self.kill_prog = self.ctx.program(
+            vertex_shader='''
+            # version 330
+            out vec2 out_pos;
+            out vec2 out_vel;
+            out vec3 out_color;
+            void main() {
+                out_pos = vec2(0.0, -2.0);
+                out_vel = vec2(0.0);
+                out_color = vec3(0.0);
+            }
+            ''',
+            varyings=['out_pos', 'out_vel', 'out_color'],
+        )
+        self.kill_vao = self.ctx._vertex_array(self.kill_prog, [])
+        # Ring of queries read a few frames late
+        self.scheduler = EmitScheduler(self.ctx, self.N, self.max_emit_count)
+        self.method = None
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument('--method', type=int, choices=[1, 2, 3, 4], help="Only use this emit method")
+
     def render(self, time, frame_time):
         self.transform['ft'].value = max(frame_time, 0.02)
 
@@ -241,15 +267,19 @@ class Particles(Example):
             self.move_mouse(time)
 
         # Cycle emit methods per frame
-        method = self.wnd.frames % 3 + 1
-        # ---> HARDCODE METHOD HERE <---
-        # method = 3
+        method = self.argv.method or self.wnd.frames % 4 + 1
+        if method == 4 and self.method != 4:
+            self.scheduler.reset(self.active_particles)
+        self.method = method
+
         if method == 1:
             self.emit_cpu_simple(time, frame_time)
         elif method == 2:
             self.emit_cpu_buffer(time, frame_time)
         elif method == 3:
             self.emit_gpu(time, frame_time)
+        elif method == 4:
+            self.emit_gpu_deferred(time, frame_time)
 
         # Swap around objects for next frame
         self.transform_vao1, self.transform_vao2 = self.transform_vao2, self.transform_vao1
@@ -274,8 +304,8 @@ class Particles(Example):
         # Emit new particles if needed simply by writing to the end of the buffer (cpu)
         emit_count = min(self.N - self.query.primitives, self.max_emit_count)
         if emit_count > 0:
-            self.vbo2.write(
-                np.fromiter(self.gen_particles(emit_count), 'f4', count=emit_count * self.floats),
+            self.emitter.write(
+                self.vbo2, emit_count, self.mouse_pos, self.mouse_velocity,
                 offset=self.query.primitives * self.stride,
             )
 
@@ -295,9 +325,7 @@ class Particles(Example):
 
         emit_count = min(self.N - self.query.primitives, self.emit_buffer_elements, self.max_emit_count)
         if emit_count > 0:
-            self.emit_buffer.write(
-                np.fromiter(self.gen_particles(emit_count), 'f4', count=emit_count * self.floats)
-            )
+            self.emitter.write(self.emit_buffer, emit_count, self.mouse_pos, self.mouse_velocity)
             self.emit_buffer_vao.transform(
                 self.vbo2,
                 vertices=emit_count,
@@ -329,20 +357,41 @@ class Particles(Example):
         self.active_particles = self.query.primitives + emit_count
         self.render_vao2.render(moderngl.POINTS, vertices=self.active_particles)
 
-    def gen_particles(self, n):
-        for _ in range(n):
-            # Current mouse position (2 floats)
-            yield self.mouse_pos[0]
-            yield self.mouse_pos[1]
-            # Random velocity (2 floats)
-            a = np.random.uniform(0.0, np.pi * 2.0)
-            r = np.random.uniform(0.1, 0.9)
-            yield np.cos(a) * r + self.mouse_velocity[0]
-            yield np.sin(a) * r + self.mouse_velocity[1]
-            # Random color (3 floats)
-            yield np.random.uniform(0.0, 1.0)
-            yield np.random.uniform(0.0, 1.0)
-            yield np.random.uniform(0.0, 1.0)
+    def emit_gpu_deferred(self, time, frame_time):
+        """Method #4
+        Emit new particles using a shader without reading
+        this frame's query. Layout of the output buffer:
+
+            [emitted | survivors | dead ... ]
+
+        Only the emit count is needed for offsets and that is
+        known on the cpu. ``active_particles`` becomes an upper
+        bound and the dead tail is discarded by the geometry shader
+        next frame (and is below the screen when rendered).
+        """
+        vertices, emit_count = self.scheduler.begin_frame()
+
+        if vertices > 0:
+            # Mark every slot the survivors could occupy as dead first
+            self.kill_vao.transform(self.vbo2, vertices=vertices, buffer_offset=emit_count * self.stride)
+
+        # The query is always issued so the scheduler can read it back later
+        with self.scheduler.query:
+            if vertices > 0:
+                self.transform_vao1.transform(
+                    self.vbo2, moderngl.POINTS,
+                    vertices=vertices,
+                    buffer_offset=emit_count * self.stride,
+                )
+
+        if emit_count > 0:
+            self.gpu_emitter_prog['mouse_pos'].value = self.mouse_pos
+            self.gpu_emitter_prog['mouse_vel'].value = self.mouse_velocity
+            self.gpu_emitter_prog['time'].value = max(time, 0)
+            self.gpu_emitter_vao.transform(self.vbo2, vertices=emit_count)
+
+        self.active_particles = self.scheduler.end_frame()
+        self.render_vao2.render(moderngl.POINTS, vertices=self.active_particles)
 
     @property
     def projection(self):
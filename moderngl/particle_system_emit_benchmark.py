@@ -0,0 +1,133 @@
+"""
+Benchmark the emit methods of particle_system_emit.py
+and the compute shader engine in particle_system_compute.py
+
+Each method runs for a fixed number of frames with a larger
+particle buffer and we report how many particles per second
+were emitted, the average time of a full transform + emit step
+and the frame time jitter (standard deviation and p99 - p50).
+Method #4 never reads a query of the current frame, so the
+difference in jitter against #3 is what the sync costs.
+
+CPU methods #1 and #2 use the vectorized ParticleEmitter.
+Run it headless to keep vsync and window events out of the numbers:
+
+    python particle_system_emit_benchmark.py --window headless
+
+Pass --compute to benchmark ComputeParticles instead (OpenGL 4.3).
+The compute engine only reads its emitted counter back once at the end.
+"""
+import sys
+import time
+
+import numpy as np
+
+from particle_system_emit import Particles
+from particle_system_compute import ComputeParticles
+
+
+def summarize(name, emitted, frame_times):
+    """(name, particles/sec, mean, std, p99 - p50) with frame times in seconds"""
+    # Skip the first frame, it includes the switch from the previous method
+    frame_times = frame_times[1:] * 1000
+    p50, p99 = np.percentile(frame_times, [50, 99])
+    return name, emitted / frame_times.sum() * 1000, frame_times.mean(), frame_times.std(), p99 - p50
+
+
+def print_results(count, max_emit_count, results):
+    print(f"{count} particles, {max_emit_count} emitted per frame max, times in ms")
+    print(f"  {'method':<16} {'M particles/s':>13} {'frame':>8} {'std':>8} {'p99-p50':>8}")
+    for name, rate, mean, std, spread in results:
+        print(f"  {name:<16} {rate / 1e6:13.2f} {mean:8.3f} {std:8.3f} {spread:8.3f}")
+
+
+class ParticlesEmitBenchmark(Particles):
+    title = "Particle System Emitter Benchmark"
+    samples = 0  # Headless is not always happy with multisampling
+    particle_count = 1_000_000
+    frames_per_method = 200
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.methods = [
+            ('#1 cpu simple', self.emit_cpu_simple),
+            ('#2 cpu buffer', self.emit_cpu_buffer),
+            ('#3 gpu', self.emit_gpu),
+            ('#4 gpu deferred', self.emit_gpu_deferred),
+        ]
+        self.frame = 0
+        self.results = []
+        self.emitted = 0
+        self.frame_times = np.zeros(self.frames_per_method)
+        self.last_frame = None
+
+    def render(self, time_, frame_time):
+        self.transform['ft'].value = 0.02
+        self.move_mouse(time_)
+
+        name, method = self.methods[self.frame // self.frames_per_method]
+        if method == self.emit_gpu_deferred and self.frame % self.frames_per_method == 0:
+            self.scheduler.reset(self.active_particles)
+
+        # Time from frame to frame without finish() so a method that
+        # does not stall can overlap cpu and gpu work like in a real app
+        method(time_, frame_time)
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_times[self.frame % self.frames_per_method] = now - self.last_frame
+        self.last_frame = now
+        if method == self.emit_gpu_deferred:
+            self.emitted += self.scheduler.emit_count
+        else:
+            self.emitted += self.active_particles - self.query.primitives
+
+        self.transform_vao1, self.transform_vao2 = self.transform_vao2, self.transform_vao1
+        self.render_vao1, self.render_vao2 = self.render_vao2, self.render_vao1
+        self.vbo1, self.vbo2 = self.vbo2, self.vbo1
+
+        self.frame += 1
+        if self.frame % self.frames_per_method == 0:
+            self.results.append(summarize(name, self.emitted, self.frame_times))
+            self.emitted = 0
+
+        if self.frame == len(self.methods) * self.frames_per_method:
+            print_results(self.N, self.max_emit_count, self.results)
+            self.wnd.close()
+
+
+class ComputeParticlesEmitBenchmark(ComputeParticles):
+    title = "Particle System Compute Benchmark"
+    samples = 0  # Headless is not always happy with multisampling
+    particle_count = 1_000_000
+    frames_per_method = 200
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.frame = 0
+        self.frame_times = np.zeros(self.frames_per_method)
+        self.last_frame = None
+        self.start_emitted = self.emitted
+
+    def render(self, time_, frame_time):
+        self.update_shader['ft'].value = 0.02
+        self.move_mouse(time_)
+
+        self.emit_gpu(time_, frame_time)
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_times[self.frame] = now - self.last_frame
+        self.last_frame = now
+
+        self.frame += 1
+        if self.frame == self.frames_per_method:
+            result = summarize('compute', self.emitted - self.start_emitted, self.frame_times)
+            print_results(self.N, self.max_emit_count, [result])
+            self.wnd.close()
+
+
+if __name__ == '__main__':
+    if '--compute' in sys.argv:
+        sys.argv.remove('--compute')
+        ComputeParticlesEmitBenchmark.run()
+    else:
+        ParticlesEmitBenchmark.run()
@@ -1,25 +1,124 @@
 """
-Using a subprocess in python to calculate data on a separate core.
+Using subprocesses in python to calculate data on separate cores.
 Threads in python are not really suitable for this task because
 of the GIL and we would just be slowing down the main thread.
 
-This is a fairly simple example spawning a deamon thread that
-throws new random textures on a queue that can be read back by
-the main process.
+Several producer processes each fill a horizontal band of
+the texture with random pixels. Frames are not pickled or sent
+through a queue. Every producer gets a triple buffer in shared memory:
 
-There are probably better ways of doing this, but this is a good start.
-For example: We might want spawn multiple processes that writes to
-the same queue.
+* The producer always has a slot to write to that is neither the latest
+  published frame nor the one the main process is reading, so it never waits.
+* The main process uploads the latest frame with ``texture.write()``
+  straight from a memoryview of the shared memory.
+
+The slot indices live in the shared memory as well. Instead of a lock
+every slot has a sequence number that is odd while the slot is written
+(a seqlock). If the number changed during an upload the producer lapped
+us and we try again with the newer frame.
+
+Producer and consumer frame rates and frames that were overwritten
+before they were displayed (dropped) are printed every second:
+
+    python subprocess_texture.py --producers 4 --producer-fps 0
 """
-from time import sleep
+from time import perf_counter, sleep
 import multiprocessing as mp
-from queue import Empty
-import struct
-import random
+from multiprocessing import shared_memory
+import numpy as np
 import moderngl_window
 from moderngl_window import geometry
 from pyrr import matrix44
 
+# int64 header fields of a triple buffer
+LATEST, READING, PRODUCED, SEQUENCE = 0, 1, 2, 3
+HEADER_SIZE = 8 * 8
+
+
+class TripleBuffer:
+    """Single producer / single consumer triple buffer in shared memory"""
+    slots = 3
+
+    def __init__(self, frame_size, name=None):
+        """
+        Args:
+            frame_size: Byte size of one frame
+            name: Name of the shared memory to attach to. Creates it when None
+        """
+        self.frame_size = frame_size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + frame_size * self.slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray((8,), dtype='i8', buffer=self.shm.buf)
+        if name is None:
+            self.header[:] = 0
+            self.header[LATEST] = -1
+            self.header[READING] = -1
+        self.frames = [
+            self.shm.buf[HEADER_SIZE + i * frame_size:HEADER_SIZE + (i + 1) * frame_size]
+            for i in range(self.slots)
+        ]
+
+    # Producer side
+
+    def begin_write(self):
+        """
+        Returns:
+            (slot, numpy array of the frame) to fill in
+        """
+        busy = self.header[LATEST], self.header[READING]
+        slot = next(i for i in range(self.slots) if i not in busy)
+        self.header[SEQUENCE + slot] += 1  # odd: being written
+        return slot, np.frombuffer(self.frames[slot], dtype='u1')
+
+    def end_write(self, slot):
+        self.header[SEQUENCE + slot] += 1
+        self.header[LATEST] = slot
+        self.header[PRODUCED] += 1
+
+    # Consumer side
+
+    @property
+    def produced(self):
+        return int(self.header[PRODUCED])
+
+    def read(self, upload, last=None):
+        """Pass the latest frame as a memoryview to ``upload``.
+
+        Args:
+            upload: Called with the frame data
+            last: Number of the frame read last time. Nothing is uploaded if there is no newer one
+        Returns:
+            Number of the frame that was uploaded, or None if
+            no consistent frame could be read
+        """
+        for _ in range(self.slots):
+            produced = int(self.header[PRODUCED])
+            if produced == last:
+                return last
+            slot = int(self.header[LATEST])
+            if slot < 0:
+                return None
+            self.header[READING] = slot
+            sequence = self.header[SEQUENCE + slot]
+            # The producer can only reuse the slot if it was published before READING was set
+            if sequence % 2 == 0 and self.header[LATEST] == slot:
+                upload(self.frames[slot])
+                if self.header[SEQUENCE + slot] == sequence:
+                    return produced
+        return None
+
+    def close(self, unlink=False):
+        # Views into the shared memory must be released before closing it
+        self.header = None
+        for frame in self.frames:
+            frame.release()
+        self.frames = []
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
 
 class SubprocessTest(moderngl_window.WindowConfig):
     window_size = 512, 512
@@ -27,7 +126,8 @@ class SubprocessTest(moderngl_window.WindowConfig):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.texture = self.ctx.texture((100, 100), 3, data=gen_texture())
+        self.size = 100, 100
+        self.texture = self.ctx.texture(self.size, 3)
         self.texture.filter = self.ctx.NEAREST, self.ctx.NEAREST
         self.quad = geometry.quad_2d(size=(1.3, 1.3))
         self.program = self.ctx.program(
@@ -52,16 +152,39 @@ class SubprocessTest(moderngl_window.WindowConfig):
             }
             """,
         )
-        self.generator = TextureGenerator()
+        # One horizontal band of the texture per producer
+        rows = np.linspace(0, self.size[1], self.argv.producers + 1).astype(int)
+        self.bands = [(0, int(y0), self.size[0], int(y1 - y0)) for y0, y1 in zip(rows[:-1], rows[1:])]
+        self.generator = TextureGenerator(
+            [w * h * 3 for _, _, w, h in self.bands],
+            fps=self.argv.producer_fps,
+        )
         self.generator.start()
 
+        # Statistics
+        self.displayed = [None] * len(self.bands)  # last frame number displayed per producer
+        self.stats_time = perf_counter()
+        self.stats_frames = 0
+        self.stats_produced = [0] * len(self.bands)
+        self.stats_new = [0] * len(self.bands)
+        self.stats_dropped = [0] * len(self.bands)
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument('--producers', type=int, default=2, help="Number of producer processes")
+        parser.add_argument('--producer-fps', type=float, default=120,
+                            help="Frame rate limit of each producer. 0 means unlimited")
+
     def next_texture(self):
-        """Attempt to get a new texture from the queue"""
-        try:
-            data = self.generator.queue.get(block=False)
-            self.texture.write(data)
-        except Empty:
-            pass
+        """Upload the latest frame of every producer"""
+        for i, (band, buffer) in enumerate(zip(self.bands, self.generator.buffers)):
+            frame = buffer.read(lambda data: self.texture.write(data, viewport=band), last=self.displayed[i])
+            if frame is None or frame == self.displayed[i]:
+                continue
+            if self.displayed[i] is not None:
+                self.stats_new[i] += 1
+                self.stats_dropped[i] += frame - self.displayed[i] - 1
+            self.displayed[i] = frame
 
     def render(self, time: float, frame_time: float):
         self.ctx.clear()
@@ -70,44 +193,86 @@ class SubprocessTest(moderngl_window.WindowConfig):
         self.quad.render(self.program)
 
         self.next_texture()
+        self.report()
+
+    def report(self):
+        self.stats_frames += 1
+        now = perf_counter()
+        elapsed = now - self.stats_time
+        if elapsed < 1.0:
+            return
+
+        print(f"consumer {self.stats_frames / elapsed:.1f} fps")
+        for i, buffer in enumerate(self.generator.buffers):
+            produced = buffer.produced
+            print(f"  producer {i}: {(produced - self.stats_produced[i]) / elapsed:.1f} fps, "
+                  f"displayed {self.stats_new[i] / elapsed:.1f} fps, "
+                  f"dropped {self.stats_dropped[i]}")
+            self.stats_produced[i] = produced
+        self.stats_time = now
+        self.stats_frames = 0
+        self.stats_new = [0] * len(self.bands)
+        self.stats_dropped = [0] * len(self.bands)
 
     def close(self):
         self.generator.stop()
 
 
 class TextureGenerator:
+    """Runs one producer process per triple buffer"""
 
-    def __init__(self):
-        self.queue = mp.Queue()
-        self.process = mp.Process(
-            target=self.do_work,
-            args=(self.queue,),
-            daemon=True,
-        )
+    def __init__(self, frame_sizes, fps=0):
+        """
+        Args:
+            frame_sizes: Byte size of the frames of each producer
+            fps: Frame rate limit of the producers. 0 means unlimited
+        """
+        self.buffers = [TripleBuffer(size) for size in frame_sizes]
+        self.running = mp.Event()
+        self.processes = [
+            mp.Process(
+                target=self.do_work,
+                args=(buffer.shm.name, buffer.frame_size, self.running, fps),
+                daemon=True,
+            )
+            for buffer in self.buffers
+        ]
 
-    def do_work(self, queue):
-        while True:
-            # Back off a little bit to avoid overloading the queue
-            if self.queue.qsize() > 60:
-                sleep(0.5)
+    @staticmethod
+    def do_work(name, frame_size, running, fps):
+        buffer = TripleBuffer(frame_size, name=name)
+        rng = np.random.default_rng()
+        next_frame = perf_counter()
 
-            queue.put(gen_texture(), block=False)
+        while running.is_set():
+            slot, frame = buffer.begin_write()
+            frame[:] = rng.integers(0, 256, size=frame_size, dtype=np.uint8)
+            del frame
+            buffer.end_write(slot)
 
-    def start(self):
-        self.process.start()
+            if fps:
+                next_frame += 1 / fps
+                delay = next_frame - perf_counter()
+                if delay > 0:
+                    sleep(delay)
+                else:
+                    next_frame = perf_counter()
 
-    def stop(self):
-        self.process.terminate()
+        buffer.close()
 
+    def start(self):
+        self.running.set()
+        for process in self.processes:
+            process.start()
 
-def gen_texture():
-    """
-    An inefficient way of generating random texture.
-    The goal is to make the process reasonably busy.
-    """
-    num_frags = 100 * 100 * 3
-    data = [random.randint(0, 255) for _ in range(num_frags)]
-    return struct.pack(f"{num_frags}B", *data)
+    def stop(self):
+        self.running.clear()
+        for process in self.processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        for buffer in self.buffers:
+            buffer.close(unlink=True)
 
 
 if __name__ == "__main__":
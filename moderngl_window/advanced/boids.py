@@ -7,6 +7,8 @@ import moderngl
 import moderngl_window
 from moderngl_window.opengl.vao import VAO
 
+from buffer_texture import BufferTexture
+
 
 class Boids(moderngl_window.WindowConfig):
     """
@@ -20,8 +22,9 @@ class Boids(moderngl_window.WindowConfig):
     We are doing this the O(n^2) way with the gpu using transform feedback.
     To make the data avaialble to the vertex shader (looping through it)
     we copy the vertex buffer every frame to a texture.
+    The copy happens on the gpu (see buffer_texture.py).
 
-    A better way in the future is to use compute shader.
+    A better way in the future is to use compute shader (see boids_grid.py).
     """
     title = "Boids"
     resource_dir = (Path(__file__) / '../../resources').absolute()
@@ -46,7 +49,8 @@ class Boids(moderngl_window.WindowConfig):
         gen = gen_initial_data(N, x_area=self.aspect_ratio * 2 * 0.9, y_area=2.0 * 0.95)
         data = numpy.fromiter(gen, count=N * 4, dtype='f4')
         self.boids_buffer_1 = self.ctx.buffer(data.tobytes())
-        self.boids_buffer_2 = self.ctx.buffer(data=self.boids_buffer_1.read())
+        self.boids_buffer_2 = self.ctx.buffer(reserve=self.boids_buffer_1.size)
+        self.ctx.copy_buffer(self.boids_buffer_2, self.boids_buffer_1)
 
         self.boids_vao_1 = VAO(name='boids_1', mode=moderngl.POINTS)
         self.boids_vao_1.buffer(self.boids_buffer_1, '2f 2f', ['in_position', 'in_velocity'])
@@ -54,7 +58,9 @@ class Boids(moderngl_window.WindowConfig):
         self.boids_vao_2 = VAO(name='boids_2', mode=moderngl.POINTS)
         self.boids_vao_2.buffer(self.boids_buffer_2, '2f 2f', ['in_position', 'in_velocity'])
 
-        self.boids_texture = self.ctx.texture((MAX_TEX_WIDTH, N * 2 // MAX_TEX_WIDTH), components=2, dtype='f4')
+        self.boids_texture = BufferTexture.for_buffer(self.ctx, self.boids_buffer_1, components=2, max_width=MAX_TEX_WIDTH)
+        self.boids_texture.update(self.boids_buffer_1)
+        print(f"Not copying {self.boids_texture.bytes_saved_per_frame} bytes per frame through the cpu")
 
         # Programs
         self.boids_render_program = self.load_program('programs/boids/boids_render.glsl')
@@ -83,8 +89,8 @@ class Boids(moderngl_window.WindowConfig):
         self.boids_vao_1, self.boids_vao_2 = self.boids_vao_2, self.boids_vao_1
         self.boids_buffer_1, self.boids_buffer_2 = self.boids_buffer_2, self.boids_buffer_1
 
-        # Write vertex data into texture so we can interate it in shader
-        self.boids_texture.write(self.boids_buffer_1.read())
+        # Copy vertex data into texture on the gpu so we can interate it in shader
+        self.boids_texture.update(self.boids_buffer_1)
 
 
 if __name__ == '__main__':
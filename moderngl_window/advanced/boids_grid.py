@@ -0,0 +1,187 @@
+from pathlib import Path
+
+import numpy as np
+from pyrr import matrix44
+
+import moderngl
+import moderngl_window
+
+
+class BoidsGrid(moderngl_window.WindowConfig):
+    """
+    Boids with a uniform grid built on the gpu every frame.
+
+    boids.py compares every boid with all the others (O(n^2)) and
+    copies the boids through the cpu into a texture every frame.
+    Here everything stays in storage buffers and compute shaders:
+
+    1. count: every boid adds itself to the counter of its cell
+       and remembers its slot inside the cell
+    2. scan: prefix sum of the cell counters gives the start of each cell
+    3. scatter: boids are copied into cell order (counting sort)
+    4. update: each boid only looks at the boids in the 3 x 3 cells around it
+
+    The cell size is at least the neighbour radius so nothing is missed.
+    The world wraps around at the edges.
+    """
+    title = "Boids (spatial grid)"
+    gl_version = 4, 3
+    resource_dir = (Path(__file__) / '../../resources').absolute()
+    aspect_ratio = 16 / 9
+    samples = 0
+
+    GROUP_SIZE = 256
+    SCAN_GROUP_SIZE = 1024
+    MAX_CELLS = SCAN_GROUP_SIZE * SCAN_GROUP_SIZE  # two levels of scan
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        defines = {'GROUP_SIZE': self.GROUP_SIZE}
+        self.count_shader = self.load_compute_shader('programs/boids_grid/count.glsl', defines=defines)
+        self.scatter_shader = self.load_compute_shader('programs/boids_grid/scatter.glsl', defines=defines)
+        self.update_shader = self.load_compute_shader('programs/boids_grid/update.glsl', defines=defines)
+        defines = {'GROUP_SIZE': self.SCAN_GROUP_SIZE}
+        self.scan_shader = self.load_compute_shader('programs/boids_grid/scan.glsl', defines=defines)
+        self.scan_add_shader = self.load_compute_shader('programs/boids_grid/scan_add.glsl', defines=defines)
+        self.render_program = self.load_program('programs/boids_grid/render.glsl')
+
+        self.world_min = np.array([-self.aspect_ratio, -1.0], dtype='f4')
+        self.world_size = np.array([self.aspect_ratio * 2, 2.0], dtype='f4')
+        self.render_program['m_proj'].write(matrix44.create_orthogonal_projection(
+            -self.aspect_ratio, self.aspect_ratio,
+            -1.0, 1.0,
+            -1.0, 1.0,
+            dtype='f4',
+        ))
+
+        self.num_boids = 0
+        self.create_boids(self.argv.boids)
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument('--boids', type=int, default=1 << 20, help="Number of boids")
+
+    def create_boids(self, n, radius=None, seed=None):
+        """(Re)create all buffers for n boids.
+
+        Args:
+            n: Number of boids
+            radius: Neighbour radius. By default it shrinks with the number of boids
+                    so every boid has roughly the same number of neighbours
+            seed: Optional seed for the initial positions
+        """
+        if self.num_boids:
+            self.release_boids()
+        self.num_boids = n
+        self.radius = radius or float(np.sqrt(self.world_size.prod() * 20 / (np.pi * n)))
+
+        # Cells at least as large as the radius, and no more cells than the scan can handle
+        grid = np.maximum(np.floor(self.world_size / self.radius), 3).astype(int)
+        while grid.prod() > self.MAX_CELLS:
+            grid = np.maximum(grid // 2, 3)
+        self.grid_size = tuple(int(v) for v in grid)
+        self.num_cells = int(grid.prod())
+        cell_size = self.world_size / grid
+
+        rng = np.random.default_rng(seed)
+        data = np.empty((n, 4), dtype='f4')
+        data[:, :2] = self.world_min + rng.random((n, 2)) * self.world_size
+        angle = rng.random(n) * np.pi * 2
+        data[:, 2] = np.cos(angle) * 0.1
+        data[:, 3] = np.sin(angle) * 0.1
+
+        self.boids_buffer = self.ctx.buffer(data)
+        self.sorted_buffer = self.ctx.buffer(reserve=data.nbytes)
+        self.keys_buffer = self.ctx.buffer(reserve=n * 8)
+        self.counts_buffer = self.ctx.buffer(reserve=self.num_cells * 4)
+        self.starts_buffer = self.ctx.buffer(reserve=self.num_cells * 4)
+        self.num_blocks = (self.num_cells + self.SCAN_GROUP_SIZE - 1) // self.SCAN_GROUP_SIZE
+        self.block_sums_buffer = self.ctx.buffer(reserve=self.num_blocks * 4)
+        self.block_offsets_buffer = self.ctx.buffer(reserve=self.num_blocks * 4)
+        self.block_total_buffer = self.ctx.buffer(reserve=4)
+
+        for shader in (self.count_shader, self.scatter_shader, self.update_shader):
+            shader['num_boids'] = n
+        for shader in (self.count_shader, self.update_shader):
+            shader['grid_size'] = self.grid_size
+            shader['world_min'] = tuple(self.world_min)
+            shader['cell_size'] = tuple(cell_size)
+        self.update_shader['world_size'] = tuple(self.world_size)
+        self.update_shader['radius'] = self.radius
+        self.update_shader['separation_radius'] = self.radius * 0.3
+
+        # Rendered from the buffer the update pass writes to
+        self.render_vao = self.ctx.vertex_array(
+            self.render_program,
+            [(self.boids_buffer, '2f 2f', 'in_position', 'in_velocity')],
+        )
+
+    def release_boids(self):
+        for buffer in (
+            self.boids_buffer, self.sorted_buffer, self.keys_buffer, self.counts_buffer, self.starts_buffer,
+            self.block_sums_buffer, self.block_offsets_buffer, self.block_total_buffer,
+        ):
+            buffer.release()
+        self.render_vao.release()
+
+    def groups(self, n, group_size=GROUP_SIZE):
+        return (n + group_size - 1) // group_size
+
+    def step(self, timedelta):
+        """Advance the simulation. Everything stays on the gpu"""
+        # 1. Count boids per cell
+        self.counts_buffer.clear()
+        self.boids_buffer.bind_to_storage_buffer(0)
+        self.counts_buffer.bind_to_storage_buffer(1)
+        self.keys_buffer.bind_to_storage_buffer(2)
+        self.count_shader.run(self.groups(self.num_boids))
+        self.ctx.memory_barrier()
+
+        # 2. Start of every cell. Scan blocks, scan block totals, add them back
+        self.scan_shader['count'] = self.num_cells
+        self.counts_buffer.bind_to_storage_buffer(0)
+        self.starts_buffer.bind_to_storage_buffer(1)
+        self.block_sums_buffer.bind_to_storage_buffer(2)
+        self.scan_shader.run(self.num_blocks)
+        self.ctx.memory_barrier()
+
+        if self.num_blocks > 1:
+            self.scan_shader['count'] = self.num_blocks
+            self.block_sums_buffer.bind_to_storage_buffer(0)
+            self.block_offsets_buffer.bind_to_storage_buffer(1)
+            self.block_total_buffer.bind_to_storage_buffer(2)
+            self.scan_shader.run(1)
+            self.ctx.memory_barrier()
+
+            self.scan_add_shader['count'] = self.num_cells
+            self.starts_buffer.bind_to_storage_buffer(0)
+            self.block_offsets_buffer.bind_to_storage_buffer(1)
+            self.scan_add_shader.run(self.num_blocks)
+            self.ctx.memory_barrier()
+
+        # 3. Counting sort into cell order
+        self.boids_buffer.bind_to_storage_buffer(0)
+        self.keys_buffer.bind_to_storage_buffer(1)
+        self.starts_buffer.bind_to_storage_buffer(2)
+        self.sorted_buffer.bind_to_storage_buffer(3)
+        self.scatter_shader.run(self.groups(self.num_boids))
+        self.ctx.memory_barrier()
+
+        # 4. Flocking from the neighbouring cells, written back to the boids buffer
+        self.update_shader['timedelta'] = timedelta
+        self.sorted_buffer.bind_to_storage_buffer(0)
+        self.starts_buffer.bind_to_storage_buffer(1)
+        self.counts_buffer.bind_to_storage_buffer(2)
+        self.boids_buffer.bind_to_storage_buffer(3)
+        self.update_shader.run(self.groups(self.num_boids))
+        self.ctx.memory_barrier()
+
+    def render(self, time, frame_time):
+        self.ctx.clear(0.05, 0.05, 0.1)
+        self.step(min(frame_time, 1 / 30))
+        self.render_vao.render(moderngl.POINTS)
+
+
+if __name__ == '__main__':
+    moderngl_window.run_window_config(BoidsGrid)
@@ -0,0 +1,51 @@
+"""
+Benchmark the spatial grid boids in boids_grid.py for a range of flock sizes.
+
+Each size runs a number of frames without rendering and we report
+the average step time (simulation only, waiting for the gpu with finish())
+and how many boid updates per second that is.
+
+    python boids_grid_benchmark.py --window headless
+    python boids_grid_benchmark.py --window headless --sizes 65536 1048576 4194304 --frames 50
+"""
+import time
+
+import moderngl_window
+
+from boids_grid import BoidsGrid
+
+
+class BoidsGridBenchmark(BoidsGrid):
+    title = "Boids (spatial grid) Benchmark"
+    window_size = 256, 256
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[1 << 14, 1 << 16, 1 << 18, 1 << 20, 1 << 22],
+                            help="Flock sizes to benchmark")
+        parser.add_argument('--frames', type=int, default=100, help="Frames per flock size")
+
+    def render(self, time_, frame_time):
+        print(f"{'boids':>9} {'grid':>11} {'ms/frame':>9} {'M boids/s':>10}")
+        for n in self.argv.sizes:
+            self.create_boids(n, seed=0)
+            # Warm up so the flock has some structure and the shaders are compiled
+            for _ in range(5):
+                self.step(1 / 60)
+            self.ctx.finish()
+
+            start = time.perf_counter()
+            for _ in range(self.argv.frames):
+                self.step(1 / 60)
+            self.ctx.finish()
+            seconds = (time.perf_counter() - start) / self.argv.frames
+
+            grid = f"{self.grid_size[0]}x{self.grid_size[1]}"
+            print(f"{n:>9} {grid:>11} {seconds * 1000:9.2f} {n / seconds / 1e6:10.2f}")
+        self.wnd.close()
+
+
+if __name__ == '__main__':
+    moderngl_window.run_window_config(BoidsGridBenchmark)
@@ -0,0 +1,65 @@
+"""
+Feed the output of one pass into a sampler of the next without the cpu.
+
+A common way to read the transform feedback output of the last frame
+in a shader is ``texture.write(buffer.read())``. That downloads the whole
+buffer into python bytes and uploads it again every frame.
+
+``Texture.write()`` also accepts a ``Buffer``. The buffer is then bound
+as a pixel unpack buffer and the copy into the texture happens on the gpu
+without touching host memory. This works with any ping-pong setup
+(boids, particles, game of life) where the data in the buffer is laid out
+as the texels of the texture.
+"""
+import moderngl
+
+
+class BufferTexture:
+    """A texture updated from a buffer on the gpu.
+
+    Keeps count of the bytes that a ``buffer.read()`` + ``texture.write()``
+    round trip would have moved between host and gpu memory.
+    """
+    def __init__(self, ctx: moderngl.Context, size, components: int, dtype: str = 'f4'):
+        """
+        Args:
+            ctx: moderngl context
+            size: (width, height) of the texture
+            components: Number of components per texel
+            dtype: Data type of the texels
+        """
+        self.texture = ctx.texture(size, components, dtype=dtype)
+        self.texture.filter = moderngl.NEAREST, moderngl.NEAREST
+        self.nbytes = size[0] * size[1] * components * int(dtype[1:])
+        self.frames = 0
+        self.bytes_saved = 0
+
+    @classmethod
+    def for_buffer(cls, ctx: moderngl.Context, buffer: moderngl.Buffer, components: int, dtype: str = 'f4',
+                   max_width: int = 8192):
+        """Texture with exactly as many texels as the buffer holds.
+        Rows are ``max_width`` texels wide, so the texel count must be a multiple of it if it is larger.
+        """
+        texel_size = components * int(dtype[1:])
+        texels = buffer.size // texel_size
+        width = min(texels, max_width)
+        if texels % width:
+            raise ValueError(f"{texels} texels do not fill rows of {width} texels")
+        return cls(ctx, (width, texels // width), components, dtype=dtype)
+
+    @property
+    def bytes_saved_per_frame(self) -> int:
+        """Bytes a download and upload of the data would cost every frame"""
+        return 2 * self.nbytes
+
+    def update(self, buffer: moderngl.Buffer):
+        """Copy the buffer into the texture on the gpu"""
+        self.texture.write(buffer)
+        self.frames += 1
+        self.bytes_saved += self.bytes_saved_per_frame
+
+    def use(self, location: int = 0):
+        self.texture.use(location=location)
+
+    def release(self):
+        self.texture.release()
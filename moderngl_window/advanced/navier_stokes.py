@@ -4,8 +4,23 @@ GPU version of https://github.com/salt-die/navier-stokes
 Interact with the window using to add pressure and momentum.
 * Left mouse button (including drag) pokes the surface
 * Right mouse button places walls
+
+Drops and walls are collected during the frame and drawn with one
+instanced draw per target (see splat_batch.py). --rain N adds N random
+drops every frame.
+
+The pressure equation is solved with jacobi iterations or multigrid V-cycles
+over a pyramid of pressure textures, each level half the size of the previous.
+Every frame the pressure takes one implicit time step towards the solution of
+the pressure equation, so solving it accurately stays stable in heavy rain.
+--check runs V-cycles on a test source and checks that the residual drops.
+The simulation grid does not have to match the window:
+
+    python navier_stokes.py --grid-size 512 256 --solver multigrid --iterations 2
+
+The gpu time of the solver (averaged over the frames) and the residual
+of the pressure equation are printed every second. M switches solver, UP / DOWN change the iterations.
 """
-import random
 from pathlib import Path
 import numpy as np
 from pyrr import matrix44
@@ -13,10 +28,48 @@ from pyrr import matrix44
 import moderngl_window
 from moderngl_window import geometry
 
+from splat_batch import SplatBatch
+
 external_flow = .35
 viscosity = .018  # Is it odd that negative viscosity still works?
 rho = 1.06  # Density
 damping = 0.999
+# The pressure relaxes towards the solution of the pressure equation by one implicit step
+# of this size per frame. The single jacobi pass of the original example is the explicit step
+pressure_step = 1.0
+
+
+class PressureLevel:
+    """Textures of one level of the pressure pyramid"""
+    def __init__(self, ctx, size, level):
+        self.size = size
+        # The pressure is zero half a cell of level 0 beyond the edge. Outside of the grid
+        # coarser levels extrapolate the pressure at the edge with this factor to match.
+        # With cells 2^level wide that is -(2^level - 1) / (2^level + 1)
+        t = 0.5 - 0.5 ** (level + 1)
+        self.boundary = -t / (1 - t)
+        self.level = level
+        self.set_step(pressure_step)
+        self.pressure = ctx.texture(size, 1, dtype='f4')
+        self.pressure_next = ctx.texture(size, 1, dtype='f4')
+        self.source = ctx.texture(size, 1, dtype='f4')
+        self.walls = ctx.texture(size, 1, dtype='f4')
+
+        self.pressure_fbo = ctx.framebuffer(color_attachments=[self.pressure])
+        self.pressure_next_fbo = ctx.framebuffer(color_attachments=[self.pressure_next])
+        self.source_fbo = ctx.framebuffer(color_attachments=[self.source])
+        self.walls_fbo = ctx.framebuffer(color_attachments=[self.walls])
+
+    def set_step(self, step):
+        """The damping and the time step as a term of the equation
+            pressure * (1 / damping + 1 / step) - poisson(pressure) = source + last_pressure / step
+        Coarse cells sum the residual of 4 fine cells, so the term grows by 4 per level
+        """
+        self.screening = (1.0 / damping - 1.0 + 1.0 / step) * 4 ** self.level
+
+    def swap(self):
+        self.pressure, self.pressure_next = self.pressure_next, self.pressure
+        self.pressure_fbo, self.pressure_next_fbo = self.pressure_next_fbo, self.pressure_fbo
 
 
 class NavierStokes2D(moderngl_window.WindowConfig):
@@ -27,23 +80,37 @@ class NavierStokes2D(moderngl_window.WindowConfig):
     aspect_ratio = None  # Aspect ratio should change with window size
     resizable = False
 
+    # Levels smaller than this are solved with plain iterations
+    COARSEST_SIZE = 4
+    COARSEST_ITERATIONS = 32
+    # Weighted jacobi damps the high frequencies better than plain jacobi
+    SMOOTH_OMEGA = 0.8
+    # --check fails if a V-cycle reduces the residual by less than this on average
+    CHECK_FACTOR = 0.7
+    # Solver times are read this many frames late so the query never stalls the pipeline
+    QUERY_LATENCY = 3
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         # various vars
+        size = tuple(self.argv.grid_size or self.wnd.buffer_size)
+        self.grid_size = size
         self.m_proj = matrix44.create_orthogonal_projection(
-            0, self.wnd.buffer_width,
-            0, self.wnd.buffer_height,
+            0, size[0],
+            0, size[1],
             -1, 1,
             dtype='f4',
         )
-        size = self.wnd.buffer_size
+        # Drops and walls keep their size on screen
+        self.grid_scale = size[0] / self.wnd.buffer_width
 
         # Geometry
         self.quad_fs = geometry.quad_fs()
-        sprite_size = 9 * 4
-        self.drop_geometry = geometry.quad_2d(size=(sprite_size, sprite_size))
-        self.wall_geometry = geometry.quad_2d(size=(sprite_size, sprite_size))
+        sprite_size = 9 * 4 * self.grid_scale
+        attributes = (('in_pos', 2), ('in_force', 1))
+        self.drops = SplatBatch(self.ctx, (sprite_size, sprite_size), attributes)
+        self.walls = SplatBatch(self.ctx, (sprite_size, sprite_size), attributes)
 
         # Framebuffers
         self.momentum_texture_1 = self.ctx.texture(size, 1, dtype='f4')
@@ -52,17 +119,19 @@ class NavierStokes2D(moderngl_window.WindowConfig):
         self.momentum_texture_2 = self.ctx.texture(size, 1, dtype='f4')
         self.momentum_texture_2.repeat_x = True
         self.momentum_texture_2.repeat_y = True
-        self.pressure_texture_1 = self.ctx.texture(size, 1, dtype='f4')
-        self.pressure_texture_2 = self.ctx.texture(size, 1, dtype='f4')
-        self.walls_texture = self.ctx.texture(size, 1, dtype='f4')
-        self.difference_texture = self.ctx.texture(size, 1, dtype='f4')
 
         self.momentum_fbo_1 = self.ctx.framebuffer(color_attachments=[self.momentum_texture_1])
         self.momentum_fbo_2 = self.ctx.framebuffer(color_attachments=[self.momentum_texture_2])
-        self.pressure_fbo_1 = self.ctx.framebuffer(color_attachments=[self.pressure_texture_1])
-        self.pressure_fbo_2 = self.ctx.framebuffer(color_attachments=[self.pressure_texture_2])
-        self.walls_fbo = self.ctx.framebuffer(color_attachments=[self.walls_texture])
-        self.difference_fbo = self.ctx.framebuffer(color_attachments=[self.difference_texture])
+
+        # Pressure pyramid. Level 0 is the simulation grid.
+        # Odd sizes are rounded up. The missing fine cells count as walls (zero pressure),
+        # which is exactly the boundary of level 0, so every level solves the same problem
+        self.levels = [PressureLevel(self.ctx, size, 0)]
+        width, height = size
+        while min(width, height) > self.COARSEST_SIZE:
+            width, height = (width + 1) // 2, (height + 1) // 2
+            self.levels.append(PressureLevel(self.ctx, (width, height), len(self.levels)))
+        self.walls_dirty = True
 
         # programs
         self.texture_prog = self.load_program('programs/navier-stokes/texture.glsl')
@@ -81,52 +150,126 @@ class NavierStokes2D(moderngl_window.WindowConfig):
         self.flow_prog = self.load_program('programs/navier-stokes/flow.glsl')
         self.flow_prog['external_flow'].value = external_flow
         self.poisson_prog = self.load_program('programs/navier-stokes/poisson.glsl')
+        self.poisson_prog['rho'].value = rho
+        self.poisson_prog['pressure_step'].value = pressure_step
+        self.poisson_prog['texture'].value = 0
+        self.poisson_prog['pressure_texture'].value = 1
         self.pressure_prog = self.load_program('programs/navier-stokes/pressure.glsl')
-        self.pressure_prog['rho'].value = rho
-        self.pressure_prog['damping'].value = damping
         self.pressure_prog['pressure_texture'].value = 0
-        self.pressure_prog['difference_texture'].value = 1
+        self.pressure_prog['source_texture'].value = 1
         self.pressure_prog['walls_texture'].value = 3
+        self.restrict_prog = self.load_program('programs/navier-stokes/restrict.glsl')
+        self.restrict_prog['pressure_texture'].value = 0
+        self.restrict_prog['source_texture'].value = 1
+        self.restrict_prog['walls_texture'].value = 3
+        self.restrict_walls_prog = self.load_program('programs/navier-stokes/restrict_walls.glsl')
+        self.prolong_prog = self.load_program('programs/navier-stokes/prolong.glsl')
+        self.prolong_prog['pressure_texture'].value = 0
+        self.prolong_prog['coarse_texture'].value = 1
+        self.prolong_prog['walls_texture'].value = 3
+        self.residual_prog = self.load_program('programs/navier-stokes/residual.glsl')
+        self.residual_prog['pressure_texture'].value = 0
+        self.residual_prog['source_texture'].value = 1
+        self.residual_prog['walls_texture'].value = 3
+        self.residual_prog['boundary'].value = self.levels[0].boundary
+
+        # Solver settings and statistics
+        self.solver = self.argv.solver
+        self.iterations = max(self.argv.iterations, 1)
+        self.smooth_iterations = max(self.argv.smooth, 1)
+        self.queries = [self.ctx.query(time=True) for _ in range(self.QUERY_LATENCY)]
+        self.frame = 0
+        # Power of two sized so every mipmap level averages exactly 2 x 2 texels.
+        # The texels beyond the grid stay zero
+        residual_size = tuple(1 << int(np.ceil(np.log2(n))) for n in size)
+        self.residual_texture = self.ctx.texture(residual_size, 2, dtype='f4')
+        self.residual_fbo = self.ctx.framebuffer(color_attachments=[self.residual_texture])
+        self.residual_level = int(np.log2(max(residual_size)))
+        self.residual_scale = residual_size[0] * residual_size[1] / (size[0] * size[1])
+        self.solver_time = 0.0  # milliseconds, QUERY_LATENCY frames ago
+        self.solver_times = []
+        self.residual = 0.0  # rms residual, last report
+        self.relative_residual = 0.0  # rms residual / rms source, last report
+        self.report_time = 0
 
         self.reset()
+        if self.argv.check:
+            self.check_solver()
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument('--grid-size', type=int, nargs=2, metavar=('WIDTH', 'HEIGHT'),
+                            help="Size of the simulation grid. Defaults to the window size")
+        parser.add_argument('--solver', choices=('jacobi', 'multigrid'), default='jacobi',
+                            help="Pressure solver")
+        parser.add_argument('--iterations', type=int, default=1,
+                            help="Jacobi iterations or multigrid V-cycles per frame")
+        parser.add_argument('--smooth', type=int, default=2,
+                            help="Jacobi iterations before and after each multigrid coarse correction")
+        parser.add_argument('--rain', type=int, default=0, help="Random drops per frame")
+        parser.add_argument('--check', action="store_true", default=False,
+                            help="Check that the residual drops across V-cycles")
 
     def reset(self):
         self.momentum_fbo_2.clear()
-        self.pressure_fbo_2.clear()
-        self.walls_fbo.clear()
+        self.levels[0].pressure_fbo.clear()
+        self.levels[0].walls_fbo.clear()
+        self.walls_dirty = True
+
+    def to_grid(self, x, y):
+        """Mouse position in the window to a position in the simulation grid"""
+        return (
+            x / self.wnd.width * self.grid_size[0],
+            (self.wnd.height - y) / self.wnd.height * self.grid_size[1],
+        )
 
     def drop(self, x, y):
-        rng = 40
-        for i in range(10):
-            pos = (
-                x + int((random.random() - 0.5) * rng),
-                self.wnd.buffer_size[1] - y + int((random.random() - 0.5) * rng)
-            )
-            # Render drop into pressure texture
-            self.pressure_fbo_2.use()
-            self.drop_prog['pos'].value = pos
-            self.drop_prog['force'].value = random.random() * 2.0
+        x, y = self.to_grid(x, y)
+        rng = 40 * self.grid_scale
+        splats = np.empty((10, 3), dtype='f4')
+        splats[:, 0] = x + np.trunc((np.random.random(10) - 0.5) * rng)
+        splats[:, 1] = y + np.trunc((np.random.random(10) - 0.5) * rng)
+        splats[:, 2] = np.random.random(10) * 2.0
+        self.drops.extend(splats)
+
+    def rain(self, count):
+        splats = np.random.random((count, 3)).astype('f4')
+        splats[:, :2] *= self.grid_size
+        splats[:, 2] *= 2.0
+        self.drops.extend(splats)
+
+    def wall(self, x, y):
+        self.walls.add(self.to_grid(x, y), 1.0)
+
+    def render_splats(self):
+        """Draw the drops and walls of this frame, one draw call per target"""
+        if len(self.drops):
+            # Drops set the pressure and clear the momentum
+            self.levels[0].pressure_fbo.use()
             self.drop_prog['write_value'].value = 1.0
-            # self.drop.use()
-            self.drop_geometry.render(self.drop_prog)
+            self.drops.render(self.drop_prog)
             self.momentum_fbo_2.use()
             self.drop_prog['write_value'].value = 0.0
-            self.drop_geometry.render(self.drop_prog)
-
-    def wall(self, x, y):
-        pos = x, self.wnd.buffer_height - y
-        self.walls_fbo.use()
-        self.drop_prog['pos'].value = pos
-        self.drop_prog['force'].value = 1.0
-        self.drop_prog['write_value'].value = 1.0
-        self.drop_geometry.render(self.drop_prog)
+            self.drops.render(self.drop_prog)
+            self.drops.clear()
+        if len(self.walls):
+            self.levels[0].walls_fbo.use()
+            self.drop_prog['write_value'].value = 1.0
+            self.walls.render(self.drop_prog)
+            self.walls.clear()
+            self.walls_dirty = True
 
     def render(self, time, frame_time):
+        fine = self.levels[0]
+        if self.argv.rain:
+            self.rain(self.argv.rain)
+        self.render_splats()
+
         # calculate momentum
         self.momentum_fbo_1.use()
         self.momentum_texture_2.use(location=0)
-        self.pressure_texture_2.use(location=1)
-        self.walls_texture.use(location=3)
+        fine.pressure.use(location=1)
+        fine.walls.use(location=3)
         self.quad_fs.render(self.momentum_prog)
 
         # External Flow
@@ -136,33 +279,172 @@ class NavierStokes2D(moderngl_window.WindowConfig):
         self.quad_fs.render(self.flow_prog)
 
         # change in momentum
-        # .. poisson momentum
-        self.difference_fbo.use()
-        self.momentum_texture_1.use()
+        # .. poisson momentum and the last pressure, the source of the pressure equation
+        fine.source_fbo.use()
+        self.momentum_texture_1.use(location=0)
+        fine.pressure.use(location=1)
         self.quad_fs.render(self.poisson_prog)
         # .. pressure
-        self.pressure_fbo_1.use()
-        self.pressure_texture_2.use(location=0)
-        self.difference_texture.use(location=1)
-        self.walls_texture.use(location=3)
-        self.quad_fs.render(self.pressure_prog)
+        query = self.queries[self.frame % len(self.queries)]
+        if self.frame >= len(self.queries):
+            self.solver_time = query.elapsed / 1e6
+            self.solver_times.append(self.solver_time)
+        with query:
+            self.solve_pressure()
+        self.frame += 1
+        self.update_stats(time)
 
         # Render final result
         self.wnd.fbo.use()
-        self.pressure_texture_1.use(location=0)
-        self.walls_texture.use(location=1)
+        fine.pressure.use(location=0)
+        fine.walls.use(location=1)
         self.quad_fs.render(self.combine_prog)
 
         self.momentum_swap()
-        self.pressure_swap()
 
     def momentum_swap(self):
         self.momentum_texture_1, self.momentum_texture_2 = self.momentum_texture_2, self.momentum_texture_1
         self.momentum_fbo_1, self.momentum_fbo_2 = self.momentum_fbo_2, self.momentum_fbo_1
 
-    def pressure_swap(self):
-        self.pressure_texture_1, self.pressure_texture_2 = self.pressure_texture_2, self.pressure_texture_1
-        self.pressure_fbo_1, self.pressure_fbo_2 = self.pressure_fbo_2, self.pressure_fbo_1
+    def solve_pressure(self):
+        """Solve the pressure equation starting from the pressure of the last frame.
+        The damping and the time step are part of the equation, so both solvers converge to the same pressure.
+        """
+        if self.solver == 'jacobi':
+            self.smooth(0, self.iterations, omega=1.0)
+            return
+
+        if self.walls_dirty:
+            self.restrict_walls()
+        for _ in range(self.iterations):
+            self.v_cycle(0)
+
+    def smooth(self, level, iterations, omega):
+        """Jacobi iterations on one level of the pyramid"""
+        level = self.levels[level]
+        level.source.use(location=1)
+        level.walls.use(location=3)
+        self.pressure_prog['omega'].value = omega
+        self.pressure_prog['boundary'].value = level.boundary
+        self.pressure_prog['screening'].value = level.screening
+        for _ in range(iterations):
+            level.pressure_next_fbo.use()
+            level.pressure.use(location=0)
+            self.quad_fs.render(self.pressure_prog)
+            level.swap()
+
+    def v_cycle(self, level):
+        """Smooth, solve the residual on the coarser levels, add the correction and smooth again"""
+        if level == len(self.levels) - 1:
+            self.smooth(level, self.COARSEST_ITERATIONS, self.SMOOTH_OMEGA)
+            return
+
+        fine, coarse = self.levels[level], self.levels[level + 1]
+        self.smooth(level, self.smooth_iterations, self.SMOOTH_OMEGA)
+
+        # The residual is the source of the coarse level. The correction starts at zero
+        coarse.source_fbo.use()
+        fine.pressure.use(location=0)
+        fine.source.use(location=1)
+        fine.walls.use(location=3)
+        self.restrict_prog['boundary'].value = fine.boundary
+        self.restrict_prog['screening'].value = fine.screening
+        self.quad_fs.render(self.restrict_prog)
+        coarse.pressure_fbo.clear()
+        self.v_cycle(level + 1)
+
+        fine.pressure_next_fbo.use()
+        fine.pressure.use(location=0)
+        coarse.pressure.use(location=1)
+        fine.walls.use(location=3)
+        self.prolong_prog['boundary'].value = coarse.boundary
+        self.quad_fs.render(self.prolong_prog)
+        fine.swap()
+
+        self.smooth(level, self.smooth_iterations, self.SMOOTH_OMEGA)
+
+    def restrict_walls(self):
+        """Walls of the coarse levels from the walls of the simulation grid"""
+        for fine, coarse in zip(self.levels, self.levels[1:]):
+            coarse.walls_fbo.use()
+            fine.walls.use(location=0)
+            self.quad_fs.render(self.restrict_walls_prog)
+        self.walls_dirty = False
+
+    def update_stats(self, time):
+        """Print the average solver time and the current residual every second"""
+        if time - self.report_time <= 1.0:
+            return
+        self.measure_residual()
+        solver_time = np.mean(self.solver_times) if self.solver_times else 0.0
+        print(f"{self.solver} x{self.iterations} on {self.grid_size[0]}x{self.grid_size[1]}: "
+              f"{solver_time:.3f} ms, residual {self.residual:.3e} (relative {self.relative_residual:.3e})")
+        self.solver_times = []
+        self.report_time = time
+
+    def measure_residual(self):
+        """Residual of the current pressure. Costs an extra pass and waits for the gpu"""
+        fine = self.levels[0]
+        # Mean of the squared residual and source in the smallest mipmap
+        self.residual_fbo.use()
+        self.residual_fbo.clear()
+        self.ctx.viewport = (0, 0, *self.grid_size)
+        fine.pressure.use(location=0)
+        fine.source.use(location=1)
+        fine.walls.use(location=3)
+        self.residual_prog['screening'].value = fine.screening
+        self.quad_fs.render(self.residual_prog)
+        self.residual_texture.build_mipmaps()
+        residual, source = np.frombuffer(self.residual_texture.read(level=self.residual_level), dtype='f4')[:2]
+        self.residual = float(np.sqrt(residual * self.residual_scale))
+        self.relative_residual = float(np.sqrt(residual / source)) if source > 0 else 0.0
+
+    def check_solver(self, cycles=8):
+        """Run V-cycles on a test source with walls and print the residual after every cycle.
+        The residual measured on the gpu is compared with the residual computed with numpy.
+        Without the time step the equation is hard to solve for jacobi alone, so a broken
+        coarse correction shows up as a residual that stops dropping.
+        """
+        for level in self.levels:
+            level.set_step(np.inf)
+        fine = self.levels[0]
+        width, height = fine.size
+        y, x = np.mgrid[0:height, 0:width]
+        rng = np.random.default_rng(0)
+        source = np.sin(x / 17) * np.cos(y / 11) * 0.05 + rng.standard_normal((height, width)) * 0.01
+        walls = np.zeros((height, width), dtype='f4')
+        walls[height // 3:height // 3 + 9, width // 4:width // 4 + 9] = 1.0
+        walls[height // 2:height // 2 + 3, width // 2:width // 2 + 40] = 1.0
+        source = (source * (1.0 - walls)).astype('f4')
+        fine.source.write(source)
+        fine.pressure.write(np.zeros_like(source))
+        fine.walls.write(walls)
+        self.restrict_walls()
+
+        residuals = []
+        for _ in range(cycles):
+            self.v_cycle(0)
+            self.measure_residual()
+            residuals.append(self.relative_residual)
+            if len(residuals) == 1:
+                # Zero pressure beyond the edge of level 0
+                pressure = np.frombuffer(fine.pressure.read(), dtype='f4').reshape(height, width)
+                padded = np.pad(pressure, 1)
+                poi = (padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]) * 0.25
+                residual = (source - pressure * (1.0 + fine.screening) + poi) * (1.0 - walls)
+                expected = np.sqrt(np.mean(residual ** 2) / np.mean(source ** 2))
+
+        # Below float precision the residual is rounding noise and stops dropping
+        grew = [i for i in range(1, cycles) if residuals[i] >= residuals[i - 1] and residuals[i] > 1e-6]
+        print("relative residual per V-cycle:", ' '.join(f'{r:.2e}' for r in residuals))
+        print(f"residual drops every V-cycle: {'OK' if not grew else f'grew in cycles {grew}'}")
+        factor = (residuals[-1] / residuals[0]) ** (1 / (cycles - 1))
+        print(f"residual factor per V-cycle {factor:.2f}: {'OK' if factor < self.CHECK_FACTOR else 'too slow'}")
+        matches = np.isclose(residuals[0], expected, rtol=0.05)
+        print(f"gpu residual matches numpy: {'OK' if matches else f'{residuals[0]:.3e} != {expected:.3e}'}")
+        for level in self.levels:
+            level.set_step(pressure_step)
+        self.reset()
 
     def mouse_press_event(self, x, y, button):
         if button == self.wnd.mouse.left:
@@ -182,6 +464,12 @@ class NavierStokes2D(moderngl_window.WindowConfig):
         if action == keys.ACTION_PRESS:
             if key == keys.R:
                 self.reset()
+            if key == keys.M:
+                self.solver = 'multigrid' if self.solver == 'jacobi' else 'jacobi'
+            if key == keys.UP:
+                self.iterations += 1
+            if key == keys.DOWN:
+                self.iterations = max(self.iterations - 1, 1)
 
 
 if __name__ == '__main__':
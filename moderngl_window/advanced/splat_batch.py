@@ -0,0 +1,105 @@
+"""
+Draw many small sprites ("splats") into framebuffers with one draw call.
+
+Rendering drops one at a time means a uniform write and a draw call
+per drop. A ``SplatBatch`` collects the splats of a frame in a numpy
+array instead. ``render()`` uploads them once into an instance buffer
+and draws all of them as instances of a single quad, so thousands of
+splats (rain, many pointers) cost one draw per target framebuffer.
+
+The same batch can be rendered into several framebuffers with different
+uniforms without uploading again. Per splat values are float vertex
+attributes marked as per instance (``/i``) in the program.
+"""
+import numpy as np
+
+import moderngl
+from moderngl_window import geometry
+
+
+class SplatBatch:
+    """Instanced quads with per splat attributes collected on the cpu"""
+    def __init__(self, ctx: moderngl.Context, size, attributes=(('in_pos', 2),), capacity: int = 1024):
+        """
+        Args:
+            ctx: moderngl context
+            size: (width, height) of the quad in the units of the program
+            attributes: (name, components) of the float attributes of every splat
+            capacity: Initial number of splats. Doubles when more are added in a frame
+        """
+        self.ctx = ctx
+        self.size = size
+        self.names = [name for name, _ in attributes]
+        self.format = ' '.join(f'{components}f' for _, components in attributes) + '/i'
+        self.stride = sum(components for _, components in attributes)
+        self.data = np.zeros((max(capacity, 1), self.stride), dtype='f4')
+        self.count = 0
+        self.uploaded = True
+        self.quad = None
+        self.buffer = None
+        self._create_quad()
+        # Statistics
+        self.splats = 0
+        self.draws = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    def _create_quad(self):
+        if self.quad:
+            self.quad.release()
+        self.quad = geometry.quad_2d(size=self.size)
+        self.buffer = self.quad.buffer(self.ctx.buffer(reserve=self.data.nbytes), self.format, self.names)
+
+    def _reserve(self, count):
+        if count <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < count:
+            capacity *= 2
+        data = np.zeros((capacity, self.stride), dtype='f4')
+        data[:self.count] = self.data[:self.count]
+        self.data = data
+
+    def add(self, *values):
+        """Add one splat. Values are given in the order of the attributes.
+        For example ``batch.add((x, y), force)``
+        """
+        self._reserve(self.count + 1)
+        self.data[self.count] = np.hstack(values)
+        self.count += 1
+        self.uploaded = False
+
+    def extend(self, values):
+        """Add many splats at once from an array of shape (n, components of all attributes)"""
+        values = np.asarray(values, dtype='f4').reshape(-1, self.stride)
+        self._reserve(self.count + len(values))
+        self.data[self.count:self.count + len(values)] = values
+        self.count += len(values)
+        self.uploaded = False
+
+    def render(self, program: moderngl.Program):
+        """Draw all splats into the current framebuffer.
+        The instance data is uploaded by the first render after splats were added.
+        """
+        if not self.count:
+            return
+        if not self.uploaded:
+            if self.buffer.size < self.data.nbytes:
+                self._create_quad()
+            self.buffer.write(self.data[:self.count])
+            self.uploaded = True
+            self.splats += self.count
+        self.quad.render(program, instances=self.count)
+        self.draws += 1
+
+    def clear(self):
+        """Forget the splats of this frame. The buffers are kept"""
+        self.count = 0
+
+    def release(self):
+        self.quad.release()
@@ -13,11 +13,22 @@ The point of this example is to :
 * Show how textures can be used as useful lookup structures
 * Partial texture updates from client
 * We can reduce a voxel volume dramatically by just inspecting neighbors
+
+Editing is incremental:
+* add_cubes / remove_cubes draw one point per cube into the lookup texture
+* The volume is split into chunks. Every chunk has its own region of the
+  instance data and only the chunks touched by an edit (including the
+  neighbors of the edited cubes) are transformed again by rebuild()
+* Each non-empty chunk is drawn with its own instanced draw call
+
+F adds and R removes random cubes. Rebuild statistics are printed every second.
 """
+from time import perf_counter
 from pathlib import Path
 from typing import Tuple
 from array import array
 
+import numpy as np
 import moderngl
 from moderngl.program_members import varying
 from pyrr.matrix44 import inverse
@@ -44,12 +55,16 @@ class CubeVoxel(CameraWindow):
         self.voxel.gen_instance_prog = self.load_program("programs/voxel_cubes/gen_voxel_instance_data.glsl")
         self.voxel.voxel_light_prog = self.load_program("programs/voxel_cubes/voxel_light.glsl")
         self.voxel.voxel_wireframe_prog = self.load_program("programs/voxel_cubes/voxel_wireframe.glsl")
+        self.voxel.splat_prog = self.load_program("programs/voxel_cubes/splat_voxels.glsl")
 
         self.wireframe = True
         self.voxel.rebuild()
         self.current_layer = 0
         self.fill = False
 
+        self.rebuild_time = 0
+        self.report_time = 0
+
     def render(self, time, frame_time):
         self.ctx.clear()
         # Render the lookup texture in the background
@@ -76,23 +91,57 @@ class CubeVoxel(CameraWindow):
         else:
             self.voxel.fill_layer(self.current_layer, 0)
 
+        start = perf_counter()
         self.voxel.rebuild()
+        self.rebuild_time += perf_counter() - start
 
         self.current_layer += 1
         if self.current_layer == 100:
             self.fill = not self.fill
             self.current_layer = 0
 
+        if time - self.report_time > 1.0:
+            print(f"{self.voxel.num_instances} cubes, {self.voxel.chunks_rebuilt} chunks rebuilt "
+                  f"in {self.rebuild_time * 1000:.2f} ms")
+            self.voxel.chunks_rebuilt = 0
+            self.rebuild_time = 0
+            self.report_time = time
+
+    def key_event(self, key, action, modifiers):
+        super().key_event(key, action, modifiers)
+        keys = self.wnd.keys
+
+        if action == keys.ACTION_PRESS:
+            if key in (keys.F, keys.R):
+                positions = np.random.randint(0, self.voxel.size, size=(100, 3))
+                if key == keys.F:
+                    self.voxel.add_cubes(positions)
+                else:
+                    self.voxel.remove_cubes(positions)
+
+# A cube and its 6 neighbors
+NEIGHBORS = np.array([(0, 0, 0), (1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)])
+
+
 class Voxel:
     """
     Simple cube voxel implementation using OpenGL 3.3 core.
     We are sticking to simple transforms at textures.
     """
 
-    def __init__(self, *, ctx: moderngl.Context, size: Tuple[int, int, int]):
+    def __init__(self, *, ctx: moderngl.Context, size: Tuple[int, int, int],
+                 chunk_size: Tuple[int, int, int] = (20, 20, 20)):
         self.ctx = ctx
         self._size = size
 
+        # Chunks are numbered x first, then y, then z. All chunks start dirty
+        self._chunk_size = chunk_size
+        self._chunks = tuple(-(-s // c) for s, c in zip(size, chunk_size))
+        self._chunk_volume = chunk_size[0] * chunk_size[1] * chunk_size[2]
+        self._chunk_counts = np.zeros(self.num_chunks, dtype=int)
+        self._dirty = np.ones(self.num_chunks, dtype=bool)
+        self.chunks_rebuilt = 0
+
         # Create lookup texture for active blocks
         # NOTE: We allocate room for 100 x 100 x 100 for now
         #       100 x 100 x 100 = 1_000_000 fragments
@@ -102,18 +151,23 @@ class Voxel:
         self.voxel_lookup.filter = moderngl.NEAREST, moderngl.NEAREST
         self.voxel_lookup.repeat_x = False
         self.voxel_lookup.repeat_y = False
+        self.lookup_fbo = self.ctx.framebuffer(color_attachments=[self.voxel_lookup])
         # Write in some default data
         for i in range(100):
             self.fill_layer(i, 255)
 
-        # Construct the per-instance data for active cubes using a transform
-        self.instance_data = ctx.buffer(reserve=self.max_cubes * 4 * 3)
+        # Construct the per-instance data for active cubes using a transform.
+        # Every chunk has room for all its cubes
+        self._chunk_bytes = self._chunk_volume * 4 * 3
+        self.instance_data = ctx.buffer(reserve=self.num_chunks * self._chunk_bytes)
 
         self.quad_fs = geometry.quad_fs()
         self.gen_instance_vao = None
 
-        self._num_instances = 0
-        self._query = self.ctx.query(primitives=True)
+        # One query per chunk so the counts are read after all transforms are issued
+        self._queries = [self.ctx.query(primitives=True) for _ in range(self.num_chunks)]
+        self._splat_buffer = None
+        self._splat_vao = None
 
         self.cube = geometry.cube()
         self.cube.buffer(self.instance_data, "3f/i", ["in_offset"])
@@ -122,11 +176,25 @@ class Voxel:
         self.gen_instance_prog = None
         self.voxel_light_prog = None
         self.voxel_wireframe_prog = None
+        self.splat_prog = None
+
+    @property
+    def size(self) -> Tuple[int, int, int]:
+        return self._size
 
     @property
     def max_cubes(self) -> int:
         return self._size[0] * self._size[1] * self._size[2]
 
+    @property
+    def num_chunks(self) -> int:
+        return self._chunks[0] * self._chunks[1] * self._chunks[2]
+
+    @property
+    def num_instances(self) -> int:
+        """Number of cubes rendered"""
+        return int(self._chunk_counts.sum())
+
     def render_wireframe(self, *, projection_matrix, camera_matrix, model_matrix=None):
         self.ctx.wireframe = True
         translate = Matrix44.from_translation((
@@ -138,7 +206,7 @@ class Voxel:
         mat = camera_matrix * translate
         self.voxel_wireframe_prog["m_proj"].write(projection_matrix)
         self.voxel_wireframe_prog["m_modelview"].write(mat)
-        self.cube.render(self.voxel_wireframe_prog, instances=self._num_instances)
+        self._render_chunks(self.voxel_wireframe_prog)
         self.ctx.wireframe = False
 
     def render(self, *, projection_matrix, camera_matrix, model_matrix=None):
@@ -155,37 +223,106 @@ class Voxel:
         self.voxel_light_prog["m_proj"].write(projection_matrix)
         self.voxel_light_prog["m_modelview"].write(mat)
         self.voxel_light_prog["m_normal"].write(normal)
-        self.cube.render(self.voxel_light_prog, instances=self._num_instances)
+        self._render_chunks(self.voxel_light_prog)
+
+    def _render_chunks(self, program):
+        """One instanced draw per chunk with the instance data pointing to the region of the chunk"""
+        vao = self.cube.instance(program)
+        location = program["in_offset"].location
+        for chunk in np.flatnonzero(self._chunk_counts):
+            vao.bind(location, "f", self.instance_data, "3f", offset=int(chunk) * self._chunk_bytes, divisor=1)
+            vao.render(self.cube.mode, instances=int(self._chunk_counts[chunk]))
 
     def render_lookup_texture(self):
         """Display the lookup texture as a fullscreen quad"""
         self.voxel_lookup.use()
         self.quad_fs.render(self.texture_prog)
 
-    def rebuild(self):
-        """Rebuild the voxel. This is necessary when the lookup texture has been altered"""
+    def rebuild(self, full=False):
+        """Rebuild the chunks changed since the last rebuild.
+        This is necessary when the lookup texture has been altered.
+
+        Args:
+            full: Rebuild all chunks
+        """
+        if full:
+            self._dirty[:] = True
+        if not self._dirty.any():
+            return
         if not self.gen_instance_vao:
             self.gen_instance_vao = self.ctx.vertex_array(self.gen_instance_prog, [])
 
         self.gen_instance_prog["voxel_size"] = self._size
+        self.gen_instance_prog["chunk_size"] = self._chunk_size
         self.voxel_lookup.use(location=0)
-        with self._query:
-            self.gen_instance_vao.transform(self.instance_data, mode=moderngl.POINTS, vertices=self.max_cubes)
-        self._num_instances = self._query.primitives
+        cx, cy, _ = self._chunks
+        chunks = [int(chunk) for chunk in np.flatnonzero(self._dirty)]
+        for chunk in chunks:
+            origin = (chunk % cx, chunk // cx % cy, chunk // (cx * cy))
+            self.gen_instance_prog["chunk_origin"] = tuple(o * c for o, c in zip(origin, self._chunk_size))
+            with self._queries[chunk]:
+                self.gen_instance_vao.transform(
+                    self.instance_data, mode=moderngl.POINTS,
+                    vertices=self._chunk_volume, buffer_offset=chunk * self._chunk_bytes,
+                )
+        for chunk in chunks:
+            self._chunk_counts[chunk] = self._queries[chunk].primitives
+        self.chunks_rebuilt += len(chunks)
+        self._dirty[:] = False
 
     def fill_layer(self, layer: int, value: int):
         x = (layer % 10) * self._size[0]
         y = (layer // 10) * self._size[1]
         self.voxel_lookup.write(array('B', [value] * 100 * 100), viewport=(x, y, 100, 100))
+        # The layer and the layers next to it
+        first = max(layer - 1, 0) // self._chunk_size[2]
+        last = min(layer + 1, self._size[2] - 1) // self._chunk_size[2]
+        self._dirty.reshape(self._chunks[::-1])[first:last + 1] = True
 
-    # NOTE: These functions can make adding and removing cubes extremely fast
     def add_cubes(self, positions):
-        """Render to the lookup texture"""
-        pass
+        """Render to the lookup texture.
+
+        Args:
+            positions: (x, y, z) of the cubes. Positions outside the voxel are ignored
+        """
+        self._splat(positions, 1.0)
 
     def remove_cubes(self, positions):
-        """Render to the lookup texture"""
-        pass
+        """Render to the lookup texture.
+
+        Args:
+            positions: (x, y, z) of the cubes. Positions outside the voxel are ignored
+        """
+        self._splat(positions, 0.0)
+
+    def _splat(self, positions, value):
+        """Draw one point per position into the lookup texture and mark the touched chunks"""
+        positions = np.asarray(positions, dtype='i4').reshape(-1, 3)
+        positions = positions[np.all((positions >= 0) & (positions < self._size), axis=1)]
+        if not len(positions):
+            return
+
+        if self._splat_buffer is None or self._splat_buffer.size < positions.nbytes:
+            if self._splat_buffer is not None:
+                self._splat_vao.release()
+                self._splat_buffer.release()
+            self._splat_buffer = self.ctx.buffer(reserve=max(positions.nbytes, 1024 * 4 * 3))
+            self._splat_vao = self.ctx.vertex_array(self.splat_prog, [(self._splat_buffer, "3i", "in_voxel")])
+        self._splat_buffer.write(positions)
+
+        self.splat_prog["voxel_size"] = self._size
+        self.splat_prog["lookup_size"] = self.voxel_lookup.size
+        self.splat_prog["value"] = value
+        previous = self.ctx.fbo
+        self.lookup_fbo.use()
+        self._splat_vao.render(moderngl.POINTS, vertices=len(positions))
+        previous.use()
+
+        # Neighbors decide if a cube is visible, so their chunks change as well
+        cells = (positions[:, None, :] + NEIGHBORS).reshape(-1, 3)
+        cells = cells[np.all((cells >= 0) & (cells < self._size), axis=1)] // self._chunk_size
+        cx, cy, _ = self._chunks
+        self._dirty[cells[:, 0] + cx * (cells[:, 1] + cy * cells[:, 2])] = True
 
 
 if __name__ == "__main__":
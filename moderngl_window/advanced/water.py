@@ -2,6 +2,11 @@
 GPU Version of https://github.com/salt-die/ripple
 
 Hold left mouse button to place drop in the surface
+
+All drops of a frame are drawn with one instanced draw (see splat_batch.py).
+--rain N sets the number of random drops per frame:
+
+    python water.py --rain 5000
 """
 import random
 from pathlib import Path
@@ -12,6 +17,8 @@ import moderngl_window
 from moderngl_window import geometry
 from moderngl_window import screenshot
 
+from splat_batch import SplatBatch
+
 
 class Water(moderngl_window.WindowConfig):
     title = "Water"
@@ -26,7 +33,7 @@ class Water(moderngl_window.WindowConfig):
         self.viewport = (0, 0, self.size[0], self.size[1])
 
         self.quad_fs = geometry.quad_fs()
-        self.sprite = geometry.quad_2d(size=(9 / self.wnd.size[0], 9 / self.wnd.size[1]))
+        self.drops = SplatBatch(self.ctx, (9 / self.wnd.size[0], 9 / self.wnd.size[1]), capacity=self.argv.rain + 1)
 
         self.texture_1 = self.ctx.texture(self.size, components=3)
         self.texture_2 = self.ctx.texture(self.size, components=3)
@@ -58,29 +65,27 @@ class Water(moderngl_window.WindowConfig):
         self.mouse_pos = 0, 0
         self.wnd.fbo.viewport = self.viewport
 
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument('--rain', type=int, default=10, help="Random drops per frame")
+
     def render(self, time, frame_time):
         # randomize color
         self.drop_program['color'].value = random.random(), random.random(), random.random()
 
         self.fbo_2.use()
 
-        # Render drop (with additive blending) when mouse is pressed
+        # Drop when mouse is pressed and random drops (rain)
         if self.wnd.mouse_states.any:
-            self.ctx.enable(moderngl.BLEND)
-            self.ctx.blend_func = moderngl.ONE, moderngl.ONE
-            self.drops_texture.use()
-            self.drop_program['pos'].value = self.mouse_pos
-            self.sprite.render(self.drop_program)
-            self.ctx.disable(moderngl.BLEND)
-
-        # HACK: Just draw 100 new drops per frame (copy paste from above)
-        # This is pretty terrible and slow!
+            self.drops.add(self.mouse_pos)
+        self.drops.extend(np.random.random((self.argv.rain, 2)) * 2 - 1.0)
+
+        # Render all drops with additive blending in one draw call
         self.ctx.enable(moderngl.BLEND)
         self.ctx.blend_func = moderngl.ONE, moderngl.ONE
         self.drops_texture.use()
-        for i in range(10):
-            self.drop_program['pos'].value = random.random() * 2 - 1.0, random.random() * 2 - 1
-            self.sprite.render(self.drop_program)
+        self.drops.render(self.drop_program)
+        self.drops.clear()
         self.ctx.disable(moderngl.BLEND)
 
         self.fbo_1.use()
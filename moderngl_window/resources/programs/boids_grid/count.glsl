@@ -0,0 +1,27 @@
+#version 430
+
+// Counting sort, pass 1: count the boids in every cell
+// and remember the slot of each boid inside its cell
+
+#define GROUP_SIZE 256
+
+layout (local_size_x = GROUP_SIZE) in;
+
+layout (std430, binding = 0) readonly buffer Boids { vec4 boids[]; };
+layout (std430, binding = 1) buffer Counts { uint counts[]; };
+layout (std430, binding = 2) writeonly buffer Keys { uvec2 keys[]; };
+
+uniform uint num_boids;
+uniform ivec2 grid_size;
+uniform vec2 world_min;
+uniform vec2 cell_size;
+
+void main() {
+    uint i = gl_GlobalInvocationID.x;
+    if (i >= num_boids) {
+        return;
+    }
+    ivec2 cell = clamp(ivec2((boids[i].xy - world_min) / cell_size), ivec2(0), grid_size - 1);
+    uint index = uint(cell.y * grid_size.x + cell.x);
+    keys[i] = uvec2(index, atomicAdd(counts[index], 1u));
+}
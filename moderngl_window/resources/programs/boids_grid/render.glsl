@@ -0,0 +1,28 @@
+#version 330
+
+#if defined VERTEX_SHADER
+
+in vec2 in_position;
+in vec2 in_velocity;
+
+uniform mat4 m_proj;
+
+out vec3 color;
+
+void main() {
+    gl_Position = m_proj * vec4(in_position, 0.0, 1.0);
+    // Color by heading
+    float angle = atan(in_velocity.y, in_velocity.x);
+    color = 0.6 + 0.4 * cos(angle + vec3(0.0, 2.094, 4.189));
+}
+
+#elif defined FRAGMENT_SHADER
+
+in vec3 color;
+out vec4 outColor;
+
+void main() {
+    outColor = vec4(color, 1.0);
+}
+
+#endif
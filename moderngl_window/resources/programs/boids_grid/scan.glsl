@@ -0,0 +1,40 @@
+#version 430
+
+// Exclusive prefix sum of GROUP_SIZE values per work group.
+// The total of every group is written to sums so a second
+// dispatch over sums followed by scan_add.glsl scans larger arrays.
+
+#define GROUP_SIZE 1024
+
+layout (local_size_x = GROUP_SIZE) in;
+
+layout (std430, binding = 0) readonly buffer Values { uint values[]; };
+layout (std430, binding = 1) writeonly buffer Result { uint result[]; };
+layout (std430, binding = 2) writeonly buffer Sums { uint sums[]; };
+
+uniform uint count;
+
+shared uint temp[GROUP_SIZE];
+
+void main() {
+    uint i = gl_GlobalInvocationID.x;
+    uint local = gl_LocalInvocationID.x;
+    uint value = i < count ? values[i] : 0u;
+    temp[local] = value;
+    barrier();
+
+    // Hillis-Steele inclusive scan
+    for (uint offset = 1u; offset < GROUP_SIZE; offset *= 2u) {
+        uint add = local >= offset ? temp[local - offset] : 0u;
+        barrier();
+        temp[local] += add;
+        barrier();
+    }
+
+    if (i < count) {
+        result[i] = temp[local] - value;
+    }
+    if (local == GROUP_SIZE - 1u) {
+        sums[gl_WorkGroupID.x] = temp[local];
+    }
+}
@@ -0,0 +1,19 @@
+#version 430
+
+// Adds the scanned work group totals of scan.glsl to every value
+
+#define GROUP_SIZE 1024
+
+layout (local_size_x = GROUP_SIZE) in;
+
+layout (std430, binding = 0) buffer Result { uint result[]; };
+layout (std430, binding = 1) readonly buffer Offsets { uint offsets[]; };
+
+uniform uint count;
+
+void main() {
+    uint i = gl_GlobalInvocationID.x;
+    if (i < count) {
+        result[i] += offsets[gl_WorkGroupID.x];
+    }
+}
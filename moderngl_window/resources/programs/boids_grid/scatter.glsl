@@ -0,0 +1,24 @@
+#version 430
+
+// Counting sort, pass 2: move every boid to its slot so the
+// boids of a cell are next to each other in memory
+
+#define GROUP_SIZE 256
+
+layout (local_size_x = GROUP_SIZE) in;
+
+layout (std430, binding = 0) readonly buffer Boids { vec4 boids[]; };
+layout (std430, binding = 1) readonly buffer Keys { uvec2 keys[]; };
+layout (std430, binding = 2) readonly buffer Starts { uint starts[]; };
+layout (std430, binding = 3) writeonly buffer Sorted { vec4 sorted[]; };
+
+uniform uint num_boids;
+
+void main() {
+    uint i = gl_GlobalInvocationID.x;
+    if (i >= num_boids) {
+        return;
+    }
+    uvec2 key = keys[i];
+    sorted[starts[key.x] + key.y] = boids[i];
+}
@@ -0,0 +1,83 @@
+#version 430
+
+// Flocking using only the boids in the 3 x 3 cells around each boid.
+// The world wraps around at the edges.
+
+#define GROUP_SIZE 256
+
+layout (local_size_x = GROUP_SIZE) in;
+
+layout (std430, binding = 0) readonly buffer Sorted { vec4 sorted[]; };
+layout (std430, binding = 1) readonly buffer Starts { uint starts[]; };
+layout (std430, binding = 2) readonly buffer Counts { uint counts[]; };
+layout (std430, binding = 3) writeonly buffer Boids { vec4 boids[]; };
+
+uniform uint num_boids;
+uniform ivec2 grid_size;
+uniform vec2 world_min;
+uniform vec2 world_size;
+uniform vec2 cell_size;
+uniform float radius;
+uniform float separation_radius;
+uniform float timedelta;
+
+uniform float cohesion = 1.0;
+uniform float alignment = 2.0;
+uniform float separation = 0.002;
+uniform float min_speed = 0.05;
+uniform float max_speed = 0.2;
+
+void main() {
+    uint i = gl_GlobalInvocationID.x;
+    if (i >= num_boids) {
+        return;
+    }
+    vec2 pos = sorted[i].xy;
+    vec2 vel = sorted[i].zw;
+    ivec2 cell = clamp(ivec2((pos - world_min) / cell_size), ivec2(0), grid_size - 1);
+
+    vec2 center = vec2(0.0);
+    vec2 heading = vec2(0.0);
+    vec2 push = vec2(0.0);
+    int neighbours = 0;
+
+    for (int y = -1; y <= 1; y++) {
+        for (int x = -1; x <= 1; x++) {
+            ivec2 c = (cell + ivec2(x, y) + grid_size) % grid_size;
+            uint index = uint(c.y * grid_size.x + c.x);
+            uint start = starts[index];
+            uint end = start + counts[index];
+            for (uint j = start; j < end; j++) {
+                if (j == i) {
+                    continue;
+                }
+                vec4 other = sorted[j];
+                // Shortest offset on the torus
+                vec2 d = other.xy - pos;
+                d -= world_size * round(d / world_size);
+                float dist2 = dot(d, d);
+                if (dist2 < radius * radius) {
+                    center += d;
+                    heading += other.zw;
+                    neighbours++;
+                    if (dist2 < separation_radius * separation_radius) {
+                        push -= d / max(dist2, 1e-8);
+                    }
+                }
+            }
+        }
+    }
+
+    if (neighbours > 0) {
+        center /= float(neighbours);
+        heading /= float(neighbours);
+        vel += (center * cohesion + (heading - vel) * alignment + push * separation) * timedelta;
+    }
+
+    float speed = length(vel);
+    if (speed > 0.0) {
+        vel *= clamp(speed, min_speed, max_speed) / speed;
+    }
+    pos = world_min + mod(pos + vel * timedelta - world_min, world_size);
+    boids[i] = vec4(pos, vel);
+}
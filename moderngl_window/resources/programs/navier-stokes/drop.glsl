@@ -5,24 +5,29 @@
 in vec3 in_position;
 in vec2 in_texcoord_0;
 
+// Per instance
+in vec2 in_pos;
+in float in_force;
+
 uniform mat4 m_proj;
-uniform vec2 pos;
 
 out vec2 uv0;
+flat out float force;
 
 void main() {
-    gl_Position = m_proj * vec4(vec3(in_position.xy + pos.xy, 0.0), 1.0);
+    gl_Position = m_proj * vec4(vec3(in_position.xy + in_pos.xy, 0.0), 1.0);
     uv0 = in_texcoord_0;
+    force = in_force;
 }
 
 #elif defined FRAGMENT_SHADER
 
 // uniform sampler2D texture0;
 uniform float write_value;
-uniform float force;
 
 out float fragColor;
 in vec2 uv0;
+flat in float force;
 
 
 void main() {
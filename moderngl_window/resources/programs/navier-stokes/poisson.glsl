@@ -15,6 +15,9 @@ void main() {
 out float fragColor;
 
 uniform sampler2D texture;
+uniform sampler2D pressure_texture;
+uniform float rho;  // Density
+uniform float pressure_step;
 
 const ivec2 kpos[9] = ivec2[9](
     ivec2(-1,  1),  ivec2(0,  1),  ivec2(1,  1),
@@ -38,6 +41,10 @@ float poisson(ivec2 uv, sampler2D source) {
 
 void main() {
     ivec2 uv = ivec2(gl_FragCoord.xy);
-    fragColor = poisson(uv, texture) * 0.5;
+    float diff = poisson(uv, texture) * 0.5;
+    // Source term of the pressure equation, solved by pressure.glsl.
+    // The last pressure enters through the implicit time step
+    float pressure = texelFetch(pressure_texture, uv, 0).r;
+    fragColor = rho / 2.0 * (diff - pow(diff, 2.0)) + pressure / pressure_step;
 }
 #endif
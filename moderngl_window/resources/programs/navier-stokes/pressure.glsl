@@ -13,14 +13,17 @@ void main() {
 
 #elif defined FRAGMENT_SHADER
 
+// One (weighted) jacobi iteration of  pressure * (1 + screening) - poisson(pressure) = source
+// The same pass smooths every level of the multigrid pyramid
+
 out float fragColor;
 in vec2 uv0;
 
 uniform sampler2D pressure_texture;
-uniform sampler2D difference_texture;
+uniform sampler2D source_texture;
 uniform sampler2D walls_texture;
-uniform float rho;  // Density
-uniform float damping;
+uniform float omega;  // 1.0 is plain jacobi
+uniform float screening;  // Damping and time step of the pressure, see PressureLevel.set_step
 
 const ivec2 kpos[9] = ivec2[9](
     ivec2(-1,  1),  ivec2(0,  1),  ivec2(1,  1),
@@ -34,20 +37,32 @@ const float poi_kernel[9] = float[9](
       0.0, .25,  0.0
 );
 
-float poisson(ivec2 uv, sampler2D source) {
-    float value = 0;
-    for (int i = 0; i < 9; i++) {
-        value += texelFetch(source, uv + kpos[i], 0).r * poi_kernel[i];
-    }
-    return value;
-}
+// Outside of the grid the pressure is extrapolated from the edge, so that it is zero
+// half a cell of the simulation grid beyond the edge on every level.
+// The extrapolated neighbours depend on the cell itself, so they belong to the diagonal.
+// Leaving them in the neighbour sum over-relaxes the edges of the coarse levels until they diverge
+uniform float boundary;
 
 void main() {
     ivec2 uv = ivec2(gl_FragCoord.xy);
-    float poi = poisson(uv, pressure_texture);
-    float diff = texelFetch(difference_texture, uv, 0).r;
+    ivec2 size = textureSize(pressure_texture, 0);
+    float poi = 0.0;
+    float diagonal = 1.0 + screening;
+    for (int i = 0; i < 9; i++) {
+        if (poi_kernel[i] == 0.0) {
+            continue;
+        }
+        ivec2 pos = uv + kpos[i];
+        if (any(lessThan(pos, ivec2(0))) || any(greaterThanEqual(pos, size))) {
+            diagonal -= poi_kernel[i] * boundary;
+        } else {
+            poi += texelFetch(pressure_texture, pos, 0).r * poi_kernel[i];
+        }
+    }
+    float pressure = texelFetch(pressure_texture, uv, 0).r;
+    float source = texelFetch(source_texture, uv, 0).r;
     float wall = texelFetch(walls_texture, uv, 0).r;
 
-    fragColor = (poi + rho / 2.0 * (diff - pow(diff, 2.0))) * (1.0 - wall) * damping;
+    fragColor = mix(pressure, (poi + source) / diagonal, omega) * (1.0 - wall);
 }
 #endif
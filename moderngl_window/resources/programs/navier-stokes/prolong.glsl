@@ -0,0 +1,46 @@
+#version 330
+
+#if defined VERTEX_SHADER
+
+in vec3 in_position;
+
+void main() {
+    gl_Position = vec4(in_position, 1);
+}
+
+#elif defined FRAGMENT_SHADER
+
+// Adds the bilinear interpolated correction of the next coarser level
+
+out float fragColor;
+
+uniform sampler2D pressure_texture;
+uniform sampler2D coarse_texture;
+uniform sampler2D walls_texture;
+// Extrapolation factor of the coarse level at the edges, see pressure.glsl
+uniform float boundary;
+
+// Extrapolated along each axis, so the corners outside get the factor twice
+float fetch(sampler2D source, ivec2 uv) {
+    ivec2 inside = clamp(uv, ivec2(0), textureSize(source, 0) - 1);
+    float value = texelFetch(source, inside, 0).r;
+    return value * (inside.x == uv.x ? 1.0 : boundary) * (inside.y == uv.y ? 1.0 : boundary);
+}
+
+void main() {
+    ivec2 uv = ivec2(gl_FragCoord.xy);
+    // Fine cell centers are at half their coordinate on the coarse level
+    vec2 coord = gl_FragCoord.xy * 0.5 - 0.5;
+    ivec2 base = ivec2(floor(coord));
+    vec2 f = coord - vec2(base);
+    float correction = mix(
+        mix(fetch(coarse_texture, base), fetch(coarse_texture, base + ivec2(1, 0)), f.x),
+        mix(fetch(coarse_texture, base + ivec2(0, 1)), fetch(coarse_texture, base + ivec2(1, 1)), f.x),
+        f.y
+    );
+    float pressure = texelFetch(pressure_texture, uv, 0).r;
+    float wall = texelFetch(walls_texture, uv, 0).r;
+
+    fragColor = (pressure + correction) * (1.0 - wall);
+}
+#endif
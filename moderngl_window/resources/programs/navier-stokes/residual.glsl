@@ -0,0 +1,48 @@
+#version 330
+
+#if defined VERTEX_SHADER
+
+in vec3 in_position;
+
+void main() {
+    gl_Position = vec4(in_position, 1);
+}
+
+#elif defined FRAGMENT_SHADER
+
+// Squared residual and squared source term of the pressure equation.
+// Averaged by building mipmaps for the solver statistics
+
+out vec2 fragColor;
+
+uniform sampler2D pressure_texture;
+uniform sampler2D source_texture;
+uniform sampler2D walls_texture;
+
+const ivec2 kpos[4] = ivec2[4](ivec2(0, 1), ivec2(-1, 0), ivec2(1, 0), ivec2(0, -1));
+
+// Outside of the grid the pressure is extrapolated from the edge, so that it is zero
+// half a cell of the simulation grid beyond the edge on every level
+uniform float boundary;
+uniform float screening;
+
+float fetch(sampler2D source, ivec2 uv) {
+    ivec2 inside = clamp(uv, ivec2(0), textureSize(source, 0) - 1);
+    float value = texelFetch(source, inside, 0).r;
+    return inside == uv ? value : value * boundary;
+}
+
+void main() {
+    ivec2 uv = ivec2(gl_FragCoord.xy);
+    float poi = 0.0;
+    for (int i = 0; i < 4; i++) {
+        poi += fetch(pressure_texture, uv + kpos[i]) * 0.25;
+    }
+    float pressure = texelFetch(pressure_texture, uv, 0).r;
+    float source = texelFetch(source_texture, uv, 0).r;
+    float wall = texelFetch(walls_texture, uv, 0).r;
+    float residual = (source - pressure * (1.0 + screening) + poi) * (1.0 - wall);
+
+    fragColor = vec2(residual * residual, source * source * (1.0 - wall));
+}
+#endif
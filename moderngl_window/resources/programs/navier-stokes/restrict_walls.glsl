@@ -0,0 +1,31 @@
+#version 330
+
+#if defined VERTEX_SHADER
+
+in vec3 in_position;
+
+void main() {
+    gl_Position = vec4(in_position, 1);
+}
+
+#elif defined FRAGMENT_SHADER
+
+// A coarse cell is a wall if any of its 2 x 2 fine cells is.
+// Fine cells beyond an odd sized grid are walls, they have zero pressure like the boundary
+
+out float fragColor;
+
+uniform sampler2D walls_texture;
+
+float fetch(ivec2 uv) {
+    if (any(greaterThanEqual(uv, textureSize(walls_texture, 0)))) {
+        return 1.0;
+    }
+    return texelFetch(walls_texture, uv, 0).r;
+}
+
+void main() {
+    ivec2 uv = ivec2(gl_FragCoord.xy) * 2;
+    fragColor = max(max(fetch(uv), fetch(uv + ivec2(1, 0))), max(fetch(uv + ivec2(0, 1)), fetch(uv + ivec2(1, 1))));
+}
+#endif
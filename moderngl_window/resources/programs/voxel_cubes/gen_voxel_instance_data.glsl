@@ -2,14 +2,16 @@
 
 #if defined VERTEX_SHADER
 
-uniform ivec3 voxel_size;
+// One vertex per cell of the chunk
+uniform ivec3 chunk_origin;
+uniform ivec3 chunk_size;
 
 void main() {
-    int x = gl_VertexID % voxel_size.x;
-    int y = (gl_VertexID / voxel_size.y) % voxel_size.y;
-    int z = gl_VertexID / (voxel_size.x * voxel_size.y);
+    int x = gl_VertexID % chunk_size.x;
+    int y = (gl_VertexID / chunk_size.x) % chunk_size.y;
+    int z = gl_VertexID / (chunk_size.x * chunk_size.y);
 
-    gl_Position = vec4(float(x), float(y), float(z), 0.0);
+    gl_Position = vec4(vec3(chunk_origin + ivec3(x, y, z)), 0.0);
 }
 
 #elif defined GEOMETRY_SHADER
@@ -30,6 +32,8 @@ float lookup_3d(ivec3 p) {
 
 void main() {
     ivec3 p = ivec3(gl_in[0].gl_Position.xyz);
+    // Chunks at the far edges can stick out of the voxel
+    if (any(greaterThanEqual(p, voxel_size))) return;
     float alive = lookup_3d(p);
 
     // Read all the neighbor cubes
@@ -43,9 +47,9 @@ void main() {
 
     if (alive > 0) {
         // If we're at the voxel edge we should always render the cube
-        if (p.x == 0 || p.x == 99) neighbours = 0;
-        if (p.y == 0 || p.y == 99) neighbours = 0;
-        if (p.z == 0 || p.z == 99) neighbours = 0;
+        if (p.x == 0 || p.x == voxel_size.x - 1) neighbours = 0;
+        if (p.y == 0 || p.y == voxel_size.y - 1) neighbours = 0;
+        if (p.z == 0 || p.z == voxel_size.z - 1) neighbours = 0;
 
         if (neighbours < 6) {
             pos = gl_in[0].gl_Position.xyz;
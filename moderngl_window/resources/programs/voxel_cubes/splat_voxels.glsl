@@ -0,0 +1,27 @@
+#version 330
+
+#if defined VERTEX_SHADER
+
+// Draws one point per voxel into its texel of the lookup texture
+in ivec3 in_voxel;
+
+uniform ivec3 voxel_size;
+uniform ivec2 lookup_size;
+
+void main() {
+    // Same layout as lookup_3d() in gen_voxel_instance_data.glsl
+    int x = (in_voxel.z * voxel_size.x) % lookup_size.x + in_voxel.x;
+    int y = (in_voxel.z / 10) * voxel_size.x + in_voxel.y;
+    gl_Position = vec4((vec2(x, y) + 0.5) / vec2(lookup_size) * 2.0 - 1.0, 0.0, 1.0);
+}
+
+#elif defined FRAGMENT_SHADER
+
+uniform float value;
+
+out float fragColor;
+
+void main() {
+    fragColor = value;
+}
+#endif
@@ -4,13 +4,13 @@
 
 in vec3 in_position;
 in vec2 in_texcoord_0;
-
-uniform vec2 pos;
+// Per instance
+in vec2 in_pos;
 
 out vec2 uv0;
 
 void main() {
-    gl_Position = vec4(vec3(in_position.xy + pos.xy, 0.0), 1.0);
+    gl_Position = vec4(vec3(in_position.xy + in_pos.xy, 0.0), 1.0);
     uv0 = in_texcoord_0;
 }
 
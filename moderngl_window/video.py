@@ -1,4 +1,8 @@
 import math
+import threading
+import time as _time
+from collections import deque
+from queue import Queue, Empty, Full
 from typing import Tuple, Union
 from pathlib import Path
 
@@ -6,6 +10,14 @@ import moderngl
 import moderngl_window
 from moderngl_window import geometry
 import av
+import numpy as np
+
+# YUV -> RGB matrices (columns are the Y, U, V coefficients) for video range data
+BT601 = (1.164, 1.164, 1.164, 0.0, -0.392, 2.017, 1.596, -0.813, 0.0)
+BT709 = (1.164, 1.164, 1.164, 0.0, -0.213, 2.112, 1.793, -0.533, 0.0)
+# ffmpeg AVColorSpace and AVColorRange values
+AVCOL_SPC_BT709 = 1
+AVCOL_RANGE_JPEG = 2
 
 
 class Decoder:
@@ -64,6 +76,10 @@ class Decoder:
         """Seek to a position in the stream"""
         self.container.seek(position, stream=self.video)
 
+    def seek_time(self, time: float):
+        """Seek to the keyframe at or before a time in seconds"""
+        self.container.seek(int(time / self.video.time_base), stream=self.video)
+
     def gen_frames(self):
         for packet in self.container.demux(video=0):
             if packet.pts is not None:
@@ -71,19 +87,187 @@ class Decoder:
             for i, frame in enumerate(packet.decode()):
                 yield frame.to_rgb().planes[0]
 
+    def decode_frames(self, yuv: bool = False):
+        """Yields (time in seconds, frame data) for every frame.
+
+        The data is a contiguous RGB numpy array or with ``yuv``
+        a tuple of the Y, U and V planes of yuv420p data without
+        any color conversion on the CPU.
+        """
+        index = 0
+        for packet in self.container.demux(video=0):
+            if packet.pts is not None:
+                self._last_packet = packet
+            for frame in packet.decode():
+                time = frame.time if frame.time is not None else index / self.average_rate
+                index += 1
+                if yuv:
+                    yield time, self.yuv_planes(frame)
+                else:
+                    yield time, frame.to_ndarray(format='rgb24')
+
+    @staticmethod
+    def yuv_planes(frame: av.VideoFrame):
+        """Contiguous copies of the Y, U and V planes of a frame"""
+        if frame.format.name != 'yuv420p':
+            frame = frame.reformat(format='yuv420p')
+        return tuple(
+            np.ascontiguousarray(
+                np.frombuffer(plane, dtype='u1').reshape(plane.height, plane.line_size)[:, :plane.width]
+            )
+            for plane in frame.planes
+        )
+
+    @property
+    def yuv_to_rgb(self):
+        """(matrix, offset) converting yuv of this video to rgb in a shader"""
+        codec = self.video.codec_context
+        # swscale (frame.to_rgb) treats unspecified color spaces as BT.601 as well
+        matrix = BT709 if codec.colorspace == AVCOL_SPC_BT709 else BT601
+        if codec.color_range == AVCOL_RANGE_JPEG:
+            # Full range. Undo the video range scaling of the luma and chroma coefficients
+            matrix = tuple(v / 1.164 if i < 3 else v * 224 / 255 for i, v in enumerate(matrix))
+            return matrix, (0.0, 128 / 255, 128 / 255)
+        return matrix, (16 / 255, 128 / 255, 128 / 255)
+
+
+class DecoderThread:
+    """Runs a Decoder on a background thread.
+
+    Decoded frames are put in a bounded queue as ``(generation, time, data)``.
+    The generation is increased by every seek so frames decoded before
+    the seek can be thrown away by the reader. The thread blocks while
+    the queue is full and decodes ahead otherwise.
+    PyAV releases the GIL while decoding so this does not stall rendering.
+    With ``start=False`` the thread only runs after ``start()``.
+    """
+
+    def __init__(self, decoder: Decoder, queue_size: int = 8, yuv: bool = False, start: bool = True):
+        self._decoder = decoder
+        self._yuv = yuv
+        self.queue = Queue(maxsize=queue_size)
+        self.generation = 0
+        self.finished = False
+        # Seconds spent decoding and converting each of the last frames
+        self.decode_times = deque(maxlen=120)
+        self._seek_time = 0.0
+        self._lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        if start:
+            self.start()
+
+    def start(self):
+        self._thread.start()
+
+    def seek(self, time: float):
+        """Restart decoding at a time in seconds"""
+        with self._lock:
+            self._seek_time = time
+            self.generation += 1
+            self.finished = False
+        self._drain()
+
+    def stop(self):
+        self._running = False
+        self._drain()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _drain(self):
+        # Make room so a blocked put() notices the seek or stop
+        try:
+            while True:
+                self.queue.get_nowait()
+        except Empty:
+            pass
+
+    def _run(self):
+        frames = None
+        skip_until = 0.0
+        generation = -1
+        while self._running:
+            with self._lock:
+                if self._seek_time is not None:
+                    if frames is not None or self._seek_time > 0:
+                        self._decoder.seek_time(self._seek_time)
+                    frames = self._decoder.decode_frames(yuv=self._yuv)
+                    # Seeking lands on a keyframe. Skip the frames before the requested time
+                    skip_until = self._seek_time - 0.5 / self._decoder.average_rate
+                    generation = self.generation
+                    self._seek_time = None
+
+            if self.finished:
+                _time.sleep(0.005)
+                continue
+
+            start = _time.perf_counter()
+            try:
+                time, data = next(frames)
+            except StopIteration:
+                # A seek may have happened meanwhile. Only the current generation can finish
+                with self._lock:
+                    if generation == self.generation:
+                        self.finished = True
+                continue
+            if time < skip_until:
+                continue
+            self.decode_times.append(_time.perf_counter() - start)
+
+            while self._running and generation == self.generation:
+                try:
+                    self.queue.put((generation, time, data), timeout=0.05)
+                    break
+                except Full:
+                    pass
+
 
 class Player:
+    """Plays a video into a texture.
+
+    Frames are decoded ahead on a background thread and presented
+    when their timestamp is reached. Frames that are already late are
+    dropped. Uploads go through a pair of pixel buffer objects so
+    writing the next frame does not wait for the previous transfer.
+
+    With ``yuv`` the Y, U and V planes are uploaded into three single
+    channel textures and converted into the RGB texture by a fragment
+    shader. That skips the conversion on the CPU and uploads half the data.
 
-    def __init__(self, ctx: moderngl.Context, path: Union[str, Path]):
+    With ``decode=False`` the background thread is not started and only
+    ``write_frame`` is useful, for example to time the uploads alone.
+    """
+
+    def __init__(self, ctx: moderngl.Context, path: Union[str, Path], queue_size: int = 8, yuv: bool = False,
+                 decode: bool = True):
         self._ctx = ctx
         self._path = path
+        self._yuv = yuv
         self._decoder = Decoder(self._path)
         self._texture = self._ctx.texture(self._decoder.video_size, 3)
-        self._frames = self._decoder.gen_frames()
-
-        self._last_time = 0
+        width, height = self._decoder.video_size
+        if yuv:
+            plane_sizes = [(width, height), ((width + 1) // 2, (height + 1) // 2), ((width + 1) // 2, (height + 1) // 2)]
+            self._planes = [self._ctx.texture(size, 1) for size in plane_sizes]
+            self._pbos = [[self._ctx.buffer(reserve=w * h) for w, h in plane_sizes] for _ in range(2)]
+            self._init_yuv_conversion()
+        else:
+            self._pbos = [[self._ctx.buffer(reserve=width * height * 3)] for _ in range(2)]
+        self._pbo_index = 0
+        self._thread = DecoderThread(self._decoder, queue_size=queue_size, yuv=yuv, start=decode)
+        self._queue_size = queue_size
+
+        self._next = None
+        self._frame_time = None
+        # Time of the last seek. Decoding starts at the beginning
+        self._seek_target = 0.0
         self._fps = self._decoder.average_rate
 
+        # Statistics
+        self.presented = 0
+        self.dropped = 0
+        self.seeks = 0
+
     @property
     def fps(self) -> float:
         """float: Framerate of the video"""
@@ -108,40 +292,163 @@ class Player:
     def texture(self) -> moderngl.Texture:
         return self._texture
 
-    def update(self, time: float):
-        next_pos = self._decoder.time_to_pos(time)
-        delta = next_pos - self._decoder.current_pos
-
-        print((
-            f"frame_step={self._decoder.frame_step}, "
-            f"delta={delta}, "
-            f"next_pos={next_pos}, "
-            f"current_pos={self._decoder.current_pos}, "
-            f"time={time}"
-        ))
-
-        # Seek we are more than 3 frames off
-        if abs(delta) > self._decoder.frame_step * 3:
-            seek_pos = int(next_pos)
-            print("SEEK", delta, seek_pos)
-            self._decoder.seek(seek_pos)
-        # else:
-        # if delta < self._decoder.frame_step:
-        #     print("SKIP")
-        #     return
+    @property
+    def queue_depth(self) -> int:
+        """int: Number of decoded frames waiting"""
+        return self._thread.queue.qsize() + (self._next is not None)
 
-        try:
-            data = next(self._frames)
-        except StopIteration:
+    @property
+    def decode_latency(self) -> Tuple[float, float]:
+        """Tuple[float, float]: Average and max seconds to decode a frame (recent frames)"""
+        times = list(self._thread.decode_times)
+        if not times:
+            return 0.0, 0.0
+        return sum(times) / len(times), max(times)
+
+    def seek(self, time: float):
+        """Continue playback from a time in seconds"""
+        self._thread.seek(time)
+        self._next = None
+        self._frame_time = None
+        self._seek_target = time
+        self.seeks += 1
+
+    def update(self, time: float):
+        """Present the newest frame with a timestamp at or before ``time``"""
+        frame_step = 1 / self._fps
+        # Seek if we went backwards or are too far ahead to catch up by dropping frames
+        if self._frame_time is not None:
+            if (time < self._frame_time - frame_step * 3
+                    or time > self._frame_time + frame_step * (self._queue_size + 3)):
+                self.seek(time)
+        elif time < self._seek_target:
+            # Nothing presented since the last seek (for example past the end). Went backwards
+            self.seek(time)
+
+        frame = None
+        while True:
+            if self._next is None:
+                try:
+                    self._next = self._thread.queue.get_nowait()
+                except Empty:
+                    break
+            generation, frame_time, data = self._next
+            if generation != self._thread.generation:
+                # Decoded before the last seek
+                self._next = None
+                continue
+            if frame_time > time:
+                break
+            if frame is not None:
+                self.dropped += 1
+            frame = self._next
+            self._next = None
+
+        if frame is not None:
+            self.write_frame(frame[2])
+            self._frame_time = frame[1]
+            self.presented += 1
+
+    def _init_yuv_conversion(self):
+        self._yuv_program = self._ctx.program(
+            vertex_shader="""
+            #version 330
+            in vec2 in_position;
+            void main() {
+                gl_Position = vec4(in_position, 0.0, 1.0);
+            }
+            """,
+            fragment_shader="""
+            #version 330
+            uniform sampler2D y_plane;
+            uniform sampler2D u_plane;
+            uniform sampler2D v_plane;
+            uniform mat3 yuv_to_rgb;
+            uniform vec3 offset;
+            out vec4 fragColor;
+            void main() {
+                // Row 0 of the planes ends up in row 0 of the rgb texture
+                vec2 uv = gl_FragCoord.xy / vec2(textureSize(y_plane, 0));
+                vec3 yuv = vec3(texture(y_plane, uv).r, texture(u_plane, uv).r, texture(v_plane, uv).r);
+                fragColor = vec4(clamp(yuv_to_rgb * (yuv - offset), 0.0, 1.0), 1.0);
+            }
+            """,
+        )
+        matrix, offset = self._decoder.yuv_to_rgb
+        self._yuv_program['yuv_to_rgb'].value = matrix
+        self._yuv_program['offset'].value = offset
+        for i, name in enumerate(['y_plane', 'u_plane', 'v_plane']):
+            self._yuv_program[name].value = i
+        for plane in self._planes:
+            plane.filter = moderngl.LINEAR, moderngl.LINEAR
+            plane.repeat_x = plane.repeat_y = False
+        self._yuv_fbo = self._ctx.framebuffer(color_attachments=[self._texture])
+        self._yuv_vbo = self._ctx.buffer(np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype='f4'))
+        self._yuv_vao = self._ctx.simple_vertex_array(self._yuv_program, self._yuv_vbo, 'in_position')
+
+    def write_frame(self, data):
+        """Upload decoded frame data (see ``next_frame``) into the texture"""
+        pbos = self._pbos[self._pbo_index]
+        self._pbo_index = (self._pbo_index + 1) % len(self._pbos)
+        if not self._yuv:
+            pbos[0].write(data)
+            self._texture.write(pbos[0])
             return
-        self._texture.write(data)
 
-    def next_frame(self) -> av.plane.Plane:
-        """Get RGB data for the next frame.
-        A VideoPlane is returned containing the RGB data.
-        This objects supports the buffer protocol and can be written to a texture directly.
+        for i, (pbo, plane, texture) in enumerate(zip(pbos, data, self._planes)):
+            pbo.write(plane)
+            texture.write(pbo)
+            texture.use(i)
+
+        # Convert into the rgb texture and give the caller back its framebuffer
+        fbo, viewport = self._ctx.fbo, self._ctx.viewport
+        self._yuv_fbo.use()
+        self._yuv_vao.render(moderngl.TRIANGLE_STRIP)
+        if fbo is not None:
+            fbo.use()
+            self._ctx.viewport = viewport
+
+    def next_frame(self):
+        """Get RGB data for the next decoded frame, or None at the end of the video.
+        Blocks until the background thread has decoded it.
+        The numpy array supports the buffer protocol and can be written to a texture directly.
+        With ``yuv`` this is a tuple of the Y, U and V planes instead.
         """
-        return next(self._frames)
+        while True:
+            if self._next is not None:
+                entry, self._next = self._next, None
+            else:
+                try:
+                    entry = self._thread.queue.get(timeout=0.05)
+                except Empty:
+                    if self._thread.finished and self._thread.queue.empty():
+                        return None
+                    continue
+            generation, _, data = entry
+            if generation == self._thread.generation:
+                return data
+
+    def report(self) -> str:
+        average, worst = self.decode_latency
+        return (
+            f"presented={self.presented} dropped={self.dropped} seeks={self.seeks} "
+            f"queue={self.queue_depth} "
+            f"decode={average * 1000:.2f}ms (max {worst * 1000:.2f}ms)"
+        )
+
+    def release(self):
+        self._thread.stop()
+        for pbos in self._pbos:
+            for pbo in pbos:
+                pbo.release()
+        if self._yuv:
+            for plane in self._planes:
+                plane.release()
+            self._yuv_vao.release()
+            self._yuv_vbo.release()
+            self._yuv_fbo.release()
+            self._yuv_program.release()
+        self._texture.release()
 
 
 class VideoTest(moderngl_window.WindowConfig):
@@ -152,7 +459,7 @@ class VideoTest(moderngl_window.WindowConfig):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        self.player = Player(self.ctx, self.resource_dir / 'videos/Lightning - 33049.mp4')
+        self.player = Player(self.ctx, self.resource_dir / 'videos/Lightning - 33049.mp4', yuv=self.argv.yuv)
         print("duration   :", self.player.duration)
         print("fps        :", self.player.fps)
         print("video_size :", self.player.video_size)
@@ -161,12 +468,24 @@ class VideoTest(moderngl_window.WindowConfig):
 
         self.quad = geometry.quad_fs()
         self.program = self.load_program('programs/texture_flipped.glsl')
+        self.last_report = 0
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument('--yuv', action='store_true', default=False, help="Convert yuv to rgb on the gpu")
 
     def render(self, time, frametime):
         self.player.update(math.fmod(time, 5))
         self.player.texture.use(0)
         self.quad.render(self.program)
 
+        if time - self.last_report > 1.0:
+            print(self.player.report())
+            self.last_report = time
+
+    def close(self):
+        self.player.release()
+
     def key_event(self, key, action, modifiers):
         keys = self.wnd.keys
 
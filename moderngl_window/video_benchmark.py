@@ -0,0 +1,140 @@
+"""
+Compare the RGB and YUV decoding paths of video.Player.
+
+A synthetic test video is generated with PyAV the first time
+(moving gradients and noise so the encoder has some work to do)
+and then decoded twice:
+
+* rgb: ``frame.to_ndarray('rgb24')`` converts on the CPU and
+  3 bytes per pixel are uploaded.
+* yuv: the Y, U and V planes are copied as they are, 1.5 bytes per
+  pixel are uploaded and a fragment shader converts to RGB.
+
+We report the CPU time per frame for decoding and converting/copying
+and the time for the upload + GPU conversion (including ctx.finish()).
+
+    python video_benchmark.py --window headless
+    python video_benchmark.py --window headless --video-size 1920 1080 --frames 120
+
+--check plays the video past its end, rewinds and reports if playback continues.
+"""
+import tempfile
+import time
+from pathlib import Path
+
+import av
+import numpy as np
+import moderngl_window
+
+from video import Decoder, Player
+
+
+def make_test_video(path, size, frames, fps=30):
+    """Encode a h264 test video of moving gradients and noise"""
+    width, height = size
+    x = np.linspace(0, 1, width, dtype='f4')[None, :]
+    y = np.linspace(0, 1, height, dtype='f4')[:, None]
+    rng = np.random.default_rng(0)
+
+    with av.open(str(path), 'w') as container:
+        stream = container.add_stream('libx264', rate=fps, options={'preset': 'ultrafast'})
+        stream.width, stream.height = size
+        stream.pix_fmt = 'yuv420p'
+        for i in range(frames):
+            t = i / fps
+            image = np.empty((height, width, 3), dtype='f4')
+            image[..., 0] = 0.5 + 0.5 * np.sin(x * 12 + t * 3)
+            image[..., 1] = 0.5 + 0.5 * np.sin(y * 9 - t * 2)
+            image[..., 2] = 0.5 + 0.5 * np.sin((x + y) * 7 + t)
+            image = (image * 200).astype('u1') + rng.integers(0, 55, (height, width, 1), dtype='u1')
+            frame = av.VideoFrame.from_ndarray(image, format='rgb24')
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+
+
+class VideoBenchmark(moderngl_window.WindowConfig):
+    gl_version = (3, 3)
+    title = "Video Decode Benchmark"
+    samples = 0  # Headless is not always happy with multisampling
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        width, height = self.argv.video_size
+        default_path = Path(tempfile.gettempdir()) / f'mglw_test_{width}x{height}_{self.argv.frames}.mp4'
+        self.path = Path(self.argv.path or default_path)
+        if not self.path.exists():
+            print(f"Generating {self.path}")
+            make_test_video(self.path, (width, height), self.argv.frames)
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument('--video-size', type=int, nargs=2, default=[3840, 2160], help="Size of the test video")
+        parser.add_argument('--frames', type=int, default=60, help="Number of frames in the test video")
+        parser.add_argument('--path', help="Benchmark an existing video instead")
+        parser.add_argument('--check', action="store_true", default=False, help="Check rewinding after the end")
+
+    def check_playback(self, timeout=5.0):
+        """Jump past the end of the video, rewind and check that frames are presented again"""
+        player = Player(self.ctx, self.path, queue_size=4)
+        step = 1 / player.fps
+        for i in range(int(player.duration * player.fps)):
+            player.update(i * step)
+            time.sleep(0.001)
+
+        # Far past the end, so update() seeks beyond the last frame
+        for i in range(10):
+            player.update(player.duration + 1.0 + i * step)
+            time.sleep(0.01)
+
+        presented = player.presented
+        t, deadline = 0.0, time.perf_counter() + timeout
+        while player.presented == presented and time.perf_counter() < deadline:
+            player.update(t)
+            time.sleep(0.01)
+            t += 0.01
+        print(f"rewind after end: {'OK' if player.presented > presented else 'no frames presented'} "
+              f"({player.report()})")
+        player.release()
+
+    def benchmark(self, yuv):
+        """Returns (frames, decode seconds, convert seconds, upload seconds, bytes uploaded)"""
+        # The player is only used for uploads and does not decode in the background.
+        # We decode in this thread with our own decoder so decode and conversion can be timed separately
+        player = Player(self.ctx, self.path, yuv=yuv, decode=False)
+        decoder = Decoder(self.path)
+
+        frames = decode = convert = upload = 0.0
+        nbytes = 0
+        start = time.perf_counter()
+        for frame in decoder.container.decode(video=0):
+            decoded = time.perf_counter()
+            data = decoder.yuv_planes(frame) if yuv else frame.to_ndarray(format='rgb24')
+            converted = time.perf_counter()
+            player.write_frame(data)
+            self.ctx.finish()
+            uploaded = time.perf_counter()
+
+            decode += decoded - start
+            convert += converted - decoded
+            upload += uploaded - converted
+            nbytes += sum(plane.nbytes for plane in data) if yuv else data.nbytes
+            frames += 1
+            start = time.perf_counter()
+        player.release()
+        return frames, decode, convert, upload, nbytes
+
+    def render(self, time_, frame_time):
+        if self.argv.check:
+            self.check_playback()
+        print(f"{'path':<5} {'frames':>6} {'decode ms':>9} {'convert ms':>10} {'upload ms':>9} {'MB/frame':>8}")
+        for name, yuv in [('rgb', False), ('yuv', True)]:
+            frames, decode, convert, upload, nbytes = self.benchmark(yuv)
+            print(f"{name:<5} {int(frames):>6} {decode / frames * 1000:9.2f} {convert / frames * 1000:10.2f} "
+                  f"{upload / frames * 1000:9.2f} {nbytes / frames / 1e6:8.2f}")
+        self.wnd.close()
+
+
+if __name__ == '__main__':
+    VideoBenchmark.run()